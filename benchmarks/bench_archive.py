@@ -0,0 +1,63 @@
+"""
+Benchmarks for archiving Chunks, on the calling thread and through the background archiver
+"""
+import pathlib
+import time
+from chunky_logs.author import AuthorChunk, AuthorChunkFlushPolicy
+from chunky_logs.common import ChunkArchiver
+from benchmarks.harness import result, group_directory, payload
+
+PAYLOAD_SIZE = 64
+
+def create_chunks(group_path, chunk_count, line_count):
+    author_chunks = []
+    for chunk in range(chunk_count):
+        author_chunk = AuthorChunk(group_path, pathlib.Path(f"chunk_{chunk}"),
+                                   AuthorChunkFlushPolicy(max_bytes=4 * 1024 * 1024))
+        author_chunk.write_lines((payload(i, PAYLOAD_SIZE) for i in range(line_count)), range(line_count))
+        author_chunk.close()
+        author_chunks.append(author_chunk)
+    chunk_size = sum(author_chunk._chunk_file.stat().st_size for author_chunk in author_chunks)
+    return author_chunks, chunk_size
+
+def bench_chunk_archive(scale):
+    """
+    Chunk.archive() throughput for each codec, this runs on the calling thread
+    """
+    results = {}
+    line_count = int(200000 * scale) or 1
+    for codec in ['stored', 'deflate', 'lzma']:
+        with group_directory() as group_path:
+            (author_chunk,), chunk_size = create_chunks(group_path, 1, line_count)
+            start = time.perf_counter()
+            author_chunk.archive(codec)
+            elapsed = time.perf_counter() - start
+            results[codec] = result(line_count, elapsed, chunk_size)
+            results[codec]['ratio'] = chunk_size / group_path.joinpath('chunk_0.zip').stat().st_size
+    return results
+
+def bench_background_archive(scale):
+    """
+    ChunkArchiver throughput over several chunks, and the time the caller spends queueing each chunk
+    """
+    chunk_count = 8
+    line_count = int(100000 * scale) or 1
+    with group_directory() as group_path:
+        author_chunks, chunk_size = create_chunks(group_path, chunk_count, line_count)
+        with ChunkArchiver(codec='deflate') as archiver:
+            start = time.perf_counter()
+            latencies = []
+            futures = []
+            for author_chunk in author_chunks:
+                queue_start = time.perf_counter_ns()
+                futures.append(archiver.archive(author_chunk))
+                latencies.append(time.perf_counter_ns() - queue_start)
+            for future in futures:
+                future.result()
+            elapsed = time.perf_counter() - start
+    return result(chunk_count * line_count, elapsed, chunk_size, latencies)
+
+BENCHMARKS = [
+    bench_chunk_archive,
+    bench_background_archive,
+]
@@ -0,0 +1,71 @@
+"""
+Benchmarks for authoring lines to a Chunk, including how write throughput changes with the size of the Chunk
+"""
+import pathlib
+from chunky_logs.author import AuthorChunk, AuthorChunkFlushPolicy, BackgroundAuthorChunk
+from benchmarks.harness import result, timed_calls, group_directory, payload
+
+PAYLOAD_SIZE = 64
+
+def prefill(group_path, chunk_name, line_count):
+    with AuthorChunk(group_path, chunk_name, AuthorChunkFlushPolicy(max_bytes=4 * 1024 * 1024)) as author_chunk:
+        author_chunk.write_lines((payload(i, PAYLOAD_SIZE) for i in range(line_count)), range(line_count))
+
+def bench_write_line_vs_chunk_size(scale):
+    """
+    Unbuffered write_line throughput appending to chunks which already hold an increasing number of lines, this should
+    stay flat as the chunk grows
+    """
+    results = {}
+    line_count = int(2000 * scale) or 1
+    for existing_lines in [0, int(100000 * scale), int(1000000 * scale)]:
+        with group_directory() as group_path:
+            chunk_name = pathlib.Path('chunk_1')
+            prefill(group_path, chunk_name, existing_lines)
+            with AuthorChunk(group_path, chunk_name) as author_chunk:
+                elapsed, latencies = timed_calls(lambda i: author_chunk.write_line(payload(i, PAYLOAD_SIZE)),
+                                                 line_count)
+            results[f"existing_lines={existing_lines}"] = result(line_count, elapsed,
+                                                                 line_count * (PAYLOAD_SIZE + 15), latencies)
+    return results
+
+def bench_write_line_buffered(scale):
+    """
+    write_line throughput with a flush policy, and with metadata writes coalesced
+    """
+    line_count = int(200000 * scale) or 1
+    with group_directory() as group_path:
+        with AuthorChunk(group_path, pathlib.Path('chunk_1'), AuthorChunkFlushPolicy(max_bytes=256 * 1024),
+                         metadata_interval_ms=100) as author_chunk:
+            elapsed, latencies = timed_calls(lambda i: author_chunk.write_line(payload(i, PAYLOAD_SIZE)), line_count)
+    return result(line_count, elapsed, line_count * (PAYLOAD_SIZE + 15), latencies)
+
+def bench_write_lines_batch(scale):
+    """
+    write_lines throughput in batches of 1000 lines
+    """
+    batch_count = int(200 * scale) or 1
+    lines = [payload(i, PAYLOAD_SIZE) for i in range(1000)]
+    with group_directory() as group_path:
+        with AuthorChunk(group_path, pathlib.Path('chunk_1')) as author_chunk:
+            elapsed, latencies = timed_calls(lambda i: author_chunk.write_lines(lines), batch_count)
+    return result(batch_count * 1000, elapsed, batch_count * 1000 * (PAYLOAD_SIZE + 15), latencies)
+
+def bench_background_write_line(scale):
+    """
+    Producer side write_line latency through the background writer
+    """
+    line_count = int(200000 * scale) or 1
+    with group_directory() as group_path:
+        with BackgroundAuthorChunk.open(group_path, pathlib.Path('chunk_1'),
+                                        flush_policy=AuthorChunkFlushPolicy(max_bytes=256 * 1024)) as author_chunk:
+            elapsed, latencies = timed_calls(lambda i: author_chunk.write_line(payload(i, PAYLOAD_SIZE)), line_count)
+            author_chunk.flush()
+    return result(line_count, elapsed, line_count * (PAYLOAD_SIZE + 15), latencies)
+
+BENCHMARKS = [
+    bench_write_line_vs_chunk_size,
+    bench_write_line_buffered,
+    bench_write_lines_batch,
+    bench_background_write_line,
+]
@@ -0,0 +1,27 @@
+"""
+Benchmarks for the CircularBuffer operations
+"""
+from chunky_logs.common.circular_buffer import CircularBuffer
+from benchmarks.harness import result, timed_calls
+
+def bench_circular_buffer(scale):
+    """
+    Latency of push (on a full buffer, so each push also evicts), indexing, head and tail
+    """
+    results = {}
+    call_count = int(1000000 * scale) or 1
+    circular_buffer = CircularBuffer(1024)
+    for i in range(1024):
+        circular_buffer.push(i)
+
+    for name, function in [('push_full', circular_buffer.push),
+                           ('getitem', lambda i: circular_buffer[i % 1024]),
+                           ('head', lambda i: circular_buffer.head()),
+                           ('tail', lambda i: circular_buffer.tail())]:
+        elapsed, latencies = timed_calls(function, call_count)
+        results[name] = result(call_count, elapsed, latencies_ns=latencies, unit='ops')
+    return results
+
+BENCHMARKS = [
+    bench_circular_buffer,
+]
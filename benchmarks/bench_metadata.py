@@ -0,0 +1,81 @@
+"""
+Benchmarks for loading and writing Chunk metadata
+"""
+import os
+import pathlib
+import time
+from chunky_logs.author import AuthorGroup, AuthorGroupRollover, AuthorMetaData, AuthorMetaDataItem
+from chunky_logs.common import GroupManifest, MetaData
+from chunky_logs.parser import group_chunks
+from benchmarks.harness import result, timed_calls, group_directory
+
+def bench_metadata_load(scale):
+    """
+    Latency of loading metadata with the default keys, and with many custom keys
+    """
+    results = {}
+    call_count = int(5000 * scale) or 1
+    for custom_key_count in [0, 100]:
+        with group_directory() as group_path:
+            chunk_name = pathlib.Path('chunk_1')
+            author_metadata = AuthorMetaData(group_path, chunk_name)
+            for key in range(custom_key_count):
+                author_metadata.add(AuthorMetaDataItem(f"custom.key.{key}", key, 'int'))
+            author_metadata.write_to_disk()
+
+            elapsed, latencies = timed_calls(lambda i: MetaData(group_path, chunk_name), call_count)
+            results[f"custom_keys={custom_key_count}"] = result(call_count, elapsed, latencies_ns=latencies,
+                                                                unit='loads')
+    return results
+
+def bench_metadata_write(scale):
+    """
+    Latency of writing metadata after updating the line count, as an author does on every flush
+    """
+    call_count = int(5000 * scale) or 1
+    with group_directory() as group_path:
+        author_metadata = AuthorMetaData(group_path, pathlib.Path('chunk_1'))
+
+        def write(i):
+            author_metadata.chunk_line_count = i
+            author_metadata.write_to_disk()
+
+        elapsed, latencies = timed_calls(write, call_count)
+    return result(call_count, elapsed, latencies_ns=latencies, unit='writes')
+
+def bench_metadata_reload(scale):
+    """
+    Latency of checking for changed metadata when nothing has changed, as a parser does while following
+    """
+    call_count = int(100000 * scale) or 1
+    with group_directory() as group_path:
+        AuthorMetaData(group_path, pathlib.Path('chunk_1')).write_to_disk()
+        metadata = MetaData(group_path, pathlib.Path('chunk_1'))
+        elapsed, latencies = timed_calls(lambda i: metadata.reload(), call_count)
+    return result(call_count, elapsed, latencies_ns=latencies, unit='checks')
+
+def bench_group_open(scale):
+    """
+    Latency of listing the chunks of a group from its manifest, and from each chunk's metadata file
+    """
+    results = {}
+    chunk_count = int(2000 * scale) or 1
+    with group_directory() as group_path:
+        with AuthorGroup(group_path, max_chunks=chunk_count + 1, rollover=AuthorGroupRollover(max_lines=1),
+                         eviction='delete') as author_group:
+            for i in range(chunk_count):
+                author_group.write_line(i)
+        for source in ['manifest', 'metadata_files']:
+            if source == 'metadata_files':
+                os.remove(group_path.joinpath(GroupManifest.MANIFEST_FILE))
+            start = time.perf_counter()
+            chunks = group_chunks(group_path)
+            results[source] = result(len(chunks), time.perf_counter() - start, unit='chunks')
+    return results
+
+BENCHMARKS = [
+    bench_metadata_load,
+    bench_group_open,
+    bench_metadata_write,
+    bench_metadata_reload,
+]
@@ -0,0 +1,101 @@
+"""
+Benchmarks for parsing a Chunk, the sequential read paths and the index backed random access
+"""
+import pathlib
+import time
+from chunky_logs.author import AuthorChunk, AuthorChunkFlushPolicy
+from chunky_logs.parser import ParserChunk, ParserGroup
+from benchmarks.harness import result, timed_calls, group_directory, payload
+
+PAYLOAD_SIZE = 64
+
+def create_chunk(group_path, chunk_name, line_count):
+    with AuthorChunk(group_path, chunk_name, AuthorChunkFlushPolicy(max_bytes=4 * 1024 * 1024)) as author_chunk:
+        author_chunk.write_lines((payload(i, PAYLOAD_SIZE) for i in range(line_count)),
+                                 range(1739201327644, 1739201327644 + line_count))
+    return group_path.joinpath(chunk_name.with_suffix('.chunk')).stat().st_size
+
+def bench_read_paths(scale):
+    """
+    Throughput of each sequential read path over the same chunk
+    """
+    def read_line(parser_chunk):
+        while parser_chunk.read_line() is not None:
+            pass
+
+    def iterate(parser_chunk):
+        for _ in parser_chunk:
+            pass
+
+    def read_views(parser_chunk):
+        for _ in parser_chunk.read_views():
+            pass
+
+    results = {}
+    line_count = int(1000000 * scale) or 1
+    with group_directory() as group_path:
+        chunk_name = pathlib.Path('chunk_1')
+        chunk_size = create_chunk(group_path, chunk_name, line_count)
+        for read_path in [read_line, iterate, read_views]:
+            with ParserChunk(group_path, chunk_name) as parser_chunk:
+                start = time.perf_counter()
+                read_path(parser_chunk)
+                results[read_path.__name__] = result(line_count, time.perf_counter() - start, chunk_size)
+    return results
+
+def bench_read_line_latency(scale):
+    """
+    Per call read_line latency
+    """
+    line_count = int(200000 * scale) or 1
+    with group_directory() as group_path:
+        chunk_name = pathlib.Path('chunk_1')
+        chunk_size = create_chunk(group_path, chunk_name, line_count)
+        with ParserChunk(group_path, chunk_name) as parser_chunk:
+            elapsed, latencies = timed_calls(lambda i: parser_chunk.read_line(), line_count)
+    return result(line_count, elapsed, chunk_size, latencies)
+
+def bench_head_tail(scale):
+    """
+    Latency of head(), tail() and line() on a large chunk, these use the line index so should not depend on its size
+    """
+    results = {}
+    line_count = int(1000000 * scale) or 1
+    call_count = int(2000 * scale) or 1
+    with group_directory() as group_path:
+        chunk_name = pathlib.Path('chunk_1')
+        create_chunk(group_path, chunk_name, line_count)
+        with ParserChunk(group_path, chunk_name) as parser_chunk:
+            for name, function in [('head_10', lambda i: parser_chunk.head(10)),
+                                   ('tail_10', lambda i: parser_chunk.tail(10)),
+                                   ('line_random', lambda i: parser_chunk.line(i * 7919 % line_count)),
+                                   ('seek_time', lambda i: parser_chunk.seek_time(1739201327644 + i * 7919 % line_count))]:
+                elapsed, latencies = timed_calls(function, call_count)
+                results[name] = result(call_count, elapsed, latencies_ns=latencies, unit='calls')
+    return results
+
+def bench_read_group(scale):
+    """
+    Throughput reading a group of chunks end to end, with and without the next chunk prefetched
+    """
+    results = {}
+    chunk_count = 8
+    line_count = int(250000 * scale) or 1
+    with group_directory() as group_path:
+        group_size = sum(create_chunk(group_path, pathlib.Path(f"chunk_{index}"), line_count)
+                         for index in range(chunk_count))
+        for prefetch in [False, True]:
+            with ParserGroup(group_path, prefetch=prefetch) as parser_group:
+                start = time.perf_counter()
+                for _ in parser_group:
+                    pass
+                results['prefetch' if prefetch else 'no_prefetch'] = \
+                    result(chunk_count * line_count, time.perf_counter() - start, group_size)
+    return results
+
+BENCHMARKS = [
+    bench_read_paths,
+    bench_read_group,
+    bench_read_line_latency,
+    bench_head_tail,
+]
@@ -0,0 +1,67 @@
+import contextlib
+import pathlib
+import tempfile
+import time
+
+def percentile(sorted_values, fraction):
+    """
+    This gets a percentile from sorted values, using the nearest rank
+    :param sorted_values: The values, sorted in ascending order
+    :param fraction: The percentile as a fraction, e.g. 0.99
+    :return: The value at the percentile, None if there are no values
+    """
+    if not sorted_values:
+        return None
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+def result(operation_count, elapsed_s, byte_count=None, latencies_ns=None, unit='lines'):
+    """
+    This builds the result for a benchmark
+    :param operation_count: The number of operations (usually lines) performed
+    :param elapsed_s: The total time taken in seconds
+    :param byte_count: When set the number of bytes processed, reported as MB/s
+    :param latencies_ns: When set the latency of each operation in ns, reported as p50/p99 in us
+    :param unit: The name of the operation, the rate is reported as <unit>_per_s
+    :return: A dict of the metrics
+    """
+    metrics = {
+        'count': operation_count,
+        'elapsed_s': elapsed_s,
+        f"{unit}_per_s": operation_count / elapsed_s if elapsed_s else None,
+    }
+    if byte_count is not None:
+        metrics['mb_per_s'] = byte_count / elapsed_s / 1e6 if elapsed_s else None
+    if latencies_ns:
+        latencies_ns = sorted(latencies_ns)
+        metrics['p50_us'] = percentile(latencies_ns, 0.50) / 1000
+        metrics['p99_us'] = percentile(latencies_ns, 0.99) / 1000
+        metrics['max_us'] = latencies_ns[-1] / 1000
+    return metrics
+
+def timed_calls(function, call_count):
+    """
+    This calls a function repeatedly, timing each call
+    :param function: The function to call, it is passed the call number
+    :param call_count: The number of calls to make
+    :return: A tuple of (total elapsed seconds, list of per call latencies in ns)
+    """
+    latencies_ns = []
+    perf_counter_ns = time.perf_counter_ns
+    start = perf_counter_ns()
+    for call in range(call_count):
+        call_start = perf_counter_ns()
+        function(call)
+        latencies_ns.append(perf_counter_ns() - call_start)
+    return (perf_counter_ns() - start) / 1e9, latencies_ns
+
+@contextlib.contextmanager
+def group_directory():
+    """
+    This creates a temporary group directory, removed once the benchmark has finished with it
+    :return: The group path
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        yield pathlib.Path(test_data_directory)
+
+def payload(line, payload_size):
+    return f"payload_data_{line}".ljust(payload_size, 'x')
@@ -0,0 +1,67 @@
+"""
+Runs the benchmark suite and writes the results as JSON, so runs can be compared across commits
+
+    python -m benchmarks.run [--quick] [--filter NAME] [--output FILE]
+"""
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import sys
+from benchmarks import bench_author, bench_parser, bench_metadata, bench_archive, bench_circular_buffer
+
+SUITES = [bench_author, bench_parser, bench_metadata, bench_archive, bench_circular_buffer]
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(scale=1.0, name_filter=None, progress=None):
+    """
+    This runs the benchmarks
+    :param scale: A multiplier for the amount of work each benchmark does
+    :param name_filter: When set only benchmarks whose name contains this are run
+    :param progress: When set this is called with the name of each benchmark before it runs
+    :return: A dict of the run details and the results of each benchmark
+    """
+    results = {}
+    for suite in SUITES:
+        for benchmark in suite.BENCHMARKS:
+            name = f"{suite.__name__.rsplit('.', 1)[-1]}.{benchmark.__name__}"
+            if name_filter and name_filter not in name:
+                continue
+            if progress is not None:
+                progress(name)
+            results[name] = benchmark(scale)
+    return {
+        'commit': git_commit(),
+        'time': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scale': scale,
+        'results': results,
+    }
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Run the chunky-logs benchmark suite")
+    parser.add_argument('--quick', action='store_true', help="Run a tenth of the work, for a fast check")
+    parser.add_argument('--scale', type=float, default=None, help="A multiplier for the amount of work")
+    parser.add_argument('--filter', default=None, help="Only run benchmarks whose name contains this")
+    parser.add_argument('--output', default=None, help="The file to write the JSON results to, default stdout")
+    parsed_args = parser.parse_args(args)
+
+    scale = parsed_args.scale or (0.1 if parsed_args.quick else 1.0)
+    report = run(scale, parsed_args.filter, lambda name: print(f"Running {name}", file=sys.stderr, flush=True))
+    if parsed_args.output:
+        with open(parsed_args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,8 @@
 """author"""
 from chunky_logs.author.author_metadata import AuthorMetaData, AuthorMetaDataItem, AuthorMetaDataError, AuthorMetaDataFileNotFound
-from chunky_logs.author.author_chunk import AuthorChunk
\ No newline at end of file
+from chunky_logs.author.author_chunk import AuthorChunk, AuthorChunkFlushPolicy, AuthorChunkDurability, AuthorChunkError
+from chunky_logs.author.async_author_chunk import AsyncAuthorChunk
+from chunky_logs.author.background_author_chunk import BackgroundAuthorChunk, BackgroundAuthorChunkError, \
+    BackgroundAuthorChunkQueueFull
+from chunky_logs.author.shared_author_chunk import SharedAuthorChunk, SharedAuthorChunkError
+from chunky_logs.author.author_group import AuthorGroup, AuthorGroupRollover, AuthorGroupError
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import pathlib
+import time
+from chunky_logs.common.async_io import default_io_executor
+from chunky_logs.author.author_chunk import AuthorChunk
+
+class AsyncAuthorChunk:
+    """
+    This class authors data to Chunks from asyncio code. Lines are queued on the event loop without blocking, and are
+    written out in batches by an AuthorChunk on the I/O executor, so the on disk format is the same as an AuthorChunk.
+    At most one batch per Chunk is being written at a time, lines queued meanwhile form the next batch
+    """
+    def __init__(self, author_chunk: AuthorChunk, executor=None):
+        """
+        This is the constructor for an AsyncAuthorChunk, use AsyncAuthorChunk.open() to create one without blocking
+        :param author_chunk: The AuthorChunk to write through, it must only be used by this AsyncAuthorChunk
+        :param executor: The executor to perform file I/O on, None uses the shared I/O thread
+        """
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._author_chunk = author_chunk
+        self._executor = executor or default_io_executor()
+        self._pending_lines = []
+        self._pending_timestamps = []
+        self._write_future = None
+        self._write_error = None
+
+    @classmethod
+    async def open(cls, group_path: pathlib.Path, chunk_name: pathlib.Path, executor=None, **kwargs):
+        """
+        This creates an AsyncAuthorChunk, opening the Chunk on the I/O executor
+        :param group_path: This is the path to the group under which this chunk lives
+        :param chunk_name: This is the name for the chunk this instance represents
+        :param executor: The executor to perform file I/O on, None uses the shared I/O thread
+        :param kwargs: Any further arguments for the AuthorChunk
+        :return: The AsyncAuthorChunk
+        """
+        executor = executor or default_io_executor()
+        author_chunk = await asyncio.get_running_loop().run_in_executor(
+            executor, lambda: AuthorChunk(group_path, chunk_name, **kwargs))
+        return cls(author_chunk, executor)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    @property
+    def metadata(self):
+        return self._author_chunk.metadata
+
+    def write_line(self, line_data):
+        """
+        This queues a new line to be written to the Chunk, it is timestamped now and never blocks
+        :param line_data: This is the new line data to write (it should be able to be represented as a string)
+        """
+        self.write_lines((line_data,))
+
+    def write_lines(self, lines_data, timestamps=None):
+        """
+        This queues a batch of lines to be written to the Chunk, it never blocks
+        :param lines_data: This is an iterable of the new line data to write
+        :param timestamps: This is an optional iterable of ms timestamps, one per line. When not given the lines are
+        timestamped now. Raises ValueError, without queueing any lines, if there is not one timestamp per line
+        """
+        if self._write_error is not None:
+            raise self._write_error
+        lines_data = list(lines_data)
+        if timestamps is None:
+            timestamps = [int(time.time_ns() / 1000000)] * len(lines_data)
+        else:
+            timestamps = list(timestamps)
+            if len(timestamps) != len(lines_data):
+                raise ValueError(f"Expected one timestamp per line: lines={len(lines_data)} "
+                                 f"timestamps={len(timestamps)}")
+        self._pending_lines.extend(lines_data)
+        self._pending_timestamps.extend(timestamps)
+        self._schedule_write()
+
+    def _schedule_write(self):
+        """
+        This starts writing the queued lines on the I/O executor, unless a batch is already being written
+        """
+        if self._write_future is not None or not self._pending_lines:
+            return
+        lines_data, timestamps = self._pending_lines, self._pending_timestamps
+        self._pending_lines, self._pending_timestamps = [], []
+        self._write_future = asyncio.get_running_loop().run_in_executor(
+            self._executor, self._author_chunk.write_lines, lines_data, timestamps)
+        self._write_future.add_done_callback(self._write_done)
+
+    def _write_done(self, write_future):
+        """
+        This records the outcome of a batch write and starts writing the next batch. It is run as the write future's
+        callback, or directly by flush() if that has not run yet, and only the first call for a write has any effect
+        :param write_future: The future of the batch write which has finished
+        """
+        if write_future is not self._write_future:
+            return
+        self._write_future = None
+        if write_future.exception() is not None:
+            self._logger.error(f"Unable to write lines to Chunk. error={write_future.exception()}")
+            self._write_error = write_future.exception()
+            return
+        self._schedule_write()
+
+    async def flush(self):
+        """
+        This waits until every queued line has been written, and then flushes the Chunk
+        """
+        while self._write_error is None and (self._write_future is not None or self._pending_lines):
+            if self._write_future is None:
+                self._schedule_write()
+            write_future = self._write_future
+            try:
+                await asyncio.shield(write_future)
+            except Exception:
+                pass
+            # Awaiting a future which has already finished does not yield to the event loop, so its callback may not
+            # have run yet
+            if write_future.done():
+                self._write_done(write_future)
+        if self._write_error is not None:
+            raise self._write_error
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._author_chunk.flush)
+
+    async def close(self):
+        """
+        This writes every queued line, and then closes the Chunk
+        """
+        try:
+            await self.flush()
+        finally:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._author_chunk.close)
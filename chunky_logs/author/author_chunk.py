@@ -1,39 +1,424 @@
+from collections import namedtuple
 import logging
+import os
 import pathlib
+import threading
 import time
+from chunky_logs.common.block_codec import encode_block, open_chunk_data
 from chunky_logs.common.chunk import Chunk
-from chunky_logs.common.hashing import file_md5sum
-from chunky_logs.author.author_metadata import AuthorMetaData
+from chunky_logs.common.hashing import new_checksum
+from chunky_logs.common.line_index import LineIndex, line_timestamp
+from chunky_logs.common.metadata import MetaData
+from chunky_logs.author.author_metadata import AuthorMetaData, AuthorMetaDataItem
+
+AuthorChunkFlushPolicy = namedtuple('AuthorChunkFlushPolicy', ['max_bytes', 'max_lines', 'max_interval_ms'],
+                                    defaults=[64 * 1024, None, None])
+
+# The durability mode decides when flushed lines are synced to disk, one of:
+#   - 'none' never syncs, the operating system writes the lines out in its own time
+#   - 'interval' syncs once interval_ms has passed since the last sync, using a timer when no more lines are written
+#   - 'every_n_lines' syncs once lines flushed lines are waiting to be synced
+#   - 'every_batch' syncs after every flush
+AuthorChunkDurability = namedtuple('AuthorChunkDurability', ['mode', 'interval_ms', 'lines'],
+                                   defaults=['none', None, None])
+
+class AuthorChunkError(RuntimeError):
+    pass
+
+_fdatasync = getattr(os, 'fdatasync', os.fsync)
 
 class AuthorChunk(Chunk):
     """
-    This class knows how to author data to Chunks, and to update the metadata
+    This class knows how to author data to Chunks, and to update the metadata. Writes are serialised with a lock so an
+    AuthorChunk can be shared between threads, use a BackgroundAuthorChunk where producers must not wait on the I/O
     """
-    def __init__(self, group_path: pathlib.Path, chunk_name: pathlib.Path):
+    def __init__(self, group_path: pathlib.Path, chunk_name: pathlib.Path, flush_policy: AuthorChunkFlushPolicy = None,
+                 metadata_interval_ms: int = None, index_stride: int = LineIndex.DEFAULT_STRIDE,
+                 block_codec: str = None, block_level: int = None, checksum_type: str = 'md5',
+                 durability: AuthorChunkDurability = None, metrics=None):
         """
         This is the constructor for an AuthorChunk
         :param group_path: This is the path to the group under which this chunk lives
         :param chunk_name: This is the name for the chunk this instance represents
+        :param flush_policy: When set the Chunk file is kept open and lines are buffered until one of the policy
+        thresholds (bytes, lines or interval) is reached. When None every line is written out and flushed immediately
+        :param metadata_interval_ms: When set, metadata changes are coalesced and written to disk at most once per
+        interval (and on close). When None the metadata is written on every flush
+        :param index_stride: The number of lines between each entry in the Chunk's line index
+        :param block_codec: When set (see BLOCK_CODECS) a new Chunk is written as independently compressed blocks, one
+        per flush, so a flush policy should be used alongside it. An existing Chunk keeps the format it was created with
+        :param block_level: The compression level for the block codec, None uses the codec's default
+        :param checksum_type: The checksum algorithm for a new Chunk (see CHECKSUM_TYPES). An existing Chunk keeps the
+        algorithm recorded in its metadata
+        :param durability: When set (and not 'none') flushed lines are synced to disk as the durability mode requires.
+        Syncs are group committed, so threads sharing the Chunk share a single sync, and the metadata is only written
+        once the lines it describes have been synced. When None lines are never explicitly synced
+        :param metrics: The metrics sink to record lines, bytes and latencies to, None uses the default sink (if any)
         """
         self._logger = logging.getLogger(self.__class__.__name__)
-        super().__init__(group_path, chunk_name, AuthorMetaData(group_path, chunk_name))
+        self._lock = threading.RLock()
+        super().__init__(group_path, chunk_name,
+                         AuthorMetaData(group_path, chunk_name, metadata_interval_ms, metrics, self._lock), metrics)
+        if self._metrics is not None:
+            self._lines_metric = self._metrics.counter('author.lines')
+            self._bytes_metric = self._metrics.counter('author.bytes')
+            self._append_metric = self._metrics.histogram('author.append_ns')
+            self._hash_metric = self._metrics.histogram('author.hash_ns')
+            self._commit_metric = self._metrics.histogram('author.commit_ns')
+        self._line_index = LineIndex(index_stride)
+        self._block_level = block_level
+        recorded_line_count = self.metadata.chunk_line_count
+        if os.path.exists(self._chunk_file):
+            self._chunk_hash = new_checksum(self.metadata.chunk_checksum_type)
+            self._block_codec = self.metadata.chunk_block_codec
+            self._load_chunk_state()
+        else:
+            self._chunk_hash = new_checksum(checksum_type)
+            self.metadata.chunk_checksum_type = checksum_type
+            self._block_codec = block_codec
+            if block_codec is not None:
+                self.metadata.add(AuthorMetaDataItem(MetaData.CHUNK_BLOCK_CODEC_KEY, block_codec, 'str'))
+        self._flush_policy = flush_policy
+        self._chunk_handle = None
+
+        self._durability = durability or AuthorChunkDurability()
+        if self._durability.mode not in ('none', 'interval', 'every_n_lines', 'every_batch'):
+            raise AuthorChunkError(f"Unknown durability mode: {self._durability.mode}")
+        self._commit_condition = threading.Condition()
+        self._commit_in_progress = False
+        self._commit_timer = None
+        self._durable_line_count = self.metadata.chunk_line_count
+        self._last_commit = time.monotonic()
+        self._sync_fd = None
+        if self.metadata.chunk_line_count != recorded_line_count:
+            # The metadata did not describe every line in the Chunk (the last writer stopped between writing lines and
+            # their metadata), bring it up to date before any more lines are written
+            self._durable_line_count = min(recorded_line_count, self.metadata.chunk_line_count)
+            if self._durability.mode == 'none':
+                self.metadata.write_to_disk()
+            else:
+                self.commit()
+
+        self._pending_lines = []
+        self._pending_bytes = 0
+        self._pending_time_create = None
+        self._pending_time_update = None
+        self._last_flush = time.monotonic()
+        self._flush_timer = None
+
+    @property
+    def line_count(self) -> int:
+        """
+        This is the number of lines written to the Chunk, including any lines buffered but not yet flushed
+        """
+        with self._lock:
+            return self.metadata.chunk_line_count + len(self._pending_lines)
+
+    @property
+    def byte_count(self) -> int:
+        """
+        This is the (uncompressed) size of the lines written to the Chunk, including any lines buffered but not yet
+        flushed
+        """
+        with self._lock:
+            return self._line_index.end_pos + self._pending_bytes
+
+    def _load_chunk_state(self):
+        """
+        This rebuilds the running checksum and line index for an existing Chunk. Its contents are read once here, after
+        which only the newly appended bytes need hashing and indexing. The index file is rewritten as it may be missing
+        or stale. The metadata is updated to match the lines found, as a writer which stopped without closing the Chunk
+        may have left lines its metadata does not cover, and a partially written last line (or block) is truncated
+        """
+        self._logger.debug(f"Rebuilding checksum and index for existing Chunk. file={self._chunk_file}")
+        remainder = b''
+        first_line = last_line = b''
+        valid_end = None
+        with open_chunk_data(self._chunk_file, self._block_codec) as chunk_data:
+            for block in iter(lambda: chunk_data.read(1024 * 1024), b""):
+                block = remainder + block
+                end = block.rfind(b'\n') + 1
+                if end:
+                    self._chunk_hash.update(block[:end])
+                    self._line_index.add(block[:end])
+                    if not first_line:
+                        first_line = block[:block.find(b'\n') + 1]
+                    last_line = block[block.rfind(b'\n', 0, end - 1) + 1:end]
+                remainder = block[end:]
+            if self._block_codec is not None:
+                valid_end = chunk_data.frames_end
+            elif remainder:
+                valid_end = self._line_index.end_pos
+        # Appending after a partially written line (or frame) would corrupt the next line (or every following frame)
+        if valid_end is not None and valid_end < os.path.getsize(self._chunk_file):
+            self._logger.warning(f"Truncating partially written data. file={self._chunk_file} "
+                                 f"bytes={os.path.getsize(self._chunk_file) - valid_end}")
+            os.truncate(self._chunk_file, valid_end)
+        self._line_index.write_to_file(self._index_file)
+
+        if self._line_index.line_count != self.metadata.chunk_line_count:
+            self._logger.warning(f"Chunk metadata does not match its lines, recounting. file={self._chunk_file} "
+                                 f"metadata={self.metadata.chunk_line_count} lines={self._line_index.line_count}")
+            self.metadata.chunk_line_count = self._line_index.line_count
+            self.metadata.chunk_checksum_hash = self._chunk_hash.hexdigest()
+            for key, line in ((MetaData.CHUNK_TIME_CREATE_KEY, first_line), (MetaData.CHUNK_TIME_UPDATE_KEY, last_line)):
+                try:
+                    self.metadata[key] = line_timestamp(line)
+                except ValueError:
+                    pass
 
     def write_line(self, line_data):
         """
         This writes a new line to the Chunk, along with updating the metadata
         :param line_data: This is the new line data to write (it should be able to be represented as a string)
         """
-        time_now_ms = int(time.time_ns() / 1000000)
-        # The chunk has just been created, set the relevant details
-        if self.metadata.chunk_line_count == 0:
-            self.metadata.chunk_time_create = time_now_ms
+        self._buffer_lines((line_data,))
+
+    def write_lines(self, lines_data, timestamps=None):
+        """
+        This writes a batch of lines to the Chunk. The batch is appended, hashed and the metadata written once for the
+        whole batch, rather than once per line
+        :param lines_data: This is an iterable of the new line data to write
+        :param timestamps: This is an optional iterable of ms timestamps, one per line. When not given each line is
+        timestamped as it is added to the pending lines. Raises ValueError, without writing any lines, if there is not
+        one timestamp per line
+        """
+        self._buffer_lines(lines_data, timestamps)
+
+    def _buffer_lines(self, lines_data, timestamps=None):
+        """
+        This adds lines to the pending lines, and then flushes them if required by the flush policy. Lines without
+        timestamps are timestamped under the lock, as they are added, so timestamps never go backwards in the Chunk
+        when threads share it
+        :param lines_data: This is an iterable of the new line data to write
+        :param timestamps: This is an optional iterable of ms timestamps, one per line
+        """
+        if timestamps is None:
+            lines_data = [str(line_data) for line_data in lines_data]
+        else:
+            lines_data, timestamps = list(lines_data), list(timestamps)
+            if len(timestamps) != len(lines_data):
+                raise ValueError(f"Expected one timestamp per line: lines={len(lines_data)} "
+                                 f"timestamps={len(timestamps)}")
+            lines = [(time_ms, f"{time_ms},{str(line_data)}\n".encode('utf-8'))
+                     for time_ms, line_data in zip(timestamps, lines_data)]
+        with self._lock:
+            if timestamps is None:
+                lines = []
+                for line_data in lines_data:
+                    time_ms = int(time.time_ns() / 1000000)
+                    lines.append((time_ms, f"{time_ms},{line_data}\n".encode('utf-8')))
+            for time_ms, line in lines:
+                if not self._pending_lines:
+                    self._pending_time_create = time_ms
+                self._pending_lines.append(line)
+                self._pending_bytes += len(line)
+                self._pending_time_update = time_ms
+            flush_required = self._pending_lines and self._flush_required()
+            if not flush_required and self._pending_lines and self._flush_policy.max_interval_ms is not None:
+                self._schedule_flush()
+
+        if flush_required:
+            self.flush()
+
+    def _schedule_flush(self):
+        """
+        This starts a timer to flush the pending lines once the flush policy interval has passed, so that lines are
+        written out even when no further lines are written. This must be called with the lock held
+        """
+        if self._flush_timer is not None:
+            return
+        delay = self._flush_policy.max_interval_ms / 1000 - (time.monotonic() - self._last_flush)
+        self._flush_timer = threading.Timer(max(delay, 0), self._timed_flush)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+
+    def _timed_flush(self):
+        with self._lock:
+            self._flush_timer = None
+        try:
+            self.flush()
+        except Exception as e:
+            self._logger.error(f"Timed flush failed: file={self._chunk_file} error={e}")
+
+    def _flush_required(self):
+        """
+        This decides if the pending lines should be flushed based on the flush policy, whichever threshold is reached
+        first triggers the flush. The interval is evaluated as lines are written, and by a timer while no lines are
+        :return: True if the pending lines should be flushed, False if not
+        """
+        policy = self._flush_policy
+        if policy is None:
+            return True
+        if policy.max_bytes is not None and self._pending_bytes >= policy.max_bytes:
+            return True
+        if policy.max_lines is not None and len(self._pending_lines) >= policy.max_lines:
+            return True
+        if policy.max_interval_ms is not None and \
+                (time.monotonic() - self._last_flush) * 1000 >= policy.max_interval_ms:
+            return True
+        return False
+
+    def flush(self):
+        """
+        This writes any pending lines out to the Chunk and then updates the metadata. Only whole lines are written, and
+        the metadata is only updated after the lines are on disk, so readers always see a consistent line prefix. With a
+        durability mode the lines are then synced once the mode requires it, and the metadata is written after the sync
+        """
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._pending_lines:
+                return
+
+            if self._metrics is not None:
+                append_start = time.perf_counter_ns()
+            chunk_bytes = b''.join(self._pending_lines)
+            if self._block_codec is None:
+                file_bytes = chunk_bytes
+            else:
+                file_bytes = encode_block(chunk_bytes, self._block_codec, self._block_level)
 
-        # Write the data out
-        with open(self._chunk_file, 'a') as chunk_data:
-            chunk_data.write(f"{time_now_ms},{str(line_data)}\n")
+            if self._flush_policy is None:
+                with open(self._chunk_file, 'ab') as chunk_data:
+                    chunk_data.write(file_bytes)
+            else:
+                if self._chunk_handle is None:
+                    self._chunk_handle = open(self._chunk_file, 'ab', buffering=self._flush_policy.max_bytes or -1)
+                self._chunk_handle.write(file_bytes)
+                self._chunk_handle.flush()
+            if self._metrics is not None:
+                hash_start = time.perf_counter_ns()
+                self._append_metric.record(hash_start - append_start)
+            self._chunk_hash.update(chunk_bytes)
+            if self._metrics is not None:
+                self._hash_metric.record(time.perf_counter_ns() - hash_start)
+                self._lines_metric.add(len(self._pending_lines))
+                self._bytes_metric.add(len(chunk_bytes))
+            new_entries = self._line_index.add(chunk_bytes)
+            if new_entries:
+                self._line_index.append_to_file(self._index_file, new_entries)
+
+            # The chunk has just been created, set the relevant details
+            if self.metadata.chunk_line_count == 0:
+                self.metadata.chunk_time_create = self._pending_time_create
+
+            # Update the metadata and write to disk
+            self.metadata.chunk_line_count += len(self._pending_lines)
+            self.metadata.chunk_time_update = self._pending_time_update
+            self.metadata.chunk_checksum_hash = self._chunk_hash.hexdigest()
+            if self._durability.mode == 'none':
+                self.metadata.sync()
+
+            self._pending_lines = []
+            self._pending_bytes = 0
+            commit_required = self._commit_required()
+
+        if commit_required:
+            self.commit()
+        elif self._durability.mode == 'interval':
+            self._schedule_commit()
+
+    def _commit_required(self):
+        """
+        This decides if the flushed lines should be synced to disk based on the durability mode
+        :return: True if the lines should be synced, False if not
+        """
+        durability = self._durability
+        if durability.mode == 'every_batch':
+            return True
+        if durability.mode == 'every_n_lines':
+            return self.metadata.chunk_line_count - self._durable_line_count >= (durability.lines or 1)
+        if durability.mode == 'interval':
+            return (time.monotonic() - self._last_commit) * 1000 >= (durability.interval_ms or 0)
+        return False
 
-        # Update the metadata and write to disk
-        self.metadata.chunk_line_count += 1
-        self.metadata.chunk_time_update = time_now_ms
-        self.metadata.chunk_checksum_hash = file_md5sum(self._chunk_file)
-        self.metadata.write_to_disk()
+    def _schedule_commit(self):
+        """
+        This starts a timer to commit the flushed lines once the durability interval has passed, so that lines are
+        synced (and their metadata written) even when no further lines are written
+        """
+        with self._commit_condition:
+            if self._commit_timer is not None:
+                return
+            delay = (self._durability.interval_ms or 0) / 1000 - (time.monotonic() - self._last_commit)
+            self._commit_timer = threading.Timer(max(delay, 0), self._timed_commit)
+            self._commit_timer.daemon = True
+            self._commit_timer.start()
+
+    def _timed_commit(self):
+        with self._commit_condition:
+            self._commit_timer = None
+        try:
+            self.commit()
+        except Exception as e:
+            self._logger.error(f"Timed commit failed: file={self._chunk_file} error={e}")
+
+    @property
+    def durable_line_count(self) -> int:
+        """
+        This is the durability watermark, the number of lines in the Chunk which have been synced to disk
+        """
+        return self._durable_line_count
+
+    def commit(self):
+        """
+        This syncs every flushed line to disk, followed by the metadata describing them. Commits are grouped, a thread
+        which arrives while another thread's sync is in progress waits for it, and if its lines were not covered by
+        that sync, a single further sync then covers every thread waiting
+        :return: The number of lines which are durable
+        """
+        with self._commit_condition:
+            target_line_count = self.metadata.chunk_line_count
+            while self._commit_in_progress and self._durable_line_count < target_line_count:
+                self._commit_condition.wait()
+            if self._durable_line_count >= target_line_count:
+                return self._durable_line_count
+            self._commit_in_progress = True
+
+        committed_line_count = self._durable_line_count
+        if self._metrics is not None:
+            commit_start = time.perf_counter_ns()
+        try:
+            # Snapshot the metadata for the lines written so far, lines flushed during the sync are left to the next
+            with self._lock:
+                if self._chunk_handle is not None:
+                    self._chunk_handle.flush()
+                if self._sync_fd is None:
+                    self._sync_fd = os.open(self._chunk_file, os.O_RDONLY)
+                line_count = self.metadata.chunk_line_count
+                metadata_json = self.metadata.serialize()
+            _fdatasync(self._sync_fd)
+            self.metadata.write_serialized(metadata_json, durable=True)
+            committed_line_count = line_count
+        finally:
+            with self._commit_condition:
+                self._commit_in_progress = False
+                self._durable_line_count = max(self._durable_line_count, committed_line_count)
+                self._last_commit = time.monotonic()
+                self._commit_condition.notify_all()
+        if self._metrics is not None:
+            self._commit_metric.record(time.perf_counter_ns() - commit_start)
+        return committed_line_count
+
+    def close(self):
+        """
+        This flushes any pending lines and metadata, and closes the Chunk file if it is being held open
+        """
+        self.flush()
+        with self._commit_condition:
+            if self._commit_timer is not None:
+                self._commit_timer.cancel()
+                self._commit_timer = None
+        if self._durability.mode != 'none':
+            self.commit()
+        with self._lock:
+            self.metadata.close()
+            if self._chunk_handle is not None:
+                self._chunk_handle.close()
+                self._chunk_handle = None
+            if self._sync_fd is not None:
+                os.close(self._sync_fd)
+                self._sync_fd = None
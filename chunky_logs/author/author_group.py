@@ -0,0 +1,307 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import pathlib
+import threading
+import time
+from chunky_logs.common.archiver import ChunkArchiver
+from chunky_logs.common.chunk import Chunk
+from chunky_logs.common.circular_buffer import CircularBuffer
+from chunky_logs.common.group_manifest import GroupManifest, chunk_manifest_entry
+from chunky_logs.common.metadata import MetaData
+from chunky_logs.common.metrics import get_default_metrics
+from chunky_logs.author.author_chunk import AuthorChunk
+
+# A new Chunk is started once the active Chunk reaches any of these thresholds, a threshold of None is not applied
+AuthorGroupRollover = namedtuple('AuthorGroupRollover', ['max_lines', 'max_bytes', 'max_age_ms'],
+                                 defaults=[None, None, None])
+
+class AuthorGroupError(RuntimeError):
+    pass
+
+class AuthorGroup:
+    """
+    This class authors data to a Group. Lines are written to the last Chunk in the Group, and a new Chunk is started
+    once the rollover thresholds are reached. The active Chunks are kept in a CircularBuffer, so once the Group holds
+    max_chunks Chunks the oldest is evicted (archived or deleted) on each rollover. The next Chunk is created on one
+    background thread, and old Chunks are closed and evicted on another, so rolling over does not stall the writing
+    thread and is not held up by archiving. The state
+    of every Chunk is recorded in the Group's manifest, so readers (and the next AuthorGroup) can open the Group without
+    reading each Chunk's metadata.
+
+    A batch of lines is never split between Chunks, so a Chunk may exceed the line and byte thresholds by up to one
+    batch. The age threshold is evaluated as lines are written
+    """
+    CHUNK_NAME_PREFIX = 'chunk_'
+    EVICTION_POLICIES = ('archive', 'delete')
+
+    def __init__(self, group_path: pathlib.Path, max_chunks: int = 10, rollover: AuthorGroupRollover = None,
+                 eviction: str = 'archive', archiver: ChunkArchiver = None, archive_codec: str = 'deflate',
+                 metrics=None, **chunk_kwargs):
+        """
+        This is the constructor for an AuthorGroup, any Chunks already in the Group are picked up and the last of them
+        is written to
+        :param group_path: This is the path to the group, it is created if it does not exist
+        :param max_chunks: The maximum number of Chunks kept in the Group
+        :param rollover: The thresholds at which a new Chunk is started, None never rolls over
+        :param eviction: What happens to the oldest Chunk once there are more than max_chunks, one of EVICTION_POLICIES
+        :param archiver: When set evicted Chunks are archived through this ChunkArchiver, when None they are archived on
+        the Group's background thread. It is not closed when the Group is closed
+        :param archive_codec: The codec to compress archives with when there is no archiver (see ARCHIVE_CODECS)
+        :param metrics: The metrics sink to record rollovers to (and pass to the Chunks), None uses the default sink
+        :param chunk_kwargs: Any further arguments for each AuthorChunk, for example the flush policy or durability
+        """
+        self._logger = logging.getLogger(self.__class__.__name__)
+        if eviction not in AuthorGroup.EVICTION_POLICIES:
+            raise AuthorGroupError(f"Unknown eviction policy: {eviction}")
+        self._group_path = pathlib.Path(group_path)
+        self._group_path.mkdir(parents=True, exist_ok=True)
+        self._rollover = rollover or AuthorGroupRollover()
+        self._eviction = eviction
+        self._archiver = archiver
+        self._archive_codec = archive_codec
+        self._metrics = metrics if metrics is not None else get_default_metrics()
+        self._rollovers_metric = None if self._metrics is None else self._metrics.counter('group.rollovers')
+        self._chunk_kwargs = dict(chunk_kwargs, metrics=metrics)
+
+        self._lock = threading.RLock()
+        self._closed = False
+        self._chunks = CircularBuffer(max_chunks)
+        self._housekeeping = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"AuthorGroup-{self._group_path.name}")
+        self._chunk_creation = ThreadPoolExecutor(max_workers=1,
+                                                  thread_name_prefix=f"AuthorGroup-{self._group_path.name}-create")
+        self._manifest = GroupManifest(self._group_path)
+
+        chunk_indices = self._find_chunk_indices()
+        for chunk_index in chunk_indices:
+            self._push_chunk(self.chunk_name(chunk_index))
+        if chunk_indices:
+            self._chunk_index = chunk_indices[-1]
+            self._chunk = self._create_chunk(self._chunk_index)
+            time_create = self._chunk.metadata.chunk_time_create
+            age_ms = max(0, time.time_ns() // 1000000 - time_create) if time_create else 0
+            self._chunk_started = time.monotonic() - age_ms / 1000
+        else:
+            self._chunk_index = 1
+            self._chunk = self._create_chunk(self._chunk_index)
+            self._push_chunk(self.chunk_name(self._chunk_index))
+            self._chunk_started = time.monotonic()
+        self._manifest.record(chunk_manifest_entry(self._chunk, 'active'))
+        self._next_chunk = self._chunk_creation.submit(self._create_chunk, self._chunk_index + 1)
+
+    @classmethod
+    def chunk_name(cls, chunk_index: int) -> pathlib.Path:
+        """
+        This gets the name of a Chunk within a Group, Chunks are numbered from 1 in the order they are created
+        :param chunk_index: The number of the Chunk
+        :return: The Chunk name
+        """
+        return pathlib.Path(f"{cls.CHUNK_NAME_PREFIX}{chunk_index:08d}")
+
+    def _find_chunk_indices(self):
+        """
+        This finds the Chunks already in the Group from its manifest. A Group without a manifest has its directory
+        scanned for metadata files instead, and its manifest is created from them
+        :return: A sorted list of the Chunk numbers
+        """
+        if self._manifest.exists:
+            chunk_names = [entry.chunk_name for entry in self._manifest.entries()]
+        else:
+            chunk_names = self._scan_chunk_names()
+        chunk_indices = []
+        for chunk_name in chunk_names:
+            try:
+                chunk_indices.append(int(chunk_name[len(AuthorGroup.CHUNK_NAME_PREFIX):]))
+            except ValueError:
+                self._logger.debug(f"Skipping Chunk which is not numbered by the Group. chunk={chunk_name}")
+        return sorted(chunk_indices)
+
+    def _scan_chunk_names(self):
+        """
+        This finds the Chunks in a Group without a manifest from their metadata files, recording each in a new manifest
+        :return: A list of the Chunk names
+        """
+        chunk_names = []
+        for metadata_file in self._group_path.glob(f"{AuthorGroup.CHUNK_NAME_PREFIX}*{MetaData.METADATA_FILE_EXTENSION}"):
+            chunk_name = pathlib.Path(metadata_file.name[:-len(MetaData.METADATA_FILE_EXTENSION)])
+            chunk = Chunk(self._group_path, chunk_name, MetaData(self._group_path, chunk_name))
+            self._manifest.record(chunk_manifest_entry(chunk, 'closed'))
+            chunk_names.append(str(chunk_name))
+        return chunk_names
+
+    def _create_chunk(self, chunk_index):
+        """
+        This creates the AuthorChunk for a Chunk number, creating an empty Chunk file for a new Chunk. Readers find
+        Chunks through their metadata, which is only written once the first lines are, so a pre-created Chunk is not
+        visible to them
+        :param chunk_index: The number of the Chunk
+        :return: The AuthorChunk
+        """
+        chunk_name = self.chunk_name(chunk_index)
+        chunk_file = self._group_path.joinpath(chunk_name.with_suffix(Chunk.CHUNK_FILE_EXTENSION))
+        metadata_file = self._group_path.joinpath(chunk_name.with_suffix(MetaData.METADATA_FILE_EXTENSION))
+        if not os.path.exists(metadata_file) and os.path.exists(chunk_file) and os.path.getsize(chunk_file) == 0:
+            # Left pre-created by an earlier AuthorGroup which was not closed cleanly
+            os.remove(chunk_file)
+        author_chunk = AuthorChunk(self._group_path, chunk_name, **self._chunk_kwargs)
+        open(chunk_file, 'ab').close()
+        return author_chunk
+
+    def _push_chunk(self, chunk_name):
+        """
+        This adds a Chunk to the circular buffer of active Chunks, evicting the oldest Chunk on the background thread if
+        the buffer is full
+        :param chunk_name: The name of the Chunk to add
+        """
+        if self._chunks.is_full():
+            self._housekeep(self._evict_chunk, self._chunks.head())
+        self._chunks.push(chunk_name)
+
+    def _evict_chunk(self, chunk_name):
+        """
+        This archives or deletes a Chunk which has left the circular buffer
+        :param chunk_name: The name of the Chunk to evict
+        """
+        chunk = Chunk(self._group_path, chunk_name, MetaData(self._group_path, chunk_name))
+        if not os.path.exists(chunk.metadata.file):
+            # The Chunk was rolled over before any lines were written to it
+            if os.path.exists(chunk._chunk_file):
+                os.remove(chunk._chunk_file)
+            self._manifest.record(chunk_manifest_entry(chunk, 'deleted'))
+            return
+        self._manifest.record(chunk_manifest_entry(chunk, 'archived' if self._eviction == 'archive' else 'deleted'))
+        if self._eviction == 'delete':
+            chunk.delete()
+        elif self._archiver is not None:
+            self._archiver.archive(chunk)
+        else:
+            chunk.archive(self._archive_codec)
+        self._logger.debug(f"Evicted Chunk. chunk={chunk_name} eviction={self._eviction}")
+
+    def _close_chunk(self, author_chunk):
+        """
+        This closes a Chunk which is no longer being written to, and records it as closed in the manifest
+        :param author_chunk: The AuthorChunk to close
+        """
+        author_chunk.close()
+        self._manifest.record(chunk_manifest_entry(author_chunk, 'closed'))
+
+    def _housekeep(self, function, *args):
+        """
+        This runs a function on the background thread, logging any error it raises
+        """
+        def log_error(future):
+            if future.exception() is not None:
+                self._logger.error(f"Group housekeeping failed. group={self._group_path} error={future.exception()}")
+        self._housekeeping.submit(function, *args).add_done_callback(log_error)
+
+    @property
+    def chunk(self) -> AuthorChunk:
+        """
+        This is the AuthorChunk currently being written to
+        """
+        return self._chunk
+
+    @property
+    def metadata(self):
+        return self._chunk.metadata
+
+    @property
+    def chunk_names(self):
+        """
+        This is the names of the active Chunks in the Group, oldest first
+        """
+        with self._lock:
+            return [self._chunks[index] for index in range(len(self._chunks))]
+
+    def _rollover_required(self):
+        """
+        This decides if a new Chunk should be started based on the rollover thresholds
+        :return: True if a new Chunk should be started, False if not
+        """
+        rollover = self._rollover
+        if rollover.max_lines is not None and self._chunk.line_count >= rollover.max_lines:
+            return True
+        if rollover.max_bytes is not None and self._chunk.byte_count >= rollover.max_bytes:
+            return True
+        if rollover.max_age_ms is not None and (time.monotonic() - self._chunk_started) * 1000 >= rollover.max_age_ms:
+            return self._chunk.line_count > 0
+        return False
+
+    def rollover(self):
+        """
+        This starts a new Chunk now. The pre-created Chunk becomes the active Chunk, and the previous Chunk is closed
+        (and the oldest Chunk evicted if required) on the background thread. The Chunk after it is pre-created on its
+        own thread, so it is ready by the next rollover however long the eviction takes
+        """
+        with self._lock:
+            if self._closed:
+                raise AuthorGroupError("Unable to roll over, the group has been closed")
+            previous_chunk = self._chunk
+            try:
+                self._chunk = self._next_chunk.result()
+            except Exception as e:
+                raise AuthorGroupError(f"Unable to create the next Chunk: {e}") from None
+            self._chunk_index += 1
+            self._chunk_started = time.monotonic()
+            self._housekeep(self._close_chunk, previous_chunk)
+            self._housekeep(self._manifest.record, chunk_manifest_entry(self._chunk, 'active'))
+            self._push_chunk(self.chunk_name(self._chunk_index))
+            self._next_chunk = self._chunk_creation.submit(self._create_chunk, self._chunk_index + 1)
+            if self._rollovers_metric is not None:
+                self._rollovers_metric.add()
+            self._logger.debug(f"Rolled over to new Chunk. group={self._group_path} chunk={self._chunk_index}")
+
+    def write_line(self, line_data):
+        """
+        This writes a new line to the Group, timestamped now
+        :param line_data: This is the new line data to write (it should be able to be represented as a string)
+        """
+        self.write_lines((line_data,))
+
+    def write_lines(self, lines_data, timestamps=None):
+        """
+        This writes a batch of lines to the Group, rolling over to a new Chunk first if the thresholds have been reached
+        :param lines_data: This is an iterable of the new line data to write
+        :param timestamps: This is an optional iterable of ms timestamps, one per line. When not given the lines are
+        timestamped now
+        """
+        with self._lock:
+            if self._closed:
+                raise AuthorGroupError("Unable to write lines, the group has been closed")
+            if self._rollover_required():
+                self.rollover()
+            self._chunk.write_lines(lines_data, timestamps)
+
+    def flush(self):
+        """
+        This flushes any lines buffered in the active Chunk
+        """
+        with self._lock:
+            self._chunk.flush()
+
+    def close(self):
+        """
+        This closes the active Chunk, waits for the background threads to finish creating, closing and evicting Chunks,
+        and removes the pre-created Chunk
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._housekeeping.shutdown(wait=True)
+            self._chunk_creation.shutdown(wait=True)
+            self._close_chunk(self._chunk)
+            try:
+                next_chunk = self._next_chunk.result()
+                if next_chunk.line_count == 0 and os.path.getsize(next_chunk._chunk_file) == 0:
+                    os.remove(next_chunk._chunk_file)
+            except Exception as e:
+                self._logger.debug(f"Unable to remove the pre-created Chunk. group={self._group_path} error={e}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -1,8 +1,12 @@
 from collections import namedtuple
 import logging
+import os
 import pathlib
 import json
+import threading
+import time
 from chunky_logs.common.metadata import MetaData, MetaDataError
+from chunky_logs.common.metrics import get_default_metrics
 
 class AuthorMetaDataError(MetaDataError):
     pass
@@ -17,13 +21,45 @@ class AuthorMetaData(MetaData):
     This represents an Authored Metadata instance, it should support updating and writing out metadata information to
     disk
     """
-    def __init__(self, group_path: pathlib.Path, chunk_name: pathlib.Path):
+    METADATA_TEMP_FILE_EXTENSION = '.tmp'
+
+    __slots__ = ('_write_metric', '_write_interval_ms', '_serialized', '_dirty_keys', '_last_write', '_temp_file',
+                 '_lock', '_write_timer')
+
+    def __init__(self, group_path: pathlib.Path, chunk_name: pathlib.Path, write_interval_ms: int = None,
+                 metrics=None, lock=None):
+        """
+        This is the constructor for an AuthorMetaData
+        :param group_path: This is the path to the group under which the chunk lives
+        :param chunk_name: This is the name of the chunk the metadata is for
+        :param write_interval_ms: When set, changes are coalesced and sync() will only write them to disk once this
+        interval has passed since the last write, a sync() which is declined schedules a write for when it has. When
+        None every sync() with changes pending writes to disk
+        :param metrics: The metrics sink to record metadata writes to, None uses the default sink (if any)
+        :param lock: The lock held while the metadata is changed, a scheduled write takes it so it never writes part of
+        a change. None creates one
+        """
         self._logger = logging.getLogger(self.__class__.__name__)
+        metrics = metrics if metrics is not None else get_default_metrics()
+        self._write_metric = None if metrics is None else metrics.histogram('metadata.write_ns')
+        self._write_interval_ms = write_interval_ms
+        self._serialized = {}
+        self._dirty_keys = set()
+        self._last_write = time.monotonic()
+        self._lock = lock or threading.RLock()
+        self._write_timer = None
         super().__init__(group_path, chunk_name)
+        self._temp_file = self.file.with_name(self.file.name + AuthorMetaData.METADATA_TEMP_FILE_EXTENSION)
+
+    def _set_value(self, key, value):
+        if key not in MetaData.KEY_FIELDS and key not in self._custom:
+            raise KeyError(key)
+        self._set_item(key, value, self._custom[key]['type'] if key in self._custom else None)
+        self._dirty_keys.add(key)
 
     @MetaData._data_key_exception
     def __setitem__(self, key, value):
-        self._metadata[key]['value'] = value
+        self._set_value(key, value)
 
     def add(self, item: AuthorMetaDataItem):
         """
@@ -35,39 +71,141 @@ class AuthorMetaData(MetaData):
             raise AuthorMetaDataError(f"Unknown value type not in schema: {item.type}")
 
         try:
-            self._metadata[item.key] = {
-                "value": self._type_schema[item.type](item.value),
-                "type": item.type
-            }
+            self._set_item(item.key, self._type_schema[item.type](item.value), item.type)
         except ValueError as e:
             raise AuthorMetaDataError(f"Mismatch value type vs data schema: key={item.key} value={item.value} type{item.type}") from None
+        self._dirty_keys.add(item.key)
 
-        self._logger.debug(f"Added new metadata: key={item.key} value={item.value} type{item.type}")
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._logger.debug(f"Added new metadata: key={item.key} value={item.value} type{item.type}")
 
     @MetaData.chunk_file.setter
     def chunk_file(self, chunk_file: pathlib.Path):
-        self._metadata[MetaData.CHUNK_FILENAME_KEY]['value'] = chunk_file
+        self._set_value(MetaData.CHUNK_FILENAME_KEY, chunk_file)
 
     @MetaData.chunk_time_create.setter
     def chunk_time_create(self, time_create: int):
-        self._metadata[MetaData.CHUNK_TIME_CREATE_KEY]['value'] = time_create
+        self._set_value(MetaData.CHUNK_TIME_CREATE_KEY, time_create)
 
     @MetaData.chunk_time_update.setter
     def chunk_time_update(self, time_update: int):
-        self._metadata[MetaData.CHUNK_TIME_UPDATE_KEY]['value'] = time_update
+        self._set_value(MetaData.CHUNK_TIME_UPDATE_KEY, time_update)
 
     @MetaData.chunk_line_count.setter
     def chunk_line_count(self, line_count: int):
-        self._metadata[MetaData.CHUNK_LINE_COUNT_KEY]['value'] = line_count
+        self._set_value(MetaData.CHUNK_LINE_COUNT_KEY, line_count)
 
     @MetaData.chunk_checksum_hash.setter
     def chunk_checksum_hash(self, checksum_hash: str):
-        self._metadata[MetaData.CHUNK_CHECKSUM_HASH_KEY]['value'] = checksum_hash
+        self._set_value(MetaData.CHUNK_CHECKSUM_HASH_KEY, checksum_hash)
+
+    @MetaData.chunk_checksum_type.setter
+    def chunk_checksum_type(self, checksum_type: str):
+        self._set_value(MetaData.CHUNK_CHECKSUM_TYPE_KEY, checksum_type)
+
+    @property
+    def is_dirty(self) -> bool:
+        return bool(self._dirty_keys)
+
+    def read_from_disk(self):
+        """
+        This will update the metadata data with that stored on disk, discarding any unwritten changes
+        :return: None
+        """
+        super().read_from_disk()
+        self._serialized = {}
+        self._dirty_keys = set()
+
+    def sync(self):
+        """
+        This writes the metadata to disk if it has changed, and the write interval (if any) has passed since the last
+        write. The first write of new metadata is never held back. When the interval has not yet passed a write is
+        scheduled for when it has, so the changes reach disk even if sync() is not called again
+        :return: True if the metadata was written, False if not
+        """
+        with self._lock:
+            if not self.is_dirty:
+                return False
+            if self._write_interval_ms is not None and os.path.exists(self.file):
+                remaining_ms = self._write_interval_ms - (time.monotonic() - self._last_write) * 1000
+                if remaining_ms > 0:
+                    self._schedule_write(remaining_ms)
+                    return False
+            self.write_to_disk()
+            return True
+
+    def _schedule_write(self, delay_ms):
+        """
+        This starts a timer to sync the metadata once the write interval has passed, unless one is already running
+        :param delay_ms: The time until the write interval has passed
+        """
+        if self._write_timer is not None:
+            return
+        self._write_timer = threading.Timer(delay_ms / 1000, self._scheduled_write)
+        self._write_timer.daemon = True
+        self._write_timer.start()
+
+    def _scheduled_write(self):
+        with self._lock:
+            self._write_timer = None
+            try:
+                self.sync()
+            except Exception as e:
+                self._logger.error(f"Scheduled metadata write failed: file={self.file} error={e}")
+
+    def close(self):
+        """
+        This writes out any changes which have not yet been written to disk, and stops any scheduled write
+        """
+        with self._lock:
+            if self._write_timer is not None:
+                self._write_timer.cancel()
+                self._write_timer = None
+            if self.is_dirty:
+                self.write_to_disk()
+
+    def serialize(self) -> str:
+        """
+        This serializes the current metadata, only keys which have changed since the last serialization are
+        re-serialized. The metadata is then treated as written, use write_serialized() to write out the result
+        :return: The metadata JSON
+        """
+        for key, item in self._items():
+            if key in self._dirty_keys or key not in self._serialized:
+                self._serialized[key] = f"{json.dumps(key)}: {json.dumps(item, default=str)}"
+        self._dirty_keys = set()
+        return f"{{{', '.join(self._serialized.values())}}}"
+
+    def write_serialized(self, metadata_json: str, durable: bool = False):
+        """
+        This writes serialized metadata to disk. It is written to a temporary file which then replaces the metadata
+        file, so readers never see a partially written file
+        :param metadata_json: The metadata JSON, from serialize()
+        :param durable: When True the temporary file is synced before it replaces the metadata file, and the directory
+        is synced after, so the new metadata survives a host crash
+        """
+        if self._write_metric is not None:
+            write_start = time.perf_counter_ns()
+        with open(self._temp_file, 'w') as metadata_data:
+            metadata_data.write(metadata_json)
+            if durable:
+                metadata_data.flush()
+                os.fsync(metadata_data.fileno())
+        os.replace(self._temp_file, self.file)
+        if durable:
+            directory_fd = os.open(self.file.parent, os.O_RDONLY)
+            try:
+                os.fsync(directory_fd)
+            finally:
+                os.close(directory_fd)
+        self._last_write = time.monotonic()
+        if self._write_metric is not None:
+            self._write_metric.record(time.perf_counter_ns() - write_start)
 
-    def write_to_disk(self):
+    def write_to_disk(self, durable: bool = False):
         """
-        This will write the current metadata to disk
+        This will write the current metadata to disk, replacing the metadata file atomically
+        :param durable: When True the metadata file is synced to disk (see write_serialized())
         :return:
         """
-        with open(self.file, 'w') as metadata_data:
-            json.dump(self._metadata, metadata_data)
\ No newline at end of file
+        self.write_serialized(self.serialize(), durable)
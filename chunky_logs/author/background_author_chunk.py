@@ -0,0 +1,168 @@
+from collections import deque
+import logging
+import pathlib
+import threading
+import time
+from chunky_logs.author.author_chunk import AuthorChunk
+
+class BackgroundAuthorChunkError(RuntimeError):
+    pass
+
+class BackgroundAuthorChunkQueueFull(BackgroundAuthorChunkError):
+    pass
+
+class BackgroundAuthorChunk:
+    """
+    This class is a thread safe front end for authoring to a Chunk. Producer threads only timestamp each line and add
+    it to a bounded queue, a single drain thread takes everything queued and writes it to the Chunk (and its metadata)
+    as one batch. When the queue is full the backpressure policy decides what happens to a new line:
+      - 'block' waits for the drain thread to make space
+      - 'drop_oldest' discards the oldest queued line to make space
+      - 'raise' raises BackgroundAuthorChunkQueueFull
+    """
+    BACKPRESSURE_POLICIES = ('block', 'drop_oldest', 'raise')
+
+    def __init__(self, author_chunk: AuthorChunk, max_queued_lines: int = 64 * 1024, backpressure: str = 'block'):
+        """
+        This is the constructor for a BackgroundAuthorChunk, which starts the drain thread
+        :param author_chunk: The AuthorChunk to write to, it is closed when this is closed
+        :param max_queued_lines: The maximum number of lines which can be queued waiting to be written
+        :param backpressure: The policy for when the queue is full, one of BACKPRESSURE_POLICIES
+        """
+        self._logger = logging.getLogger(self.__class__.__name__)
+        if backpressure not in BackgroundAuthorChunk.BACKPRESSURE_POLICIES:
+            raise BackgroundAuthorChunkError(f"Unknown backpressure policy: {backpressure}")
+        self._author_chunk = author_chunk
+        self._max_queued_lines = max_queued_lines
+        self._backpressure = backpressure
+
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._drained = threading.Condition(self._lock)
+        self._queue = deque()
+        self._drain_waiting = False
+        self._queued_count = 0
+        self._done_count = 0
+        self._dropped_count = 0
+        self._closing = False
+        self._error = None
+
+        self._drain_thread = threading.Thread(target=self._drain, daemon=True,
+                                              name=f"BackgroundAuthorChunk-{author_chunk._chunk_name}")
+        self._drain_thread.start()
+
+    @classmethod
+    def open(cls, group_path: pathlib.Path, chunk_name: pathlib.Path, max_queued_lines: int = 64 * 1024,
+             backpressure: str = 'block', **kwargs):
+        """
+        This creates a BackgroundAuthorChunk for a new AuthorChunk
+        :param group_path: This is the path to the group under which this chunk lives
+        :param chunk_name: This is the name for the chunk this instance represents
+        :param max_queued_lines: The maximum number of lines which can be queued waiting to be written
+        :param backpressure: The policy for when the queue is full, one of BACKPRESSURE_POLICIES
+        :param kwargs: Any further arguments for the AuthorChunk
+        :return: The BackgroundAuthorChunk
+        """
+        return cls(AuthorChunk(group_path, chunk_name, **kwargs), max_queued_lines, backpressure)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def metadata(self):
+        return self._author_chunk.metadata
+
+    @property
+    def dropped_count(self) -> int:
+        """
+        This is the number of lines discarded by the 'drop_oldest' backpressure policy
+        """
+        return self._dropped_count
+
+    def write_line(self, line_data):
+        """
+        This queues a new line to be written to the Chunk, timestamped as it is queued. The timestamp is taken under
+        the lock so the queued lines stay in timestamp order across producer threads
+        :param line_data: This is the new line data to write (it should be able to be represented as a string)
+        """
+        with self._lock:
+            if self._error is not None:
+                raise BackgroundAuthorChunkError(f"Drain thread failed: {self._error}")
+            if self._closing:
+                raise BackgroundAuthorChunkError("Unable to write line, the chunk has been closed")
+            if len(self._queue) >= self._max_queued_lines:
+                if self._backpressure == 'raise':
+                    raise BackgroundAuthorChunkQueueFull(f"Queue is full: max_queued_lines={self._max_queued_lines}")
+                elif self._backpressure == 'drop_oldest':
+                    self._queue.popleft()
+                    self._dropped_count += 1
+                    self._done_count += 1
+                else:
+                    while len(self._queue) >= self._max_queued_lines and self._error is None:
+                        self._not_full.wait()
+                    if self._error is not None or self._closing:
+                        raise BackgroundAuthorChunkError("Unable to write line, the chunk has been closed or failed")
+            self._queue.append((int(time.time_ns() / 1000000), line_data))
+            self._queued_count += 1
+            if self._drain_waiting:
+                self._drain_waiting = False
+                self._not_empty.notify()
+
+    def _drain(self):
+        """
+        This is the drain thread, it writes each batch of queued lines until the chunk is closed
+        """
+        while True:
+            with self._lock:
+                while not self._queue and not self._closing:
+                    self._drain_waiting = True
+                    self._not_empty.wait()
+                if not self._queue:
+                    return
+                records, self._queue = self._queue, deque()
+                self._not_full.notify_all()
+
+            try:
+                self._author_chunk.write_lines([line_data for _, line_data in records],
+                                               [time_ms for time_ms, _ in records])
+            except Exception as e:
+                self._logger.error(f"Unable to write lines to Chunk. error={e}")
+                with self._lock:
+                    self._error = e
+                    self._not_full.notify_all()
+                    self._drained.notify_all()
+                return
+
+            with self._lock:
+                self._done_count += len(records)
+                self._drained.notify_all()
+
+    def flush(self):
+        """
+        This waits for every line queued so far to be written, and then flushes the Chunk
+        """
+        with self._lock:
+            target_count = self._queued_count
+            while self._done_count < target_count and self._error is None:
+                self._drained.wait()
+            if self._error is not None:
+                raise BackgroundAuthorChunkError(f"Drain thread failed: {self._error}")
+        self._author_chunk.flush()
+
+    def close(self):
+        """
+        This writes every queued line, stops the drain thread and closes the Chunk
+        """
+        with self._lock:
+            if self._closing:
+                return
+            self._closing = True
+            self._not_empty.notify()
+        self._drain_thread.join()
+        self._author_chunk.close()
+        if self._error is not None:
+            raise BackgroundAuthorChunkError(f"Drain thread failed: {self._error}")
@@ -0,0 +1,232 @@
+import fcntl
+import logging
+import os
+import pathlib
+import threading
+import time
+from chunky_logs.common.chunk import Chunk
+from chunky_logs.common.hashing import new_checksum
+from chunky_logs.common.line_index import LineIndex, line_timestamp
+from chunky_logs.common.metadata import MetaData
+from chunky_logs.author.author_metadata import AuthorMetaData
+
+class SharedAuthorChunkError(RuntimeError):
+    pass
+
+class SharedAuthorChunk(Chunk):
+    """
+    This class authors data to a Chunk which is shared by several processes on the same host. Every process appends
+    whole batches of lines with a single O_APPEND write, so lines from different processes never interleave, and never
+    touches the metadata. One process, the leader, holds an advisory lock on the Chunk's lock file and periodically
+    catches up with everything appended since it last looked, updating the checksum, line count, index and metadata.
+    Should the leader exit (or crash, which releases its lock) another process takes over, rebuilding the checksum
+    from the Chunk file if the metadata was not left in step with it
+    """
+    CHUNK_LOCK_EXTENSION = '.lock'
+    READ_BLOCK_SIZE = 1024 * 1024
+
+    def __init__(self, group_path: pathlib.Path, chunk_name: pathlib.Path, sync_interval_ms: int = 100,
+                 index_stride: int = LineIndex.DEFAULT_STRIDE, checksum_type: str = 'md5'):
+        """
+        This is the constructor for a SharedAuthorChunk
+        :param group_path: This is the path to the group under which this chunk lives
+        :param chunk_name: This is the name for the chunk this instance represents
+        :param sync_interval_ms: The interval at which the leader catches up with appended lines and writes the metadata
+        :param index_stride: The number of lines between each entry in the Chunk's line index
+        :param checksum_type: The checksum algorithm if this process creates the Chunk (see CHECKSUM_TYPES)
+        """
+        self._logger = logging.getLogger(self.__class__.__name__)
+        super().__init__(group_path, chunk_name, MetaData(group_path, chunk_name))
+        self._lock_file = self._group_path.joinpath(self._chunk_name.with_suffix(SharedAuthorChunk.CHUNK_LOCK_EXTENSION))
+        self._optional_managed_files.append(self._lock_file)
+        self._sync_interval_ms = sync_interval_ms
+        self._index_stride = index_stride
+        self._checksum_type = checksum_type
+
+        self._chunk_fd = os.open(self._chunk_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._lock_fd = os.open(self._lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+        self._lock = threading.Lock()
+        self._is_leader = False
+        self._chunk_hash = None
+        self._line_index = None
+        self._closed = False
+
+        with self._lock:
+            self._try_lead()
+        self._stop_sync = threading.Event()
+        self._sync_thread = threading.Thread(target=self._sync_loop, name=f"SharedAuthorChunk-{chunk_name}",
+                                             daemon=True)
+        self._sync_thread.start()
+
+    @property
+    def is_leader(self) -> bool:
+        return self._is_leader
+
+    def write_line(self, line_data):
+        """
+        This appends a new line to the Chunk, timestamped now
+        :param line_data: This is the new line data to write (it should be able to be represented as a string)
+        """
+        self.write_lines((line_data,))
+
+    def write_lines(self, lines_data, timestamps=None):
+        """
+        This appends a batch of lines to the Chunk with a single write, so the batch is never interleaved with lines
+        from other processes. The metadata is updated by the leader
+        :param lines_data: This is an iterable of the new line data to write
+        :param timestamps: This is an optional iterable of ms timestamps, one per line. When not given each line is
+        timestamped as it is taken from lines_data. Raises ValueError, without writing any lines, if there is not one
+        timestamp per line
+        """
+        if timestamps is None:
+            chunk_bytes = ''.join(f"{int(time.time_ns() / 1000000)},{str(line_data)}\n"
+                                  for line_data in lines_data).encode('utf-8')
+        else:
+            lines_data, timestamps = list(lines_data), list(timestamps)
+            if len(timestamps) != len(lines_data):
+                raise ValueError(f"Expected one timestamp per line: lines={len(lines_data)} "
+                                 f"timestamps={len(timestamps)}")
+            chunk_bytes = ''.join(f"{time_ms},{str(line_data)}\n"
+                                  for time_ms, line_data in zip(timestamps, lines_data)).encode('utf-8')
+
+        # Writing the rest of a short write separately could interleave it with another process's lines, so a short
+        # write is raised rather than retried
+        written = os.write(self._chunk_fd, chunk_bytes)
+        if written != len(chunk_bytes):
+            raise SharedAuthorChunkError(f"Short write to chunk: file={self._chunk_file} written={written} "
+                                         f"expected={len(chunk_bytes)}")
+
+    def _try_lead(self):
+        """
+        This tries to become the leader without blocking. On becoming the leader the in memory checksum is reused if
+        this process was the last leader, otherwise it is rebuilt from the Chunk file
+        :return: True if this process is now the leader, False if another process is
+        """
+        if self._is_leader:
+            return True
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+
+        self._is_leader = True
+        metadata = AuthorMetaData(self._group_path, self._chunk_name)
+        if self._chunk_hash is not None and metadata.chunk_line_count == self._line_index.line_count and \
+                metadata.chunk_checksum_hash == self._chunk_hash.hexdigest():
+            self.metadata = metadata
+            self._logger.debug(f"Resumed as leader. file={self._chunk_file}")
+            return True
+
+        if not os.path.exists(metadata.file):
+            metadata.chunk_checksum_type = self._checksum_type
+        metadata.chunk_line_count = 0
+        metadata.chunk_time_update = 0
+        self.metadata = metadata
+        self._chunk_hash = new_checksum(metadata.chunk_checksum_type)
+        self._line_index = LineIndex(self._index_stride)
+        self._catch_up(rebuild_index=True)
+        self._logger.debug(f"Became leader, rebuilt checksum and index. file={self._chunk_file}")
+        return True
+
+    def _catch_up(self, rebuild_index=False):
+        """
+        This adds every complete line appended to the Chunk since the last catch up to the checksum, line count, index
+        and metadata, and writes the metadata. This must only be called by the leader
+        :param rebuild_index: When True the index file is rewritten, rather than appended to
+        :return: True if any lines were added, False if not
+        """
+        new_entries = []
+        line_count = 0
+        time_create = None
+        time_update = self.metadata.chunk_time_update
+        remainder = b''
+        read_pos = self._line_index.end_pos
+        with open(self._chunk_file, 'rb', buffering=0) as chunk_data:
+            chunk_data.seek(read_pos)
+            for block in iter(lambda: chunk_data.read(SharedAuthorChunk.READ_BLOCK_SIZE), b""):
+                block = remainder + block
+                end = block.rfind(b'\n') + 1
+                lines, remainder = block[:end], block[end:]
+                if not lines:
+                    continue
+                self._chunk_hash.update(lines)
+                new_entries.extend(self._line_index.add(lines))
+                line_count += lines.count(b'\n')
+                try:
+                    if time_create is None:
+                        time_create = line_timestamp(lines)
+                    # Lines from different processes may be slightly out of order, keep the latest
+                    time_update = max(time_update, line_timestamp(lines[lines.rfind(b'\n', 0, end - 1) + 1:]))
+                except ValueError:
+                    pass
+
+        if rebuild_index:
+            self._line_index.write_to_file(self._index_file)
+        elif new_entries:
+            self._line_index.append_to_file(self._index_file, new_entries)
+        if line_count == 0:
+            if rebuild_index:
+                self.metadata.write_to_disk()
+            return False
+
+        if self.metadata.chunk_line_count == 0 and time_create is not None:
+            self.metadata.chunk_time_create = time_create
+        self.metadata.chunk_line_count += line_count
+        self.metadata.chunk_time_update = time_update
+        self.metadata.chunk_checksum_hash = self._chunk_hash.hexdigest()
+        self.metadata.write_to_disk()
+        return True
+
+    def _release(self):
+        """
+        This writes out the metadata and gives up leadership, so that another process can take over
+        """
+        self.metadata.close()
+        fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+        self._is_leader = False
+
+    def _sync_loop(self):
+        """
+        This is the sync thread, the leader catches up on each interval, other processes check if the leader has gone
+        """
+        while not self._stop_sync.wait(self._sync_interval_ms / 1000):
+            with self._lock:
+                try:
+                    if self._try_lead():
+                        self._catch_up()
+                except Exception as e:
+                    self._logger.error(f"Unable to sync shared Chunk. file={self._chunk_file} error={e}")
+
+    def sync(self):
+        """
+        This catches up with the appended lines and writes the metadata now, if this process is the leader
+        :return: True if this process is the leader, False if not
+        """
+        with self._lock:
+            if self._try_lead():
+                self._catch_up()
+                return True
+            return False
+
+    def close(self):
+        """
+        This stops the sync thread and closes the Chunk. The leader catches up before giving up leadership, and a
+        process which is not the leader takes over if there is no leader left to account for its lines
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._stop_sync.set()
+        self._sync_thread.join()
+        with self._lock:
+            # Lines appended after a leader's final catch up, but before it released the lock, are caught up here by
+            # whichever process releases last
+            end_pos = None
+            while self._try_lead():
+                self._catch_up()
+                self._release()
+                if os.fstat(self._chunk_fd).st_size <= self._line_index.end_pos or self._line_index.end_pos == end_pos:
+                    break
+                end_pos = self._line_index.end_pos
+        os.close(self._chunk_fd)
+        os.close(self._lock_fd)
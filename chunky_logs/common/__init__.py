@@ -1,3 +1,6 @@
 """common"""
 from chunky_logs.common.chunk import Chunk, ChunkManagedFileError
 from chunky_logs.common.metadata import MetaData, MetaDataError, MetaDataSourceError, MetaDataKeyError
+from chunky_logs.common.archiver import ChunkArchiver, ChunkArchiverError
+from chunky_logs.common.metrics import MetricsRegistry, MetricsCallbackSink, set_default_metrics, get_default_metrics
+from chunky_logs.common.group_manifest import GroupManifest, GroupManifestEntry, GroupManifestError
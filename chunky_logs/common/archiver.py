@@ -0,0 +1,168 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from zipfile import ZipFile
+from chunky_logs.common.block_codec import iter_blocks
+from chunky_logs.common.chunk import Chunk, ARCHIVE_CODECS
+from chunky_logs.common.hashing import new_checksum
+
+class ChunkArchiverError(RuntimeError):
+    pass
+
+def archive_chunk_files(archive_file, files, chunk_file, checksum_hash, checksum_type='md5', block_codec=None,
+                        codec='deflate', level=None, block_size=1024 * 1024):
+    """
+    This zips up the managed files of a Chunk, verifies the archive and then removes the files. The archive is written
+    to a temporary file and only moved into place once it has been verified, so a failed archive leaves the Chunk as it
+    was. This is a module level function so that it can be run in a worker process
+    :param archive_file: The archive file to create
+    :param files: The managed files to archive
+    :param chunk_file: The chunk file, which must be one of files
+    :param checksum_hash: The checksum hash of the chunk's logical contents, from its metadata
+    :param checksum_type: The checksum algorithm the checksum hash was created with (see CHECKSUM_TYPES)
+    :param block_codec: The block codec the chunk was written with, None for a plain chunk
+    :param codec: The codec to compress the archive with (see ARCHIVE_CODECS)
+    :param level: The compression level, None uses the codec's default
+    :param block_size: The size of the blocks to read the archived chunk in while verifying it
+    :return: The archive file on success, raises ChunkArchiverError on failure
+    """
+    temp_file = f"{archive_file}.tmp"
+    try:
+        with ZipFile(temp_file, 'w', compression=ARCHIVE_CODECS[codec], compresslevel=level) as archive:
+            for file in files:
+                archive.write(file, arcname=os.path.basename(file))
+
+        # Reading each member back checks its CRC, the chunk member is also checked against the metadata checksum
+        chunk_hash = new_checksum(checksum_type)
+        with ZipFile(temp_file, 'r') as archive:
+            for file in files:
+                with archive.open(os.path.basename(file)) as member:
+                    if file != chunk_file:
+                        for _ in iter(lambda: member.read(block_size), b""):
+                            pass
+                    elif block_codec is None:
+                        for block in iter(lambda: member.read(block_size), b""):
+                            chunk_hash.update(block)
+                    else:
+                        for block in iter_blocks(member, block_codec):
+                            chunk_hash.update(block)
+        if chunk_hash.hexdigest() != checksum_hash:
+            raise ChunkArchiverError(f"Archived chunk does not match its checksum: file={chunk_file} "
+                                     f"expected={checksum_hash} actual={chunk_hash.hexdigest()}")
+
+        os.replace(temp_file, archive_file)
+    except ChunkArchiverError:
+        os.remove(temp_file)
+        raise
+    except Exception as e:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise ChunkArchiverError(f"Unable to archive chunk: file={chunk_file} error={e}") from None
+
+    for file in files:
+        try:
+            os.remove(file)
+        except OSError as e:
+            raise ChunkArchiverError(f"Unable to remove managed file: {e}") from None
+    return archive_file
+
+class ChunkArchiver:
+    """
+    This class archives Chunks in the background. Chunks are queued by archive(), which never waits on the archiving,
+    and a dispatcher thread passes them to a pool of worker processes to be compressed and verified. The pool is only
+    started once the first Chunk is archived
+    """
+    def __init__(self, workers: int = None, codec: str = 'deflate', level: int = None, mp_context=None):
+        """
+        This is the constructor for a ChunkArchiver
+        :param workers: The number of worker processes, None uses the number of CPUs
+        :param codec: The codec to compress archives with (see ARCHIVE_CODECS)
+        :param level: The compression level, None uses the codec's default
+        :param mp_context: The multiprocessing context for the worker processes, None uses the forkserver context (spawn
+        where forkserver is not available). The pool is started from the dispatcher thread of a process which is usually
+        running other threads, and forking such a process can copy a lock held by another thread into the worker
+        """
+        self._logger = logging.getLogger(self.__class__.__name__)
+        if codec not in ARCHIVE_CODECS:
+            raise ChunkArchiverError(f"Unknown archive codec: {codec}")
+        self._workers = workers
+        self._codec = codec
+        self._level = level
+        if mp_context is None:
+            start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            mp_context = multiprocessing.get_context(start_method)
+        self._mp_context = mp_context
+        self._executor = None
+        self._queue = queue.SimpleQueue()
+        self._closed = False
+        self._dispatcher = threading.Thread(target=self._dispatch, name='ChunkArchiver', daemon=True)
+        self._dispatcher.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def archive(self, chunk: Chunk) -> Future:
+        """
+        This queues a Chunk to be archived. The Chunk is closed first, so any buffered lines and metadata are written
+        before it is archived
+        :param chunk: The Chunk to archive
+        :return: A Future which resolves to the archive file, or raises ChunkArchiverError if archiving failed
+        """
+        if self._closed:
+            raise ChunkArchiverError("Unable to archive chunk, the archiver has been closed")
+        chunk.close()
+        future = Future()
+        request = (chunk._archive_file, chunk._existing_managed_files(), chunk._chunk_file,
+                   chunk.metadata.chunk_checksum_hash, chunk.metadata.chunk_checksum_type,
+                   chunk.metadata.chunk_block_codec)
+        self._queue.put((future, request))
+        return future
+
+    def _dispatch(self):
+        """
+        This passes queued Chunks to the worker processes until the archiver is closed
+        """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            future, request = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(self._workers, mp_context=self._mp_context)
+                worker_future = self._executor.submit(archive_chunk_files, *request, codec=self._codec,
+                                                      level=self._level)
+            except Exception as e:
+                future.set_exception(ChunkArchiverError(f"Unable to start archiving chunk: {e}"))
+                continue
+            self._logger.debug(f"Archiving Chunk. archive={request[0]}")
+            worker_future.add_done_callback(lambda done, future=future: self._complete(done, future))
+
+    @staticmethod
+    def _complete(worker_future, future):
+        exception = worker_future.exception()
+        if exception is None:
+            future.set_result(worker_future.result())
+        else:
+            future.set_exception(exception)
+
+    def close(self, wait: bool = True):
+        """
+        This stops accepting Chunks and shuts down the archiver
+        :param wait: If True this waits for all queued Chunks to be archived
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._dispatcher.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
@@ -0,0 +1,18 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+_io_executor = None
+_io_executor_lock = threading.Lock()
+
+def default_io_executor():
+    """
+    This gets the executor which the async Chunks use for file I/O by default. It is a single dedicated thread shared by
+    every async Chunk in the process, so that any number of Chunks can share one event loop without each holding a
+    thread of their own. It is created on first use
+    :return: The shared ThreadPoolExecutor
+    """
+    global _io_executor
+    with _io_executor_lock:
+        if _io_executor is None:
+            _io_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='chunky-logs-io')
+        return _io_executor
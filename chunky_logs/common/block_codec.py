@@ -0,0 +1,189 @@
+from array import array
+import bisect
+import io
+import lzma
+import os
+import struct
+import zlib
+
+class BlockCodecError(RuntimeError):
+    pass
+
+BLOCK_CODECS = {
+    'zlib': (lambda data, level: zlib.compress(data, -1 if level is None else level), zlib.decompress),
+    'lzma': (lambda data, level: lzma.compress(data, preset=level), lzma.decompress),
+}
+
+# Each block is stored as a frame of <compressed length><logical length><compressed data>
+FRAME_HEADER = struct.Struct('<II')
+
+def _codec(codec):
+    try:
+        return BLOCK_CODECS[codec]
+    except KeyError:
+        raise BlockCodecError(f"Unknown block codec: {codec}") from None
+
+def encode_block(data, codec, level=None):
+    """
+    This compresses a block of chunk data into a frame, which can be appended to a block compressed chunk file
+    :param data: The logical (uncompressed) chunk data for the block
+    :param codec: The name of the codec to compress with (see BLOCK_CODECS)
+    :param level: The compression level, None uses the codec's default
+    :return: The frame bytes
+    """
+    compressed = _codec(codec)[0](data, level)
+    return FRAME_HEADER.pack(len(compressed), len(data)) + compressed
+
+def iter_blocks(chunk_data, codec):
+    """
+    This reads the frames of a block compressed chunk in order, without needing the file to be seekable
+    :param chunk_data: A binary file handle positioned at the start of a frame
+    :param codec: The name of the codec the chunk was compressed with
+    :return: Yields the logical data of each complete frame
+    """
+    decompress = _codec(codec)[1]
+    while True:
+        header = chunk_data.read(FRAME_HEADER.size)
+        if len(header) < FRAME_HEADER.size:
+            return
+        compressed_size, _ = FRAME_HEADER.unpack(header)
+        compressed = chunk_data.read(compressed_size)
+        if len(compressed) < compressed_size:
+            return
+        try:
+            yield decompress(compressed)
+        except (zlib.error, lzma.LZMAError) as e:
+            raise BlockCodecError(f"Unable to decompress block: error={e}") from None
+
+class BlockReader(io.RawIOBase):
+    """
+    This presents the logical (uncompressed) contents of a block compressed chunk file as a seekable binary stream. The
+    frames are indexed from their headers, so seeking only needs to decompress the block holding the new position. A
+    partially written frame at the end of the file is ignored until it has been completed
+    """
+    def __init__(self, chunk_file, codec):
+        """
+        This is the constructor for a BlockReader
+        :param chunk_file: The block compressed chunk file to read
+        :param codec: The name of the codec the chunk file was compressed with
+        """
+        super().__init__()
+        self._decompress = _codec(codec)[1]
+        self._file = open(chunk_file, 'rb', buffering=0)
+        self._block_offsets = array('Q')
+        self._block_starts = array('Q')
+        self._block_sizes = array('Q')
+        self._scan_pos = 0
+        self._size = 0
+        self._pos = 0
+        self._cached_block = None
+        self._cached_data = b''
+
+    def _refresh(self):
+        """
+        This indexes any complete frames which have been appended since the last refresh
+        :return: True if any frames were added, False if not
+        """
+        file_size = os.fstat(self._file.fileno()).st_size
+        added = False
+        while self._scan_pos + FRAME_HEADER.size <= file_size:
+            compressed_size, logical_size = FRAME_HEADER.unpack(
+                os.pread(self._file.fileno(), FRAME_HEADER.size, self._scan_pos))
+            if self._scan_pos + FRAME_HEADER.size + compressed_size > file_size:
+                break
+            self._block_offsets.append(self._scan_pos)
+            self._block_starts.append(self._size)
+            self._block_sizes.append(compressed_size)
+            self._scan_pos += FRAME_HEADER.size + compressed_size
+            self._size += logical_size
+            added = True
+        return added
+
+    def _block(self, block):
+        """
+        This gets the decompressed data for a block, the last block used is cached
+        :param block: The index of the block
+        :return: The logical data for the block
+        """
+        if block != self._cached_block:
+            compressed = os.pread(self._file.fileno(), self._block_sizes[block],
+                                  self._block_offsets[block] + FRAME_HEADER.size)
+            try:
+                self._cached_data = self._decompress(compressed)
+            except (zlib.error, lzma.LZMAError) as e:
+                raise BlockCodecError(f"Unable to decompress block: block={block} error={e}") from None
+            self._cached_block = block
+        return self._cached_data
+
+    @property
+    def logical_size(self):
+        self._refresh()
+        return self._size
+
+    @property
+    def frames_end(self):
+        """
+        This is the byte offset in the chunk file just after the last complete frame, anything after it is a partially
+        written frame
+        """
+        self._refresh()
+        return self._scan_pos
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            self._pos = self.logical_size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        return self._pos
+
+    def readinto(self, buffer):
+        """
+        This reads the logical data from the current position, filling the buffer unless the end of the data is reached
+        :param buffer: The buffer to read into
+        :return: The number of bytes read, 0 at the end of the data
+        """
+        view = memoryview(buffer).cast('B')
+        read = 0
+        while read < len(view):
+            # The position may be past the end of the data even once new frames have been indexed
+            if self._pos >= self._size and (not self._refresh() or self._pos >= self._size):
+                break
+            block = bisect.bisect_right(self._block_starts, self._pos) - 1
+            data = self._block(block)
+            block_pos = self._pos - self._block_starts[block]
+            if block_pos >= len(data):
+                break
+            count = min(len(view) - read, len(data) - block_pos)
+            view[read:read + count] = data[block_pos:block_pos + count]
+            read += count
+            self._pos += count
+        return read
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+def open_chunk_data(chunk_file, codec=None):
+    """
+    This opens a chunk file for reading its logical contents
+    :param chunk_file: The chunk file to open
+    :param codec: The block codec the chunk was written with, None for a plain chunk
+    :return: A seekable, unbuffered binary file handle
+    """
+    if codec:
+        return BlockReader(chunk_file, codec)
+    return open(chunk_file, 'rb', buffering=0)
@@ -1,47 +1,92 @@
 import os
 import logging
 import pathlib
-from zipfile import ZipFile
+import time
+from zipfile import ZipFile, ZIP_STORED, ZIP_DEFLATED, ZIP_BZIP2, ZIP_LZMA
 from chunky_logs.common.metadata import MetaData
+from chunky_logs.common.metrics import get_default_metrics
 
 class ChunkManagedFileError(RuntimeError):
     pass
 
+# The codecs which can be used to compress Chunk archives, with their zip compression method
+ARCHIVE_CODECS = {
+    'stored': ZIP_STORED,
+    'deflate': ZIP_DEFLATED,
+    'bzip2': ZIP_BZIP2,
+    'lzma': ZIP_LZMA
+}
+
 class Chunk:
     CHUNK_FILE_EXTENSION = '.chunk'
     CHUNK_ZIP_EXTENSION = '.zip'
+    CHUNK_INDEX_EXTENSION = '.idx'
 
-    def __init__(self, group_path: pathlib.Path, chunk_name: pathlib.Path, metadata: MetaData):
+    def __init__(self, group_path: pathlib.Path, chunk_name: pathlib.Path, metadata: MetaData, metrics=None):
         self._logger = logging.getLogger(self.__class__.__name__)
+        # Metrics are opt in, when there is no sink every instrumented path costs a single None check
+        self._metrics = metrics if metrics is not None else get_default_metrics()
         self._group_path = group_path
         self._chunk_name = chunk_name
         self._chunk_file = self._group_path.joinpath(self._chunk_name.with_suffix(Chunk.CHUNK_FILE_EXTENSION))
+        self._index_file = self._group_path.joinpath(self._chunk_name.with_suffix(Chunk.CHUNK_INDEX_EXTENSION))
+        self._archive_file = self._group_path.joinpath(self._chunk_name.with_suffix(Chunk.CHUNK_ZIP_EXTENSION))
         self.metadata = metadata
 
         self._managed_files = [
             self._chunk_file,
             self.metadata.file
         ]
+        # These are managed files which can be rebuilt, so may not exist
+        self._optional_managed_files = [
+            self._index_file
+        ]
+
+    def _existing_managed_files(self):
+        """
+        This gets all the managed files, including any optional managed files which exist
+        :return: A list of the managed files
+        """
+        return self._managed_files + [file for file in self._optional_managed_files if os.path.exists(file)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        This releases any resources held open by this Chunk, the base Chunk holds none
+        """
+        pass
 
     def delete(self):
         """
         This deletes all the managed files associated with this Chunk
         """
-        for file in self._managed_files:
+        self.close()
+        for file in self._existing_managed_files():
             try:
                 os.remove(file)
                 self._logger.debug(f"Removed Chunk managed file. file={file}")
             except OSError as e:
                 raise ChunkManagedFileError(f"Unable to remove managed file: {e}") from None
 
-    def archive(self):
+    def archive(self, codec: str = 'deflate', level: int = None):
         """
         This archives all the managed files associated with this Chunk, all managed files will be zipped up and then
-        removed
+        removed. This runs on the calling thread, use a ChunkArchiver to archive in the background
+        :param codec: The codec to compress the archive with (see ARCHIVE_CODECS)
+        :param level: The compression level, None uses the codec's default
         """
-        archive_filename = self._group_path.joinpath(self._chunk_name.with_suffix(Chunk.CHUNK_ZIP_EXTENSION))
-        with ZipFile(archive_filename, 'w') as archive:
-            for file in self._managed_files:
+        self.close()
+        if self._metrics is not None:
+            archive_start = time.perf_counter_ns()
+            archive_bytes = sum(os.path.getsize(file) for file in self._existing_managed_files())
+        archive_filename = self._archive_file
+        with ZipFile(archive_filename, 'w', compression=ARCHIVE_CODECS[codec], compresslevel=level) as archive:
+            for file in self._existing_managed_files():
                 try:
                     self._logger.debug(f"Archiving Chunk file. archive={archive_filename} file={file}")
                     archive.write(file)
@@ -50,3 +95,9 @@ class Chunk:
                     raise ChunkManagedFileError(f"Unable to remove managed file: {e}") from None
                 except Exception as e:
                     raise ChunkManagedFileError(f"Unknown exception when archiving managed file: {e}") from None
+
+        if self._metrics is not None:
+            self._metrics.counter('archive.chunks').add()
+            self._metrics.counter('archive.bytes').add(archive_bytes)
+            self._metrics.counter('archive.compressed_bytes').add(os.path.getsize(archive_filename))
+            self._metrics.histogram('archive.time_ns').record(time.perf_counter_ns() - archive_start)
@@ -0,0 +1,173 @@
+from collections import namedtuple
+import json
+import logging
+import os
+import pathlib
+from chunky_logs.common.chunk import Chunk
+from chunky_logs.common.metadata import MetaData
+
+# A compact summary of a Chunk within a Group, the status is one of GroupManifest.STATUSES
+GroupManifestEntry = namedtuple('GroupManifestEntry', ['chunk_name', 'status', 'byte_size', 'time_create',
+                                                       'time_update', 'line_count', 'checksum_hash', 'checksum_type',
+                                                       'block_codec'])
+
+class GroupManifestError(RuntimeError):
+    pass
+
+def chunk_manifest_entry(chunk: Chunk, status: str) -> GroupManifestEntry:
+    """
+    This creates the manifest entry for a Chunk from its metadata and the size of its Chunk file
+    :param chunk: The Chunk
+    :param status: The status of the Chunk, one of GroupManifest.STATUSES
+    :return: The GroupManifestEntry
+    """
+    try:
+        byte_size = os.path.getsize(chunk._chunk_file)
+    except OSError:
+        byte_size = 0
+    metadata = chunk.metadata
+    return GroupManifestEntry(str(chunk._chunk_name), status, byte_size, metadata.chunk_time_create,
+                              metadata.chunk_time_update, metadata.chunk_line_count, metadata.chunk_checksum_hash,
+                              metadata.chunk_checksum_type, metadata.chunk_block_codec)
+
+def manifest_entry_metadata(group_path: pathlib.Path, entry: GroupManifestEntry) -> MetaData:
+    """
+    This creates the MetaData for a Chunk from its manifest entry, without reading the Chunk's metadata file. The file
+    is only read (and checked) once the MetaData is reloaded
+    :param group_path: This is the path to the group
+    :param entry: The Chunk's manifest entry
+    :return: The MetaData
+    """
+    summary = {
+        MetaData.CHUNK_TIME_CREATE_KEY: entry.time_create,
+        MetaData.CHUNK_TIME_UPDATE_KEY: entry.time_update,
+        MetaData.CHUNK_LINE_COUNT_KEY: entry.line_count,
+        MetaData.CHUNK_CHECKSUM_HASH_KEY: entry.checksum_hash,
+        MetaData.CHUNK_CHECKSUM_TYPE_KEY: entry.checksum_type,
+    }
+    if entry.block_codec is not None:
+        summary[MetaData.CHUNK_BLOCK_CODEC_KEY] = entry.block_codec
+    return MetaData(group_path, pathlib.Path(entry.chunk_name), summary)
+
+class GroupManifest:
+    """
+    This class represents the manifest of a Group, a single file summarising every Chunk in the Group so that the Group
+    can be opened without reading each Chunk's metadata. The manifest is a JSON lines file which is only appended to,
+    each line records the latest entry for one Chunk, and it is compacted (atomically rewritten with one line per
+    Chunk) once it holds many superseded lines. A partially written last line, from a writer which stopped part way
+    through an append, is ignored. Only one process should write to a Group's manifest
+    """
+    MANIFEST_FILE = 'group.manifest.jsonl'
+    MANIFEST_TEMP_FILE_EXTENSION = '.tmp'
+    STATUSES = ('active', 'closed', 'archived', 'deleted')
+    COMPACT_MIN_RECORDS = 64
+
+    def __init__(self, group_path: pathlib.Path):
+        """
+        This is the constructor for a GroupManifest, the manifest is loaded if it exists
+        :param group_path: This is the path to the group
+        """
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._manifest_file = pathlib.Path(group_path).joinpath(GroupManifest.MANIFEST_FILE)
+        self._temp_file = self._manifest_file.with_name(self._manifest_file.name +
+                                                        GroupManifest.MANIFEST_TEMP_FILE_EXTENSION)
+        self._entries = {}
+        self._record_count = 0
+        self._torn = False
+        self._exists = os.path.exists(self._manifest_file)
+        if self._exists:
+            self.read_from_disk()
+
+    @classmethod
+    def load(cls, group_path: pathlib.Path):
+        """
+        This loads the manifest of a Group
+        :param group_path: This is the path to the group
+        :return: The GroupManifest on success, None if the Group has no manifest
+        """
+        manifest = cls(group_path)
+        return manifest if manifest.exists else None
+
+    @property
+    def file(self) -> pathlib.Path:
+        return self._manifest_file
+
+    @property
+    def exists(self) -> bool:
+        return self._exists
+
+    def read_from_disk(self):
+        """
+        This loads the manifest from disk, the latest line for each Chunk is its entry
+        """
+        self._entries = {}
+        self._record_count = 0
+        try:
+            with open(self._manifest_file, 'rb') as manifest_data:
+                data = manifest_data.read()
+        except FileNotFoundError as e:
+            raise GroupManifestError(f"Unable to read manifest: {e}") from None
+
+        lines = data.split(b'\n')
+        self._torn = lines.pop() != b''
+        for line in lines:
+            try:
+                entry = GroupManifestEntry(**json.loads(line))
+            except (ValueError, TypeError) as e:
+                raise GroupManifestError(f"Corrupt manifest line: file={self._manifest_file} error={e}") from None
+            self._entries[entry.chunk_name] = entry
+            self._record_count += 1
+        if self._torn:
+            self._logger.debug(f"Ignoring partially written manifest line. file={self._manifest_file}")
+
+    def entries(self, statuses=('active', 'closed')):
+        """
+        This gets the entries of the Chunks in the Group, in the order the Chunks were added to the manifest
+        :param statuses: The statuses of the Chunks to get, None gets every Chunk
+        :return: A list of GroupManifestEntry
+        """
+        return [entry for entry in self._entries.values() if statuses is None or entry.status in statuses]
+
+    def get(self, chunk_name):
+        """
+        This gets the entry of a Chunk
+        :param chunk_name: The name of the Chunk
+        :return: The GroupManifestEntry on success, None if the Chunk is not in the manifest
+        """
+        return self._entries.get(str(chunk_name))
+
+    def record(self, entry: GroupManifestEntry):
+        """
+        This records the latest entry for a Chunk, appending it to the manifest (which is compacted if required)
+        :param entry: The Chunk's GroupManifestEntry
+        """
+        if entry.status not in GroupManifest.STATUSES:
+            raise GroupManifestError(f"Unknown chunk status: {entry.status}")
+        entry = entry._replace(chunk_name=str(entry.chunk_name))
+        # A deleted Chunk is no longer part of the Group, it is dropped from the manifest when it is compacted
+        self._entries[entry.chunk_name] = entry
+        if self._torn or self._record_count + 1 >= max(GroupManifest.COMPACT_MIN_RECORDS, 2 * len(self._entries)):
+            self.compact()
+            return
+
+        with open(self._manifest_file, 'ab') as manifest_data:
+            manifest_data.write(self._serialize(entry))
+        self._record_count += 1
+        self._exists = True
+
+    @staticmethod
+    def _serialize(entry):
+        return json.dumps(entry._asdict(), separators=(',', ':')).encode('utf-8') + b'\n'
+
+    def compact(self):
+        """
+        This atomically rewrites the manifest with a single line per Chunk, dropping deleted Chunks
+        """
+        self._entries = {chunk_name: entry for chunk_name, entry in self._entries.items() if entry.status != 'deleted'}
+        with open(self._temp_file, 'wb') as manifest_data:
+            manifest_data.write(b''.join(self._serialize(entry) for entry in self._entries.values()))
+        os.replace(self._temp_file, self._manifest_file)
+        self._record_count = len(self._entries)
+        self._torn = False
+        self._exists = True
+        self._logger.debug(f"Compacted manifest. file={self._manifest_file} entries={self._record_count}")
@@ -1,8 +1,96 @@
 import hashlib
+import zlib
+
+class ChecksumTypeError(KeyError):
+    pass
+
+class ZlibChecksum:
+    """
+    This class wraps one of zlib's running checksums (crc32 or adler32) in the same interface as a hashlib object. These
+    are far cheaper to compute than a cryptographic hash, but only protect against accidental corruption
+    """
+    def __init__(self, checksum_f, value=None):
+        """
+        This is the constructor for a ZlibChecksum
+        :param checksum_f: The zlib checksum function, which takes the data and the running value
+        :param value: The initial running value, None uses the checksum's own starting value
+        """
+        self._checksum_f = checksum_f
+        self._value = checksum_f(b"") if value is None else value
+
+    def update(self, data):
+        self._value = self._checksum_f(data, self._value)
+
+    def copy(self):
+        return ZlibChecksum(self._checksum_f, self._value)
+
+    def hexdigest(self):
+        return f"{self._value:08x}"
+
+# The checksum algorithms which can be recorded in chunk.checksum.type, each maps to a factory for a new running checksum
+CHECKSUM_TYPES = {
+    'md5': hashlib.md5,
+    'sha256': hashlib.sha256,
+    'blake2b': hashlib.blake2b,
+    'crc32': lambda: ZlibChecksum(zlib.crc32),
+    'adler32': lambda: ZlibChecksum(zlib.adler32)
+}
+
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+def register_checksum(checksum_type, factory):
+    """
+    This adds a checksum algorithm to the registry
+    :param checksum_type: The name recorded in chunk.checksum.type
+    :param factory: A callable which returns a new running checksum, with update(), copy() and hexdigest() methods
+    """
+    CHECKSUM_TYPES[checksum_type] = factory
+
+def new_checksum(checksum_type='md5'):
+    """
+    This creates a new running checksum, data can then be added to it incrementally
+    :param checksum_type: The name of the checksum algorithm (see CHECKSUM_TYPES)
+    :return: The checksum object on success, raises ChecksumTypeError if the algorithm is unknown
+    """
+    try:
+        factory = CHECKSUM_TYPES[checksum_type]
+    except KeyError:
+        raise ChecksumTypeError(f"Unknown checksum type: {checksum_type}") from None
+    return factory()
+
+def data_checksum(data, checksum_type='md5', block_size=DEFAULT_BLOCK_SIZE):
+    """
+    This gets the checksum object for everything remaining in a binary file handle
+    :param data: The binary file handle to read
+    :param checksum_type: The name of the checksum algorithm (see CHECKSUM_TYPES)
+    :param block_size: The size of the blocks to read the data in
+    :return: The checksum object after hashing the data
+    """
+    checksum = new_checksum(checksum_type)
+    buffer = bytearray(block_size)
+    view = memoryview(buffer)
+    for read in iter(lambda: data.readinto(buffer), 0):
+        checksum.update(view[:read])
+    return checksum
+
+def file_checksum(filename, checksum_type='md5', block_size=DEFAULT_BLOCK_SIZE):
+    """
+    This gets the checksum object for the contents of a file, further data can then be added to it incrementally
+    :param filename: The file to hash
+    :param checksum_type: The name of the checksum algorithm (see CHECKSUM_TYPES)
+    :param block_size: The size of the blocks to read the file in
+    :return: The checksum object after hashing the file contents
+    """
+    with open(filename, "rb", buffering=0) as f:
+        return data_checksum(f, checksum_type, block_size)
+
+def file_md5(filename):
+    """
+    This gets the md5 hash object for the contents of a file, further data can then be added to it incrementally
+    :param filename: The file to hash
+    :return: The hashlib md5 object after hashing the file contents
+    """
+    return file_checksum(filename, 'md5')
 
 def file_md5sum(filename):
-    md5_hash = hashlib.md5()
-    with open(filename, "rb") as f:
-        for byte_block in iter(lambda: f.read(4096), b""):
-            md5_hash.update(byte_block)
-    return md5_hash.hexdigest()
+    return file_md5(filename).hexdigest()
@@ -0,0 +1,207 @@
+from array import array
+import bisect
+import os
+import struct
+import zlib
+
+def line_timestamp(line: bytes) -> int:
+    """
+    This gets the timestamp from a chunk line, which is stored as <timestamp ms>,<data>
+    :param line: The line to get the timestamp from
+    :return: The timestamp in ms on success, raises ValueError if the line has no valid timestamp
+    """
+    return int(line[:line.find(b',')])
+
+class LineIndex:
+    """
+    This class represents the line index for a Chunk, it holds the byte offset and timestamp of every Nth (stride) line
+    so that any line, or time, can be found with a single seek followed by reading at most stride lines. On disk the
+    index is a small header followed by the packed entries, and it is only ever appended to. The header records a
+    checksum of the start of the chunk's first line, so that an index left behind by a different chunk is detected
+    """
+    MAGIC = b'CLIX'
+    VERSION = 3
+    HEADER = struct.Struct('<4sHII')
+    ENTRY = struct.Struct('<Qq')
+    DEFAULT_STRIDE = 128
+    HEAD_CHECKSUM_BYTES = 4096
+
+    def __init__(self, stride: int = DEFAULT_STRIDE):
+        """
+        This creates a new empty line index
+        :param stride: The number of lines between each indexed line
+        """
+        self.stride = stride
+        self.offsets = array('Q')
+        self.timestamps = array('q')
+        self.line_count = 0
+        self.end_pos = 0
+        self.head_checksum = 0
+        self._end_timestamp = None
+
+    @classmethod
+    def load(cls, index_file):
+        """
+        This loads a line index from disk. The index only covers the lines before the last indexed line, the lines from
+        there onwards are found by extending the index from the chunk file
+        :param index_file: The index file to load
+        :return: The LineIndex on success, None if the file is missing or is not a valid index
+        """
+        try:
+            with open(index_file, 'rb') as index_data:
+                data = index_data.read()
+        except OSError:
+            return None
+
+        if len(data) < cls.HEADER.size:
+            return None
+        magic, version, stride, head_checksum = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC or version != cls.VERSION or stride <= 0:
+            return None
+
+        line_index = cls(stride)
+        line_index.head_checksum = head_checksum
+        entries = data[cls.HEADER.size:]
+        for offset, timestamp in cls.ENTRY.iter_unpack(entries[:len(entries) - len(entries) % cls.ENTRY.size]):
+            line_index.offsets.append(offset)
+            line_index.timestamps.append(timestamp)
+        if line_index.offsets:
+            # The lines from the last indexed line onwards are not covered, it is indexed again once extended
+            line_index.end_pos = line_index.offsets.pop()
+            line_index._end_timestamp = line_index.timestamps.pop()
+            line_index.line_count = len(line_index.offsets) * stride
+        return line_index
+
+    def add(self, data):
+        """
+        This adds lines which have been appended to the chunk to the index
+        :param data: The bytes appended to the chunk, this must be made up of complete lines
+        :return: A list of the (offset, timestamp) entries which were added to the index
+        """
+        find = data.find
+        stride = self.stride
+        line_count = self.line_count
+        new_entries = []
+        pos = 0
+        while pos < len(data):
+            line_end = find(b'\n', pos) + 1 or len(data)
+            if line_count % stride == 0:
+                try:
+                    timestamp = line_timestamp(data[pos:line_end])
+                except ValueError:
+                    timestamp = self.timestamps[-1] if self.timestamps else 0
+                if line_count == 0:
+                    self.head_checksum = self._checksum_head(data[:line_end])
+                new_entries.append((self.end_pos + pos, timestamp))
+                self.offsets.append(self.end_pos + pos)
+                self.timestamps.append(timestamp)
+            pos = line_end
+            line_count += 1
+
+        self.line_count = line_count
+        self.end_pos += len(data)
+        return new_entries
+
+    def extend(self, chunk_data, block_size=1024 * 1024):
+        """
+        This extends the index with any complete lines in the chunk file which it does not yet cover
+        :param chunk_data: A binary file handle for the chunk file
+        :param block_size: The size of the blocks to read the chunk file in
+        :return: True if the index was extended, False if not
+        """
+        extended = False
+        remainder = b''
+        chunk_data.seek(self.end_pos)
+        for block in iter(lambda: chunk_data.read(block_size), b""):
+            block = remainder + block
+            end = block.rfind(b'\n') + 1
+            if end:
+                self.add(block[:end])
+                extended = True
+            remainder = block[end:]
+        return extended
+
+    @staticmethod
+    def _checksum_head(first_line):
+        return zlib.crc32(first_line[:LineIndex.HEAD_CHECKSUM_BYTES])
+
+    def is_valid(self, chunk_data):
+        """
+        This checks that the index is consistent with the chunk file. The start of the chunk's first line must match the
+        checksum in the header, and the line after the covered lines must start at a line boundary with the timestamp
+        that was indexed for it. Reading these costs a couple of small reads, however long the chunk
+        :param chunk_data: A binary file handle for the chunk file
+        :return: True if the index is consistent, False if it should be rebuilt
+        """
+        if self.end_pos == 0:
+            return True
+        chunk_data.seek(0)
+        head = chunk_data.read(min(self.end_pos, LineIndex.HEAD_CHECKSUM_BYTES))
+        line_end = head.find(b'\n') + 1 or len(head)
+        if self._checksum_head(head[:line_end]) != self.head_checksum:
+            return False
+
+        chunk_data.seek(self.end_pos - 1)
+        end = chunk_data.read(32)
+        if end[:1] != b'\n':
+            return False
+        if self._end_timestamp is not None:
+            try:
+                return line_timestamp(end[1:]) == self._end_timestamp
+            except ValueError:
+                return False
+        return True
+
+    def locate(self, line):
+        """
+        This finds where to start reading in order to reach a line
+        :param line: The (0 based) line number to locate
+        :return: A tuple of (byte offset, lines to skip from that offset)
+        """
+        entry = min(line // self.stride, len(self.offsets) - 1)
+        if entry < 0:
+            return 0, line
+        return self.offsets[entry], line - entry * self.stride
+
+    def locate_time(self, timestamp):
+        """
+        This finds where to start reading in order to reach the first line at or after a time, using a binary search of
+        the indexed timestamps. This assumes timestamps do not decrease through the chunk
+        :param timestamp: The timestamp in ms to locate
+        :return: A tuple of (byte offset, line number) of the indexed line to start reading forward from
+        """
+        entry = max(bisect.bisect_left(self.timestamps, timestamp) - 1, 0)
+        if not self.offsets:
+            return 0, 0
+        return self.offsets[entry], entry * self.stride
+
+    def write_header(self, index_fd):
+        os.write(index_fd, LineIndex.HEADER.pack(LineIndex.MAGIC, LineIndex.VERSION, self.stride, self.head_checksum))
+
+    def append_to_file(self, index_file, entries):
+        """
+        This appends newly indexed entries to an index file, creating it if required
+        :param index_file: The index file to append to
+        :param entries: The (offset, timestamp) entries to append
+        """
+        index_fd = os.open(index_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(index_fd).st_size == 0:
+                self.write_header(index_fd)
+            os.write(index_fd, b''.join(LineIndex.ENTRY.pack(*entry) for entry in entries))
+        finally:
+            os.close(index_fd)
+
+    def write_to_file(self, index_file):
+        """
+        This writes the whole index to an index file, replacing it atomically
+        :param index_file: The index file to write
+        """
+        temp_file = f"{index_file}.tmp"
+        index_fd = os.open(temp_file, os.O_WRONLY | os.O_TRUNC | os.O_CREAT, 0o644)
+        try:
+            self.write_header(index_fd)
+            os.write(index_fd, b''.join(map(LineIndex.ENTRY.pack, self.offsets, self.timestamps)))
+        finally:
+            os.close(index_fd)
+        os.replace(temp_file, index_file)
@@ -13,9 +13,13 @@ class MetaDataSourceError(RuntimeError):
 class MetaDataKeyError(KeyError):
     pass
 
+_EMPTY_PATH = pathlib.Path('')
+
 class MetaData:
     """
-    This class represents the metadata associated with a Chunk file, it knows how to load them from disk
+    This class represents the metadata associated with a Chunk file, it knows how to load them from disk. The default
+    keys are held as typed fields, any custom keys are kept as loaded and only converted to their type when first
+    accessed, so loading metadata (which followers do constantly) does as little work as possible
     """
     CHUNK_FILENAME_KEY = 'chunk.file'
     CHUNK_TIME_CREATE_KEY = 'chunk.time.create'
@@ -23,53 +27,117 @@ class MetaData:
     CHUNK_LINE_COUNT_KEY = 'chunk.line.count'
     CHUNK_CHECKSUM_HASH_KEY = 'chunk.checksum.hash'
     CHUNK_CHECKSUM_TYPE_KEY = 'chunk.checksum.type'
+    CHUNK_BLOCK_CODEC_KEY = 'chunk.block.codec'
     METADATA_FILE_EXTENSION = '.metadata.json'
 
-    def __init__(self, group_path: pathlib.Path, chunk_name: pathlib.Path):
-        self._logger = logging.getLogger(self.__class__.__name__)
+    DEFAULT_KEYS = (
+        CHUNK_FILENAME_KEY,
+        CHUNK_TIME_CREATE_KEY,
+        CHUNK_TIME_UPDATE_KEY,
+        CHUNK_LINE_COUNT_KEY,
+        CHUNK_CHECKSUM_HASH_KEY,
+        CHUNK_CHECKSUM_TYPE_KEY
+    )
+
+    # The field and type of each key held as a typed field, the block codec is optional (None when not present)
+    KEY_FIELDS = {
+        CHUNK_FILENAME_KEY: ('_chunk_file', 'path'),
+        CHUNK_TIME_CREATE_KEY: ('_time_create', 'int'),
+        CHUNK_TIME_UPDATE_KEY: ('_time_update', 'int'),
+        CHUNK_LINE_COUNT_KEY: ('_line_count', 'int'),
+        CHUNK_CHECKSUM_HASH_KEY: ('_checksum_hash', 'str'),
+        CHUNK_CHECKSUM_TYPE_KEY: ('_checksum_type', 'str'),
+        CHUNK_BLOCK_CODEC_KEY: ('_block_codec', 'str')
+    }
+
+    TYPE_SCHEMA = {
+        'str': str,
+        'int': int,
+        'float': float,
+        'bool': bool,
+        'path': pathlib.Path
+    }
 
-        self._default_keys = [
-            MetaData.CHUNK_FILENAME_KEY,
-            MetaData.CHUNK_TIME_CREATE_KEY,
-            MetaData.CHUNK_TIME_UPDATE_KEY,
-            MetaData.CHUNK_LINE_COUNT_KEY,
-            MetaData.CHUNK_CHECKSUM_HASH_KEY,
-            MetaData.CHUNK_CHECKSUM_TYPE_KEY
-        ]
-
-        self._type_schema = {
-            'str': str,
-            'int': int,
-            'float': float,
-            'bool': bool,
-            'path': pathlib.Path
-        }
+    __slots__ = ('_logger', '_type_schema', '_metadata_file', '_metadata_stat', '_chunk_file', '_time_create',
+                 '_time_update', '_line_count', '_checksum_hash', '_checksum_type', '_block_codec', '_custom',
+                 '_custom_values')
+
+    def __init__(self, group_path: pathlib.Path, chunk_name: pathlib.Path, summary: dict = None):
+        """
+        This is the constructor for a MetaData, the metadata file is read if it exists
+        :param group_path: This is the path to the group under which the chunk lives
+        :param chunk_name: This is the name of the chunk the metadata is for
+        :param summary: When set the metadata is taken from this dict of default key values (for example from a group
+        manifest) rather than the metadata file, the file is then only read by reload()
+        """
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._type_schema = MetaData.TYPE_SCHEMA
 
         self._metadata_file = group_path.joinpath(chunk_name.with_suffix(MetaData.METADATA_FILE_EXTENSION))
+        self._metadata_stat = None
+        self._default_metadata()
 
-        if os.path.exists(self._metadata_file):
+        if summary is not None:
+            for key, value in summary.items():
+                self._set_item(key, value, 'str')
+        elif os.path.exists(self._metadata_file):
             self.read_from_disk()
-        else:
-            self._metadata = {}
-            self._default_metadata()
 
     def _default_metadata(self):
         """
         This will populate the metadata with default values
-        :param chunk_file: This is the relative path to the chunk file
         """
-        def add_default_metadata_key(key, value, value_type):
-            self._metadata[key] = {
-                "value": value,
-                "type": value_type
-            }
+        self._chunk_file = _EMPTY_PATH
+        self._time_create = 0
+        self._time_update = 0
+        self._line_count = 0
+        self._checksum_hash = ''
+        self._checksum_type = 'md5'
+        self._block_codec = None
+        self._custom = {}
+        self._custom_values = None
 
-        add_default_metadata_key(MetaData.CHUNK_FILENAME_KEY, pathlib.Path(''), 'path')
-        add_default_metadata_key(MetaData.CHUNK_TIME_CREATE_KEY, 0, 'int')
-        add_default_metadata_key(MetaData.CHUNK_TIME_UPDATE_KEY, 0, 'int')
-        add_default_metadata_key(MetaData.CHUNK_LINE_COUNT_KEY, 0, 'int')
-        add_default_metadata_key(MetaData.CHUNK_CHECKSUM_HASH_KEY, '', 'str')
-        add_default_metadata_key(MetaData.CHUNK_CHECKSUM_TYPE_KEY, 'md5', 'str')
+    def _set_item(self, key, value, value_type):
+        """
+        This sets the value of a key, a typed field for the default keys, otherwise a custom key
+        :param key: The metadata key
+        :param value: The value, already converted to its type
+        :param value_type: The name of the value's type in the schema, this is only used for custom keys
+        """
+        field = MetaData.KEY_FIELDS.get(key)
+        if field is not None:
+            setattr(self, field[0], value)
+            return
+        self._custom[key] = {'value': value, 'type': value_type}
+        if self._custom_values is not None:
+            self._custom_values[key] = value
+
+    def _custom_value(self, key):
+        """
+        This gets the value of a custom key, converting it to its type on first access
+        :param key: The metadata key
+        :return: The value, raises KeyError if there is no such key
+        """
+        custom_values = self._custom_values
+        if custom_values is None:
+            custom_values = self._custom_values = {}
+        elif key in custom_values:
+            return custom_values[key]
+        item = self._custom[key]
+        value = custom_values[key] = self._type_schema[item['type']](item['value'])
+        return value
+
+    def _items(self):
+        """
+        This gets every key within the metadata, with its value and type
+        :return: Yields a (key, {'value': value, 'type': type}) tuple for each key
+        """
+        for key, (field, value_type) in MetaData.KEY_FIELDS.items():
+            value = getattr(self, field)
+            if value is not None:
+                yield key, {'value': value, 'type': value_type}
+        for key, item in self._custom.items():
+            yield key, {'value': self._custom_value(key), 'type': item['type']}
 
     def _data_key_exception(self):
         def _property_exception_f(*args):
@@ -81,10 +149,19 @@ class MetaData:
 
     @_data_key_exception
     def __getitem__(self, key):
-        return self._metadata[key]['value']
+        field = MetaData.KEY_FIELDS.get(key)
+        if field is not None:
+            value = getattr(self, field[0])
+            if value is None:
+                raise KeyError(key)
+            return value
+        return self._custom_value(key)
 
     def __contains__(self, key):
-        return key in self._metadata
+        field = MetaData.KEY_FIELDS.get(key)
+        if field is not None:
+            return getattr(self, field[0]) is not None
+        return key in self._custom
 
     @property
     def checksum(self) -> str:
@@ -96,54 +173,101 @@ class MetaData:
 
     @property
     def chunk_file(self) -> pathlib.Path:
-        return self._metadata[MetaData.CHUNK_FILENAME_KEY]['value']
+        return self._chunk_file
 
     @property
     def chunk_time_create(self) -> int:
-        return self._metadata[MetaData.CHUNK_TIME_CREATE_KEY]['value']
+        return self._time_create
 
     @property
     def chunk_time_update(self) -> int:
-        return self._metadata[MetaData.CHUNK_TIME_UPDATE_KEY]['value']
+        return self._time_update
 
     @property
     def chunk_line_count(self) -> int:
-        return self._metadata[MetaData.CHUNK_LINE_COUNT_KEY]['value']
+        return self._line_count
 
     @property
     def chunk_checksum_hash(self) -> str:
-        return self._metadata[MetaData.CHUNK_CHECKSUM_HASH_KEY]['value']
+        return self._checksum_hash
 
     @property
     def chunk_checksum_type(self) -> str:
-        return self._metadata[MetaData.CHUNK_CHECKSUM_TYPE_KEY]['value']
+        return self._checksum_type
+
+    @property
+    def chunk_block_codec(self) -> str:
+        """
+        The block codec is optional metadata, it is only present for block compressed chunks
+        :return: The name of the codec the chunk is block compressed with, None for a plain chunk
+        """
+        return self._block_codec
+
+    def _stat_signature(self):
+        """
+        This gets the stat signature of the metadata file, used to cheaply detect when it has been rewritten
+        :return: A tuple of (mtime_ns, size, inode) on success, None if the file cannot be found
+        """
+        try:
+            stat = os.stat(self._metadata_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
 
     def read_from_disk(self):
         """
         This will update the metadata data with that stored on disk
         :return: None
         """
-        self._metadata = self._load_metadata(self._metadata_file)
+        self._metadata_stat = self._stat_signature()
+        self._apply_metadata(self._load_metadata(self._metadata_file))
+
+    def reload(self):
+        """
+        This will update the metadata from disk, but only if the metadata file has changed since it was last read. The
+        change is detected using the file's stat signature, so when nothing has changed this costs a single stat call
+        :return: True if the metadata was reloaded, False if it was unchanged
+        """
+        metadata_stat = self._stat_signature()
+        if metadata_stat == self._metadata_stat:
+            return False
+        self._metadata_stat = metadata_stat
+        self._apply_metadata(self._load_metadata(self._metadata_file))
+        return True
+
+    def _apply_metadata(self, metadata_json):
+        """
+        This sets the metadata from loaded metadata JSON. The default keys are converted to their types now, the
+        remaining custom keys are kept as loaded until they are accessed
+        :param metadata_json: The metadata JSON from _load_metadata(), the default keys are removed from it
+        """
+        type_schema = self._type_schema
+        for key, (field, _) in MetaData.KEY_FIELDS.items():
+            item = metadata_json.pop(key, None)
+            if item is not None:
+                setattr(self, field, type_schema[item['type']](item['value']))
+            elif key == MetaData.CHUNK_BLOCK_CODEC_KEY:
+                self._block_codec = None
+        self._custom = metadata_json
+        self._custom_values = None
 
     def _load_metadata(self, metadata_json_file):
         """
-        This method loads the metadata from a given json metadata source file. It will use the _type_schema in order
-        to set the correct types for the metadata
+        This method loads the metadata from a given json metadata source file, checking the default keys are present.
+        The values are not converted to their types here (see _apply_metadata())
         :param metadata_json_file: The metadata json source file to load
         :return: A dictionary representing the metadata in the form {key: {value:'VALUE', type:'TYPE}, ...*}
         """
         try:
             with open(metadata_json_file) as metadata_json_handle:
                 metadata_json = json.load(metadata_json_handle)
-                for key in metadata_json:
-                    metadata_json[key]['value'] = self._type_schema[metadata_json[key]['type']](metadata_json[key]['value'])
         except FileNotFoundError as e:
             raise MetaDataSourceError(f"Unable to source metadata: {e}") from None
 
-        if all(metadata_key in metadata_json for metadata_key in self._default_keys):
+        missing_keys = [metadata_key for metadata_key in MetaData.DEFAULT_KEYS if metadata_key not in metadata_json]
+        if missing_keys:
+            raise MetaDataError(f"Missing metadata key(s) {', '.join(missing_keys)})")
+        if self._logger.isEnabledFor(logging.DEBUG):
             for key in metadata_json:
                 self._logger.debug(f"Metadata Loaded. metadata.json.file={metadata_json_file} {key}={metadata_json[key]['value']}")
-            return metadata_json
-        else:
-            missing_keys = [metadata_key for metadata_key in self._default_keys if metadata_key not in metadata_json]
-            raise MetaDataError(f"Missing metadata key(s) {', '.join(missing_keys)})")
+        return metadata_json
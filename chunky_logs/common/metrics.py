@@ -0,0 +1,139 @@
+import threading
+
+class Counter:
+    """
+    This class counts events, such as lines or bytes written
+    """
+    def __init__(self, name):
+        self.name = name
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def add(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+class Histogram:
+    """
+    This class records a distribution of values, such as latencies in ns. Values are counted in power of two buckets,
+    so recording is constant time and the percentiles reported are the upper bound of the bucket they fall in
+    """
+    BUCKET_COUNT = 65
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.buckets = [0] * Histogram.BUCKET_COUNT
+        self._lock = threading.Lock()
+
+    def record(self, value):
+        value = int(value)
+        with self._lock:
+            self.buckets[min(value.bit_length(), Histogram.BUCKET_COUNT - 1)] += 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, fraction):
+        """
+        This gets an upper bound for a percentile of the recorded values
+        :param fraction: The percentile as a fraction, e.g. 0.99
+        :return: The upper bound of the bucket holding the percentile, None if nothing has been recorded
+        """
+        if self.count == 0:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for bucket, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return min((1 << bucket) - 1, self.max)
+        return self.max
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'count': self.count,
+                'sum': self.total,
+                'max': self.max,
+                'p50': self.percentile(0.50),
+                'p99': self.percentile(0.99),
+            }
+
+class MetricsRegistry:
+    """
+    This class is a metrics sink which keeps every metric in process, snapshot() gets their current values
+    """
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name, metric_type):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_type(name)
+            return metric
+
+    def counter(self, name) -> Counter:
+        return self._get(name, Counter)
+
+    def histogram(self, name) -> Histogram:
+        return self._get(name, Histogram)
+
+    def snapshot(self):
+        """
+        This gets the current value of every metric
+        :return: A dict of metric name to the counter value, or a dict of the histogram's count, sum, max, p50 and p99
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+class _CallbackMetric:
+    def __init__(self, name, callback):
+        self.name = name
+        self._callback = callback
+
+    def add(self, amount=1):
+        self._callback(self.name, amount)
+
+    def record(self, value):
+        self._callback(self.name, value)
+
+class MetricsCallbackSink:
+    """
+    This class is a metrics sink which passes every counter increment and histogram value to a callback, for forwarding
+    to an external metrics system
+    """
+    def __init__(self, callback):
+        """
+        This is the constructor for a MetricsCallbackSink
+        :param callback: This is called with (metric name, value) for every counter increment and histogram value
+        """
+        self._callback = callback
+
+    def counter(self, name):
+        return _CallbackMetric(name, self._callback)
+
+    def histogram(self, name):
+        return _CallbackMetric(name, self._callback)
+
+_default_metrics = None
+
+def set_default_metrics(metrics):
+    """
+    This sets the metrics sink used by Chunks which are not given one, None disables metrics
+    :param metrics: A MetricsRegistry, MetricsCallbackSink, or any object with counter(name) and histogram(name)
+    """
+    global _default_metrics
+    _default_metrics = metrics
+
+def get_default_metrics():
+    return _default_metrics
@@ -0,0 +1,201 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import time
+
+class WatcherError(RuntimeError):
+    pass
+
+def _load_libc():
+    """
+    This loads the C library, checking it provides the inotify API
+    :return: The ctypes handle for the C library on success, raises WatcherError if inotify is not available
+    """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    except OSError as e:
+        raise WatcherError(f"Unable to load libc: {e}") from None
+    if not all(hasattr(libc, function) for function in ['inotify_init1', 'inotify_add_watch']):
+        raise WatcherError("libc does not provide inotify")
+    return libc
+
+class InotifyWatcher:
+    """
+    This class waits for files within a directory to change using Linux inotify. The directory is watched (rather than
+    the files themselves) so that files which are atomically replaced, or not yet created, are still seen
+    """
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_NONBLOCK = os.O_NONBLOCK
+    IN_CLOEXEC = 0o2000000
+    WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, directory, file_names):
+        """
+        This is the constructor for an InotifyWatcher
+        :param directory: The directory containing the files to watch
+        :param file_names: The names of the files within the directory to watch, None watches every file
+        """
+        self._logger = logging.getLogger(self.__class__.__name__)
+        libc = _load_libc()
+        self._file_names = None if file_names is None else {os.fsencode(file_name) for file_name in file_names}
+
+        self._fd = libc.inotify_init1(InotifyWatcher.IN_NONBLOCK | InotifyWatcher.IN_CLOEXEC)
+        if self._fd < 0:
+            raise WatcherError(f"Unable to initialise inotify: {os.strerror(ctypes.get_errno())}")
+
+        if libc.inotify_add_watch(self._fd, os.fsencode(directory), InotifyWatcher.WATCH_MASK) < 0:
+            error = os.strerror(ctypes.get_errno())
+            os.close(self._fd)
+            raise WatcherError(f"Unable to watch directory: directory={directory} error={error}")
+
+        self._poll = select.poll()
+        self._poll.register(self._fd, select.POLLIN)
+        self._logger.debug(f"Watching files with inotify. directory={directory} files={file_names}")
+
+    def fileno(self):
+        return self._fd
+
+    def read_events(self):
+        """
+        This drains any pending events without blocking
+        :return: True if any of the events were for the watched files, False if not
+        """
+        changed = False
+        while True:
+            try:
+                events = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+
+            offset = 0
+            while offset < len(events):
+                _, _, _, name_length = InotifyWatcher.EVENT_HEADER.unpack_from(events, offset)
+                offset += InotifyWatcher.EVENT_HEADER.size
+                if self._file_names is None or events[offset:offset + name_length].rstrip(b'\0') in self._file_names:
+                    changed = True
+                offset += name_length
+
+    def wait(self, timeout=None):
+        """
+        This blocks until one of the watched files changes
+        :param timeout: The maximum time to wait in seconds, None waits indefinitely
+        :return: True if a watched file changed, False if the timeout passed
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            poll_timeout = None if deadline is None else max(0, int((deadline - time.monotonic()) * 1000))
+            if not self._poll.poll(poll_timeout):
+                return False
+            if self.read_events():
+                return True
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+class PollingWatcher:
+    """
+    This class waits for files within a directory to change by polling their stat signatures. The interval between
+    polls starts small and backs off while nothing changes, so idle waits cost little CPU. When every file is watched
+    the directory is listed on each poll, so files which are created or removed are seen
+    """
+    def __init__(self, directory, file_names, min_interval=0.0005, max_interval=0.1):
+        """
+        This is the constructor for a PollingWatcher
+        :param directory: The directory containing the files to watch
+        :param file_names: The names of the files within the directory to watch, None watches every file
+        :param min_interval: The initial interval between polls in seconds
+        :param max_interval: The interval between polls in seconds will back off up to this value
+        """
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._directory = directory
+        self._files = None if file_names is None else [os.path.join(directory, file_name) for file_name in file_names]
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._interval = min_interval
+        self._signatures = self._stat_signatures()
+        self._logger.debug(f"Watching files by polling. directory={directory} files={file_names}")
+
+    def _stat_signatures(self):
+        if self._files is None:
+            try:
+                files = sorted(entry.path for entry in os.scandir(self._directory))
+            except OSError:
+                return None
+        else:
+            files = self._files
+        signatures = []
+        for file in files:
+            try:
+                stat = os.stat(file)
+                signatures.append((file, stat.st_mtime_ns, stat.st_size, stat.st_ino))
+            except OSError:
+                signatures.append(None)
+        return signatures
+
+    def fileno(self):
+        return None
+
+    def read_events(self):
+        """
+        This polls the watched files once
+        :return: True if any of the watched files have changed since the last poll, False if not
+        """
+        signatures = self._stat_signatures()
+        if signatures != self._signatures:
+            self._signatures = signatures
+            self._interval = self._min_interval
+            return True
+        return False
+
+    def next_interval(self):
+        """
+        This gets the time to sleep before the next poll, backing off the interval for the poll after
+        :return: The time to sleep in seconds
+        """
+        interval = self._interval
+        self._interval = min(self._interval * 2, self._max_interval)
+        return interval
+
+    def wait(self, timeout=None):
+        """
+        This blocks until one of the watched files changes
+        :param timeout: The maximum time to wait in seconds, None waits indefinitely
+        :return: True if a watched file changed, False if the timeout passed
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.read_events():
+            interval = self.next_interval()
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                interval = min(interval, remaining)
+            time.sleep(interval)
+        return True
+
+    def close(self):
+        pass
+
+def create_watcher(directory, file_names):
+    """
+    This creates a watcher for files within a directory, using inotify where it is available and falling back to
+    polling where it is not
+    :param directory: The directory containing the files to watch
+    :param file_names: The names of the files within the directory to watch, None watches every file
+    :return: Either an InotifyWatcher or a PollingWatcher
+    """
+    try:
+        return InotifyWatcher(directory, file_names)
+    except WatcherError as e:
+        logging.getLogger(__name__).debug(f"Inotify unavailable, falling back to polling: {e}")
+        return PollingWatcher(directory, file_names)
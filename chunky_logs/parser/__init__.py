@@ -1,2 +1,7 @@
 """parser"""
 from chunky_logs.parser.parser_chunk import ParserChunk, ParserChunkManagedFileError, ParserChunkReadError
+from chunky_logs.parser.parser_group import group_chunks, seek_group_time, read_group_range, ParserGroup, \
+    ParserGroupError
+from chunky_logs.parser.chunk_arrays import ChunkArrays, load_chunk_arrays, load_group_arrays
+from chunky_logs.parser.verify_group import ChunkVerifyResult, GroupVerifyReport, verify_chunk, verify_group
+from chunky_logs.parser.async_parser_chunk import AsyncParserChunk
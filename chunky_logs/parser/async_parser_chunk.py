@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import os
+import pathlib
+from chunky_logs.common.async_io import default_io_executor
+from chunky_logs.common.watcher import create_watcher
+from chunky_logs.parser.parser_chunk import ParserChunk
+
+class AsyncParserChunk:
+    """
+    This class parses Chunks from asyncio code. Lines are read in batches by a ParserChunk on the I/O executor, and
+    following a Chunk waits for new data on the event loop, through the watcher's file descriptor where there is one
+    and by polling with async sleeps where there is not
+    """
+    READ_BATCH_LINES = 1024
+
+    def __init__(self, parser_chunk: ParserChunk, executor=None):
+        """
+        This is the constructor for an AsyncParserChunk, use AsyncParserChunk.open() to create one without blocking
+        :param parser_chunk: The ParserChunk to read through, it must only be used by this AsyncParserChunk
+        :param executor: The executor to perform file I/O on, None uses the shared I/O thread
+        """
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._parser_chunk = parser_chunk
+        self._executor = executor or default_io_executor()
+
+    @classmethod
+    async def open(cls, group_path: pathlib.Path, chunk_name: pathlib.Path, executor=None, **kwargs):
+        """
+        This creates an AsyncParserChunk, opening the Chunk on the I/O executor
+        :param group_path: This is the path to the group under which this chunk lives
+        :param chunk_name: This is the name for the chunk this instance represents
+        :param executor: The executor to perform file I/O on, None uses the shared I/O thread
+        :param kwargs: Any further arguments for the ParserChunk
+        :return: The AsyncParserChunk
+        """
+        executor = executor or default_io_executor()
+        parser_chunk = await asyncio.get_running_loop().run_in_executor(
+            executor, lambda: ParserChunk(group_path, chunk_name, **kwargs))
+        return cls(parser_chunk, executor)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    @property
+    def metadata(self):
+        return self._parser_chunk.metadata
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    async def read_line(self):
+        """
+        This reads the next line from the chunk file
+        :return: The line on success, None if there is no complete line to read
+        """
+        return await self._run(self._parser_chunk.read_line)
+
+    async def read_lines(self, line_count):
+        """
+        This reads up to line_count lines from the chunk file
+        :param line_count: The maximum number of lines to read
+        :return: A list of the lines read
+        """
+        return await self._run(self._parser_chunk.read_lines, line_count)
+
+    async def __aiter__(self):
+        """
+        This reads the chunk file from the last line read to the end of the complete lines, in batches
+        :return: Yields each line
+        """
+        while True:
+            lines = await self.read_lines(self.READ_BATCH_LINES)
+            if not lines:
+                return
+            for line in lines:
+                yield line
+
+    async def _wait(self, watcher, timeout):
+        """
+        This waits without blocking the event loop until one of the watched files changes
+        :param watcher: The watcher for the chunk and metadata files
+        :param timeout: The maximum time to wait in seconds, None waits indefinitely
+        :return: True if a watched file changed, False if the timeout passed
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        fd = watcher.fileno()
+        changed = asyncio.Event()
+        if fd is not None:
+            loop.add_reader(fd, changed.set)
+        try:
+            while not watcher.read_events():
+                remaining = None if deadline is None else deadline - loop.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                if fd is None:
+                    interval = watcher.next_interval()
+                    await asyncio.sleep(interval if remaining is None else min(interval, remaining))
+                else:
+                    changed.clear()
+                    try:
+                        await asyncio.wait_for(changed.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        return False
+            return True
+        finally:
+            if fd is not None:
+                loop.remove_reader(fd)
+
+    async def follow(self, idle_timeout=None):
+        """
+        This reads the chunk file one line at a time, continuing from the last line read. Once the end of the chunk is
+        reached it waits for new data to be appended without blocking the event loop. Only complete lines are returned
+        :param idle_timeout: The time in seconds to wait for new data before finishing, None waits indefinitely
+        :return: Yields each line as it is read, finishing on the idle timeout or when the chunk file is removed
+        """
+        parser_chunk = self._parser_chunk
+        watcher = create_watcher(parser_chunk._group_path,
+                                 [parser_chunk._chunk_file.name, os.path.basename(parser_chunk.metadata.file)])
+        try:
+            while True:
+                if os.path.exists(parser_chunk._chunk_file) or parser_chunk._chunk_handle is not None:
+                    async for line in self:
+                        yield line
+                    if not os.path.exists(parser_chunk._chunk_file):
+                        self._logger.debug(f"Chunk file removed, finished following. file={parser_chunk._chunk_file}")
+                        return
+
+                if not await self._wait(watcher, idle_timeout):
+                    return
+        finally:
+            watcher.close()
+
+    async def close(self):
+        await self._run(self._parser_chunk.close)
@@ -0,0 +1,125 @@
+from collections import namedtuple
+import pathlib
+from chunky_logs.common.block_codec import open_chunk_data
+from chunky_logs.common.chunk import Chunk
+from chunky_logs.common.metadata import MetaData
+from chunky_logs.parser.parser_group import group_chunks
+
+ChunkArrays = namedtuple('ChunkArrays', ['timestamps', 'payload_offsets', 'payload_lengths', 'data'])
+
+def _numpy():
+    """
+    This imports numpy on first use, so that it remains an optional dependency
+    :return: The numpy module on success, raises ImportError if it is not installed
+    """
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("numpy is required for chunk arrays, install it with chunky-logs[numpy]") from None
+    return numpy
+
+def parse_chunk_arrays(data):
+    """
+    This parses chunk data into arrays without a per line loop. Only complete lines are parsed
+    :param data: A numpy uint8 array of the chunk data
+    :return: A ChunkArrays tuple, with an int64 array of the line timestamps and the offsets/lengths of each line's
+    payload within data
+    """
+    np = _numpy()
+    line_ends = np.flatnonzero(data == ord('\n'))
+    line_starts = np.empty_like(line_ends)
+    line_starts[:1] = 0
+    line_starts[1:] = line_ends[:-1] + 1
+
+    # The timestamp is everything before the first separator on each line
+    separators = np.flatnonzero(data == ord(','))
+    separators = separators[np.minimum(np.searchsorted(separators, line_starts), len(separators) - 1)] \
+        if len(separators) else line_starts
+    separators = np.minimum(separators, line_ends)
+    digit_counts = separators - line_starts
+
+    # Accumulate the timestamps one digit column at a time, the loop is over digits rather than lines
+    timestamps = np.zeros(len(line_starts), dtype=np.int64)
+    for column in range(int(digit_counts.max()) if len(digit_counts) else 0):
+        in_timestamp = column < digit_counts
+        digits = data[np.minimum(line_starts + column, len(data) - 1)].astype(np.int64) - ord('0')
+        timestamps = np.where(in_timestamp, timestamps * 10 + digits, timestamps)
+
+    payload_offsets = np.minimum(separators + 1, line_ends)
+    return ChunkArrays(timestamps, payload_offsets, line_ends - payload_offsets, data)
+
+def load_chunk_arrays(group_path: pathlib.Path, chunk_name: pathlib.Path):
+    """
+    This loads a whole chunk into arrays
+    :param group_path: This is the path to the group under which the chunk lives
+    :param chunk_name: This is the name of the chunk
+    :return: A ChunkArrays tuple for the chunk
+    """
+    np = _numpy()
+    chunk_file = pathlib.Path(group_path).joinpath(chunk_name.with_suffix(Chunk.CHUNK_FILE_EXTENSION))
+    block_codec = MetaData(group_path, chunk_name).chunk_block_codec
+    if block_codec is None:
+        return parse_chunk_arrays(np.fromfile(chunk_file, dtype=np.uint8))
+    with open_chunk_data(chunk_file, block_codec) as chunk_data:
+        return parse_chunk_arrays(np.frombuffer(chunk_data.read(), dtype=np.uint8))
+
+def load_group_arrays(group_path: pathlib.Path):
+    """
+    This loads all the chunks in a group into arrays, in the order the chunks were created
+    :param group_path: This is the path to the group
+    :return: A ChunkArrays tuple for the whole group, the payload offsets are within the concatenated chunk data
+    """
+    np = _numpy()
+    chunk_arrays = [load_chunk_arrays(group_path, chunk_name) for chunk_name, _ in group_chunks(group_path)]
+    if not chunk_arrays:
+        return parse_chunk_arrays(np.zeros(0, dtype=np.uint8))
+
+    data_offsets = np.cumsum([0] + [len(arrays.data) for arrays in chunk_arrays[:-1]])
+    return ChunkArrays(
+        np.concatenate([arrays.timestamps for arrays in chunk_arrays]),
+        np.concatenate([arrays.payload_offsets + offset for arrays, offset in zip(chunk_arrays, data_offsets)]),
+        np.concatenate([arrays.payload_lengths for arrays in chunk_arrays]),
+        np.concatenate([arrays.data for arrays in chunk_arrays])
+    )
+
+def payload(chunk_arrays: ChunkArrays, line):
+    """
+    This gets the payload of a single line
+    :param chunk_arrays: The ChunkArrays the line is in
+    :param line: The (0 based) number of the line
+    :return: The payload bytes
+    """
+    offset = chunk_arrays.payload_offsets[line]
+    return chunk_arrays.data[offset:offset + chunk_arrays.payload_lengths[line]].tobytes()
+
+def inter_arrival(timestamps):
+    """
+    This gets the time between each line and the line before it
+    :param timestamps: An array of line timestamps
+    :return: An int64 array of the deltas in ms, this is one shorter than timestamps
+    """
+    return _numpy().diff(timestamps)
+
+def rate_histogram(timestamps, bin_ms=1000):
+    """
+    This counts the lines within fixed width time bins
+    :param timestamps: An array of line timestamps
+    :param bin_ms: The width of each bin in ms
+    :return: A tuple of (bin start timestamps, line counts)
+    """
+    np = _numpy()
+    if not len(timestamps):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    first_bin = timestamps.min() // bin_ms
+    counts = np.bincount(timestamps // bin_ms - first_bin)
+    return (first_bin + np.arange(len(counts))) * bin_ms, counts
+
+def find_gaps(timestamps, threshold_ms):
+    """
+    This finds gaps between lines which are longer than a threshold
+    :param timestamps: An array of line timestamps
+    :param threshold_ms: The gap length in ms above which a gap is reported
+    :return: An array of the line numbers which follow each gap
+    """
+    np = _numpy()
+    return np.flatnonzero(np.diff(timestamps) > threshold_ms) + 1
@@ -1,8 +1,15 @@
-import linecache
+import collections
 import logging
+import mmap
+import os
 import pathlib
+import time
+from chunky_logs.common.block_codec import open_chunk_data
 from chunky_logs.common.chunk import Chunk, ChunkManagedFileError
 from chunky_logs.common.chunk import MetaData
+from chunky_logs.common.hashing import data_checksum, DEFAULT_BLOCK_SIZE
+from chunky_logs.common.line_index import LineIndex, line_timestamp
+from chunky_logs.common.watcher import create_watcher
 
 class ParserChunkManagedFileError(ChunkManagedFileError):
     pass
@@ -14,32 +21,330 @@ class ParserChunk(Chunk):
     """
     This class knows how to parse and read a existing Chunk file
     """
-    def __init__(self, group_path: pathlib.Path, chunk_name: pathlib.Path):
-        super().__init__(group_path, chunk_name, MetaData(group_path, chunk_name))
+    READ_BLOCK_SIZE = 1024 * 1024
+
+    def __init__(self, group_path: pathlib.Path, chunk_name: pathlib.Path, checksum_fallback: bool = False,
+                 metrics=None, metadata: MetaData = None):
+        """
+        This is the constructor for a ParserChunk
+        :param group_path: This is the path to the group under which this chunk lives
+        :param chunk_name: This is the name for the chunk this instance represents
+        :param checksum_fallback: When True has_changed() will also compare the checksum of the metadata file when its
+        stat signature is unchanged, for filesystems with coarse timestamps
+        :param metrics: The metrics sink to record lines, bytes and latencies to, None uses the default sink (if any)
+        :param metadata: The chunk's MetaData when it has already been loaded (for example by group_chunks), None loads it
+        """
+        super().__init__(group_path, chunk_name, metadata or MetaData(group_path, chunk_name), metrics)
+        if self._metrics is not None:
+            self._lines_metric = self._metrics.counter('parser.lines')
+            self._bytes_metric = self._metrics.counter('parser.bytes')
+            self._read_metric = self._metrics.histogram('parser.read_ns')
+            self._follow_wait_metric = self._metrics.histogram('parser.follow_wait_ns')
         self._logger = logging.getLogger(self.__class__.__name__)
-        self._chunk_pos = None
-        self._current_checksum = self.metadata.checksum
+        self._chunk_pos = 0
+        self._read_pos = 0
+        self._pending = collections.deque()
+        self._chunk_handle = None
+        self._line_index = None
+        self._checksum_fallback = checksum_fallback
+        self._current_checksum = self.metadata.checksum if checksum_fallback else None
+
+    def _open_chunk(self):
+        """
+        This gets the long-lived handle to the chunk file, opening it on first use. For block compressed chunks this
+        reads the logical (uncompressed) data
+        :return: The chunk file handle
+        """
+        if self._chunk_handle is None:
+            self._chunk_handle = open_chunk_data(self._chunk_file, self.metadata.chunk_block_codec)
+        return self._chunk_handle
+
+    def _fill(self):
+        """
+        This reads the next block of the chunk file, adding the complete lines within it to the pending lines. Any
+        partially written line at the end of the block is left to be read again once it has been completed
+        :return: True if any lines were added, False if there are no more complete lines in the chunk
+        """
+        if self._metrics is not None:
+            read_start = time.perf_counter_ns()
+        try:
+            chunk_data = self._open_chunk()
+            chunk_data.seek(self._read_pos)
+            block = chunk_data.read(ParserChunk.READ_BLOCK_SIZE)
+            end = block.rfind(b'\n') + 1
+            while end == 0 and len(block) % ParserChunk.READ_BLOCK_SIZE == 0 and block:
+                # A single line longer than the block size
+                more = chunk_data.read(ParserChunk.READ_BLOCK_SIZE)
+                if not more:
+                    break
+                block += more
+                end = block.rfind(b'\n') + 1
+        except FileNotFoundError as e:
+            raise ParserChunkManagedFileError(f"Chunk file not found: {e}") from None
+        except Exception as e:
+            raise ParserChunkReadError(f"Error while reading chunk: {e}") from None
+
+        if end == 0:
+            return False
+        lines = block[:end].split(b'\n')
+        lines.pop()
+        self._pending.extend(lines)
+        self._read_pos += end
+        if self._metrics is not None:
+            self._read_metric.record(time.perf_counter_ns() - read_start)
+            self._lines_metric.add(len(lines))
+            self._bytes_metric.add(end)
+        return True
+
+    def _discard_pending(self):
+        """
+        This drops any lines which have been read ahead but not consumed, so the next read starts at _chunk_pos
+        """
+        self._pending.clear()
+        self._read_pos = self._chunk_pos
 
     def read_line(self):
         """
         This will read a chunk file one line at a time. Repeated calls will continue to read from the last line read,
-        this should allow clients to ingest the whole file one line at a time
+        this should allow clients to ingest the whole file one line at a time. A partially written line at the end of
+        the chunk is not returned until it has been completed
         :return: The line read on success, once the end of the file is reached it will return None
         """
+        if not self._pending and not self._fill():
+            return None
+        line = self._pending.popleft()
+        self._chunk_pos += len(line) + 1
+        return line.decode('utf-8').strip()
+
+    def read_lines(self, line_count):
+        """
+        This will read up to line_count lines from the chunk file, continuing from the last line read
+        :param line_count: The maximum number of lines to read
+        :return: A list of the lines read, this is empty once the end of the file is reached
+        """
+        lines = []
+        pending = self._pending
+        while len(lines) < line_count and (pending or self._fill()):
+            for _ in range(min(line_count - len(lines), len(pending))):
+                line = pending.popleft()
+                self._chunk_pos += len(line) + 1
+                lines.append(line.decode('utf-8').strip())
+        return lines
+
+    def read_bytes_until(self, end_pos=None):
+        """
+        This will read the raw bytes of the complete lines from the last line read, up to a position in the chunk file
+        :param end_pos: The byte position in the chunk file to read up to, None reads to the end of the file. If this
+        falls part way through a line, that line is not included
+        :return: The bytes read, this will be empty if there are no complete lines before end_pos
+        """
+        self._discard_pending()
+        try:
+            chunk_data = self._open_chunk()
+            chunk_data.seek(self._chunk_pos)
+            data = chunk_data.read() if end_pos is None else chunk_data.read(max(0, end_pos - self._chunk_pos))
+        except FileNotFoundError as e:
+            raise ParserChunkManagedFileError(f"Chunk file not found: {e}") from None
+        except Exception as e:
+            raise ParserChunkReadError(f"Error while reading chunk: {e}") from None
+
+        data = data[:data.rfind(b'\n') + 1]
+        self._chunk_pos += len(data)
+        self._read_pos = self._chunk_pos
+        return data
+
+    def __iter__(self):
+        """
+        This iterates over the lines in the chunk file, continuing from the last line read and finishing at the end of
+        the complete lines currently in the file
+        """
+        pending = self._pending
+        while pending or self._fill():
+            while pending:
+                line = pending.popleft()
+                self._chunk_pos += len(line) + 1
+                yield line.decode('utf-8').strip()
+
+    def read_views(self):
+        """
+        This is a generator which reads the lines in the chunk file through a memory map, continuing from the last line
+        read. No data is decoded or copied, each payload is a memoryview onto the mapped file which the caller can
+        convert (for example with bytes() or str(payload, 'utf-8')) if it needs to. The file is remapped if it has grown
+        once the end of the current mapping is reached. Only complete lines are returned
+        :return: Yields a (timestamp ms, payload memoryview) tuple for each line
+        """
+        if self.metadata.chunk_block_codec is not None:
+            raise ParserChunkReadError("Memory mapped reads are not supported for block compressed chunks")
+        self._discard_pending()
+        try:
+            chunk_fd = self._open_chunk().fileno()
+            mapped = None
+            pos = self._chunk_pos
+            while True:
+                line_end = -1 if mapped is None else find(b'\n', pos)
+                if line_end == -1:
+                    # The end of the mapping, remap if the file has grown since it was mapped
+                    size = os.fstat(chunk_fd).st_size
+                    if size <= pos or (mapped is not None and size == len(mapped)):
+                        return
+                    mapped = mmap.mmap(chunk_fd, size, access=mmap.ACCESS_READ)
+                    view = memoryview(mapped)
+                    find = mapped.find
+                    continue
+
+                separator = find(b',', pos, line_end)
+                timestamp = int(mapped[pos:separator])
+                payload = view[separator + 1:line_end]
+                pos = line_end + 1
+                self._chunk_pos = self._read_pos = pos
+                yield timestamp, payload
+        except FileNotFoundError as e:
+            raise ParserChunkManagedFileError(f"Chunk file not found: {e}") from None
+        except (OSError, ValueError) as e:
+            raise ParserChunkReadError(f"Error while reading chunk: {e}") from None
+
+    def follow(self, idle_timeout=None):
+        """
+        This is a generator which reads the chunk file one line at a time, continuing from the last line read. Once
+        the end of the chunk is reached it blocks until new data is appended (using inotify where available, falling
+        back to polling where it is not). Only complete lines are returned
+        :param idle_timeout: The time in seconds to wait for new data before finishing, None waits indefinitely
+        :return: Yields each line as it is read, finishing on the idle timeout or when the chunk file is removed
+        """
+        watcher = create_watcher(self._group_path, [self._chunk_file.name, os.path.basename(self.metadata.file)])
         try:
-            with open(self._chunk_file, 'r') as chunk_data:
-                if self._chunk_pos:
-                    chunk_data.seek(self._chunk_pos)
+            while True:
+                if os.path.exists(self._chunk_file) or self._chunk_handle is not None:
+                    yield from self
+                    if not os.path.exists(self._chunk_file):
+                        self._logger.debug(f"Chunk file removed, finished following. file={self._chunk_file}")
+                        return
 
-                line = chunk_data.readline()
+                # Either the end of the chunk, or a partially written line, wait for more data
+                if self._metrics is not None:
+                    wait_start = time.perf_counter_ns()
+                if not watcher.wait(idle_timeout):
+                    return
+                if self._metrics is not None:
+                    self._follow_wait_metric.record(time.perf_counter_ns() - wait_start)
+        finally:
+            watcher.close()
 
-                if line:
-                    self._chunk_pos = chunk_data.tell()
-                return line.strip()
+    def close(self):
+        """
+        This closes the chunk file if it is being held open
+        """
+        if self._chunk_handle is not None:
+            self._chunk_handle.close()
+            self._chunk_handle = None
+
+    def _get_line_index(self, line_count):
+        """
+        This gets the line index for the chunk, covering at least line_count lines where the chunk has them. The index
+        is loaded from its sidecar file, or rebuilt when that is missing or stale, and then extended from the chunk file
+        to cover any lines written since the last indexed line
+        :param line_count: The number of lines the index needs to cover, None to cover all the lines in the chunk
+        :return: The LineIndex for the chunk
+        """
+        chunk_data = self._open_chunk()
+        if self._line_index is None:
+            self._line_index = LineIndex.load(self._index_file)
+            if self._line_index is None or not self._line_index.is_valid(chunk_data):
+                self._logger.debug(f"Line index missing or stale, rebuilding. file={self._index_file}")
+                self._line_index = LineIndex()
+        if line_count is None or self._line_index.line_count < line_count:
+            self._line_index.extend(chunk_data)
+        return self._line_index
+
+    def lines(self, start, end):
+        """
+        This gets a range of lines from the chunk, using the line index to seek directly to them
+        :param start: The (0 based) number of the first line to get
+        :param end: The number of the line after the last line to get
+        :return: A list of the lines, this will be capped to the number of complete lines in the chunk
+        """
+        start = max(start, 0)
+        if end <= start:
+            return []
+
+        try:
+            offset, skip = self._get_line_index(end).locate(start)
+            chunk_data = self._open_chunk()
+            chunk_data.seek(offset)
+
+            lines = []
+            remainder = b''
+            while len(lines) < skip + end - start:
+                block = chunk_data.read(64 * 1024)
+                if not block:
+                    break
+                lines.extend((remainder + block).split(b'\n'))
+                remainder = lines.pop()
+        except FileNotFoundError as e:
+            raise ParserChunkManagedFileError(f"Chunk file not found: {e}") from None
+        except Exception as e:
+            raise ParserChunkReadError(f"Error while reading chunk: {e}") from None
+
+        return [line.decode('utf-8').strip() for line in lines[skip:skip + end - start]]
+
+    def line(self, line_number):
+        """
+        This gets a single line from the chunk, using the line index to seek directly to it
+        :param line_number: The (0 based) number of the line to get
+        :return: The line on success, None if the chunk does not have the line
+        """
+        lines = self.lines(line_number, line_number + 1)
+        return lines[0] if lines else None
+
+    def seek_time(self, timestamp):
+        """
+        This moves the read position to the first line at or after a time, so that the following reads continue from
+        there. The line index is binary searched for the nearest indexed line, and the lines are then read forward from
+        it. This assumes timestamps do not decrease through the chunk
+        :param timestamp: The timestamp in ms to seek to
+        :return: The (0 based) number of the line seeked to on success, None if there are no lines at or after the time
+        """
+        try:
+            offset, line_number = self._get_line_index(None).locate_time(timestamp)
+            chunk_data = self._open_chunk()
+            chunk_data.seek(offset)
+
+            remainder = b''
+            for block in iter(lambda: chunk_data.read(64 * 1024), b""):
+                lines = (remainder + block).split(b'\n')
+                remainder = lines.pop()
+                for line in lines:
+                    if line_timestamp(line) >= timestamp:
+                        self._chunk_pos = offset
+                        self._discard_pending()
+                        return line_number
+                    offset += len(line) + 1
+                    line_number += 1
         except FileNotFoundError as e:
             raise ParserChunkManagedFileError(f"Chunk file not found: {e}") from None
         except Exception as e:
             raise ParserChunkReadError(f"Error while reading chunk: {e}") from None
+        return None
+
+    def read_range(self, start_timestamp, end_timestamp):
+        """
+        This is a generator which reads the lines within a time range, seeking to the start of the range first
+        :param start_timestamp: The timestamp in ms to start from (inclusive)
+        :param end_timestamp: The timestamp in ms to end at (exclusive)
+        :return: Yields each line within the range, the read position is left at the first line after the range
+        """
+        if self.seek_time(start_timestamp) is None:
+            return
+
+        pending = self._pending
+        while pending or self._fill():
+            while pending:
+                line = pending[0]
+                if line_timestamp(line) >= end_timestamp:
+                    return
+                pending.popleft()
+                self._chunk_pos += len(line) + 1
+                yield line.decode('utf-8').strip()
 
     def head(self, line_count = 1):
         """
@@ -49,16 +354,7 @@ class ParserChunk(Chunk):
         number of lines in the file)
         """
         line_count = min(line_count, self.metadata.chunk_line_count)
-        lines = []
-        try:
-            read_line = 1
-            while len(lines) < line_count:
-                lines.append(linecache.getline(str(self._chunk_file), read_line).strip())
-                read_line += 1
-        except FileNotFoundError as e:
-            raise ParserChunkManagedFileError(f"Chunk file not found: {e}") from None
-        except Exception as e:
-            raise ParserChunkReadError(f"Error while reading chunk: {e}") from None
+        lines = self.lines(0, line_count)
 
         if 1 == line_count:
             return lines[0]
@@ -72,31 +368,45 @@ class ParserChunk(Chunk):
         number of lines in the file)
         """
         line_count = min(line_count, self.metadata.chunk_line_count)
-        lines = []
-        try:
-            read_line = self.metadata.chunk_line_count
-            while len(lines) < line_count:
-                lines.insert(0, linecache.getline(str(self._chunk_file), read_line).strip())
-                read_line -= 1
-        except FileNotFoundError as e:
-            raise ParserChunkManagedFileError(f"Chunk file not found: {e}") from None
-        except Exception as e:
-            raise ParserChunkReadError(f"Error while reading chunk: {e}") from None
+        lines = self.lines(self.metadata.chunk_line_count - line_count, self.metadata.chunk_line_count)
 
         if 1 == line_count:
             return lines[0]
         return lines
 
     def has_changed(self):
-            """
-            This will use the checksum of the metadata file to decide if the chunk has been updated, this is lighter weight
-            than relying on the checksum of the chunk file as it will most likely be magnitudes smaller
-            :return: True if the metadata changes (indicating there is new data to parse in the chunk), False if not
-            """
+        """
+        This will use the stat signature (mtime, size and inode) of the metadata file to decide if the chunk has been
+        updated, reloading the metadata when it has. When nothing has changed this costs a single stat call. If the
+        checksum fallback is enabled the checksum of the metadata file is compared as well
+        :return: True if the metadata changes (indicating there is new data to parse in the chunk), False if not
+        """
+        changed = self.metadata.reload()
+        if self._checksum_fallback:
             current_checksum = self.metadata.checksum
             if current_checksum != self._current_checksum:
-                self._logger.debug(f"Metadata file has been updated, reloading.")
-                self.metadata.reload()
+                if not changed:
+                    self.metadata.read_from_disk()
                 self._current_checksum = current_checksum
-                return True
-            return False
\ No newline at end of file
+                changed = True
+
+        if changed:
+            self._logger.debug(f"Metadata file has been updated, reloaded.")
+        return changed
+
+    def verify(self, block_size: int = DEFAULT_BLOCK_SIZE):
+        """
+        This checks the contents of the chunk file against the checksum recorded in the metadata, using whichever
+        checksum type the metadata records. A chunk which is still being written may not match until its author has
+        written out the metadata for the latest lines
+        :param block_size: The size of the blocks to read the chunk file in
+        :return: True if the checksum matches, False if not
+        """
+        self.metadata.reload()
+        with open_chunk_data(self._chunk_file, self.metadata.chunk_block_codec) as chunk_data:
+            checksum = data_checksum(chunk_data, self.metadata.chunk_checksum_type, block_size)
+        if checksum.hexdigest() != self.metadata.chunk_checksum_hash:
+            self._logger.warning(f"Chunk does not match its checksum. file={self._chunk_file} "
+                                 f"expected={self.metadata.chunk_checksum_hash} actual={checksum.hexdigest()}")
+            return False
+        return True
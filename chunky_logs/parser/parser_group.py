@@ -0,0 +1,286 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import pathlib
+import time
+from chunky_logs.common.group_manifest import GroupManifest, manifest_entry_metadata
+from chunky_logs.common.metadata import MetaData, MetaDataError, MetaDataSourceError
+from chunky_logs.common.metrics import get_default_metrics
+from chunky_logs.common.watcher import create_watcher
+from chunky_logs.parser.parser_chunk import ParserChunk, ParserChunkManagedFileError
+
+_logger = logging.getLogger(__name__)
+
+class ParserGroupError(RuntimeError):
+    pass
+
+def group_chunks(group_path: pathlib.Path):
+    """
+    This finds the chunks within a group. When the group has a manifest the closed chunks are taken from it, and only
+    the metadata files of the active chunks are read. Otherwise every metadata file in the group is read
+    :param group_path: This is the path to the group
+    :return: A list of (chunk name, MetaData) tuples, in the order the chunks were created
+    """
+    manifest = GroupManifest.load(group_path)
+    if manifest is not None:
+        return _manifest_chunks(group_path, manifest)
+
+    chunks = []
+    for metadata_file in pathlib.Path(group_path).glob(f"*{MetaData.METADATA_FILE_EXTENSION}"):
+        chunk_name = pathlib.Path(metadata_file.name[:-len(MetaData.METADATA_FILE_EXTENSION)])
+        try:
+            chunks.append((chunk_name, MetaData(group_path, chunk_name)))
+        except (MetaDataError, MetaDataSourceError, ValueError) as e:
+            _logger.debug(f"Skipping chunk with unreadable metadata. chunk={chunk_name} error={e}")
+    chunks.sort(key=lambda chunk: (chunk[1].chunk_time_create, str(chunk[0])))
+    return chunks
+
+def _manifest_chunks(group_path: pathlib.Path, manifest: GroupManifest):
+    """
+    This gets the chunks within a group from its manifest, the metadata of closed chunks is taken from their manifest
+    entries and is only read from disk if it is reloaded
+    :param group_path: This is the path to the group
+    :param manifest: The group's GroupManifest
+    :return: A list of (chunk name, MetaData) tuples, in the order the chunks were created
+    """
+    chunks = []
+    for entry in manifest.entries():
+        chunk_name = pathlib.Path(entry.chunk_name)
+        if entry.status == 'closed':
+            if entry.line_count > 0:
+                chunks.append((chunk_name, manifest_entry_metadata(group_path, entry)))
+            continue
+        metadata_file = pathlib.Path(group_path).joinpath(chunk_name.with_suffix(MetaData.METADATA_FILE_EXTENSION))
+        if not os.path.exists(metadata_file):
+            # The chunk has been created, but nothing has been written to it yet
+            continue
+        try:
+            chunks.append((chunk_name, MetaData(group_path, chunk_name)))
+        except (MetaDataError, MetaDataSourceError, ValueError) as e:
+            _logger.debug(f"Skipping chunk with unreadable metadata. chunk={chunk_name} error={e}")
+    chunks.sort(key=lambda chunk: (chunk[1].chunk_time_create, str(chunk[0])))
+    return chunks
+
+def seek_group_time(group_path: pathlib.Path, timestamp):
+    """
+    This finds the first line at or after a time within a group. Chunks which end before the time are skipped using
+    their metadata, and the line is then found using the chunk's line index
+    :param group_path: This is the path to the group
+    :param timestamp: The timestamp in ms to seek to
+    :return: A ParserChunk with its read position at the line on success, None if there are no lines at or after the time
+    """
+    for chunk_name, metadata in group_chunks(group_path):
+        if metadata.chunk_line_count == 0 or metadata.chunk_time_update < timestamp:
+            continue
+        parser_chunk = ParserChunk(group_path, chunk_name, metadata=metadata)
+        if parser_chunk.seek_time(timestamp) is not None:
+            return parser_chunk
+        parser_chunk.close()
+    return None
+
+def read_group_range(group_path: pathlib.Path, start_timestamp, end_timestamp):
+    """
+    This is a generator which reads the lines within a time range across the chunks of a group. Chunks outside of the
+    range are skipped using their metadata, and within a chunk the start of the range is found using its line index
+    :param group_path: This is the path to the group
+    :param start_timestamp: The timestamp in ms to start from (inclusive)
+    :param end_timestamp: The timestamp in ms to end at (exclusive)
+    :return: Yields each line within the range
+    """
+    for chunk_name, metadata in group_chunks(group_path):
+        if metadata.chunk_time_create >= end_timestamp:
+            break
+        if metadata.chunk_line_count == 0 or metadata.chunk_time_update < start_timestamp:
+            continue
+        with ParserChunk(group_path, chunk_name, metadata=metadata) as parser_chunk:
+            yield from parser_chunk.read_range(start_timestamp, end_timestamp)
+
+class ParserGroup:
+    """
+    This class reads the lines of a Group from its first to its last Chunk. While one Chunk is being read a background
+    thread prepares the next, loading its metadata, opening it, asking the operating system to read it ahead into the
+    page cache (where posix_fadvise is available) and reading its first block, so reading does not stall at each Chunk
+    boundary. Chunks created while the Group is being read are picked up once the known Chunks have been read, and
+    follow() keeps reading the Group as it is written
+    """
+    def __init__(self, group_path: pathlib.Path, prefetch: bool = True, verify: bool = False, metrics=None,
+                 **chunk_kwargs):
+        """
+        This is the constructor for a ParserGroup
+        :param group_path: This is the path to the group
+        :param prefetch: When True the next Chunk is prepared on a background thread, when False each Chunk is
+        prepared when it is reached
+        :param verify: When True each Chunk is checked against its checksum as it is prepared, and ParserGroupError is
+        raised when it is reached if it does not match
+        :param metrics: The metrics sink to record prefetch waits to (and pass to the Chunks), None uses the default sink
+        :param chunk_kwargs: Any further arguments for each ParserChunk
+        """
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._group_path = pathlib.Path(group_path)
+        self._verify = verify
+        self._chunk_kwargs = dict(chunk_kwargs, metrics=metrics)
+        metrics = metrics if metrics is not None else get_default_metrics()
+        self._prefetch_wait_metric = None if metrics is None else metrics.histogram('group.prefetch_wait_ns')
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"ParserGroup-{self._group_path.name}") \
+            if prefetch else None
+        self._chunk_name = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def chunk_name(self) -> pathlib.Path:
+        """
+        This is the name of the Chunk currently being read, None before the first Chunk is reached
+        """
+        return self._chunk_name
+
+    def _prepare(self, chunk_name, metadata):
+        """
+        This opens a Chunk ready to be read, and reads its first block
+        :param chunk_name: The name of the Chunk
+        :param metadata: The Chunk's MetaData as loaded when the Group was listed
+        :return: The ParserChunk
+        """
+        metadata.reload()
+        parser_chunk = ParserChunk(self._group_path, chunk_name, metadata=metadata, **self._chunk_kwargs)
+        try:
+            if self._verify and not parser_chunk.verify():
+                raise ParserGroupError(f"Chunk does not match its checksum. chunk={chunk_name}")
+            if hasattr(os, 'posix_fadvise'):
+                chunk_fd = os.open(parser_chunk._chunk_file, os.O_RDONLY)
+                try:
+                    os.posix_fadvise(chunk_fd, 0, 0, os.POSIX_FADV_WILLNEED)
+                finally:
+                    os.close(chunk_fd)
+            parser_chunk._fill()
+        except Exception:
+            parser_chunk.close()
+            raise
+        return parser_chunk
+
+    def _prefetch(self, chunk):
+        """
+        This starts preparing a Chunk on the background thread
+        :param chunk: The (chunk name, MetaData) tuple of the Chunk
+        :return: The Future for the ParserChunk, None when prefetching is disabled
+        """
+        if self._executor is None:
+            return None
+        return self._executor.submit(self._prepare, *chunk)
+
+    def _take(self, prepared, chunk):
+        """
+        This gets a prepared Chunk, waiting for the background thread if it is still being prepared
+        :param prepared: The Future from _prefetch()
+        :param chunk: The (chunk name, MetaData) tuple of the Chunk
+        :return: The ParserChunk
+        """
+        if prepared is None:
+            return self._prepare(*chunk)
+        if self._prefetch_wait_metric is None:
+            return prepared.result()
+        wait_start = time.perf_counter_ns()
+        try:
+            return prepared.result()
+        finally:
+            self._prefetch_wait_metric.record(time.perf_counter_ns() - wait_start)
+
+    @staticmethod
+    def _discard(prepared):
+        """
+        This closes a prepared Chunk which will not be read, once it has been prepared
+        """
+        def close(future):
+            if future.exception() is None:
+                future.result().close()
+        if prepared is not None:
+            prepared.add_done_callback(close)
+
+    def __iter__(self):
+        """
+        This iterates over the lines of every Chunk in the Group, in the order the Chunks were created. The last Chunk
+        found is held open, and once a newer Chunk is found it is read to its end before moving on, as its author may
+        have added lines to it before rolling over
+        """
+        return self._read_chunks()
+
+    def follow(self, idle_timeout=None):
+        """
+        This is a generator which reads the lines of every Chunk in the Group, and then follows the Group as it is
+        written. Once the end of the active Chunk is reached it blocks until the Group changes (using inotify where
+        available, falling back to polling where it is not), continuing with the active Chunk's new lines and moving on
+        to a new Chunk once its author rolls over to it. Only complete lines are returned
+        :param idle_timeout: The time in seconds to wait for the Group to change before finishing, None waits
+        indefinitely
+        :return: Yields each line as it is read, finishing on the idle timeout
+        """
+        watcher = create_watcher(self._group_path, None)
+        try:
+            yield from self._read_chunks(watcher, idle_timeout)
+        finally:
+            watcher.close()
+
+    def _read_chunks(self, watcher=None, idle_timeout=None):
+        """
+        This is a generator which reads the lines of the Chunks in the Group, rescanning the Group for new Chunks once
+        the known Chunks have been read
+        :param watcher: When set the last Chunk is followed, waiting on the watcher for the Group to change once the
+        end of the last Chunk is reached. When None the lines are read until the end of the last Chunk
+        :param idle_timeout: The time in seconds to wait on the watcher before finishing, None waits indefinitely
+        :return: Yields each line as it is read
+        """
+        seen = set()
+        last_chunk = None
+        try:
+            while True:
+                chunks = [chunk for chunk in group_chunks(self._group_path) if chunk[0] not in seen]
+                if not chunks:
+                    if watcher is None:
+                        return
+                    if last_chunk is not None:
+                        yield from last_chunk
+                    if not watcher.wait(idle_timeout):
+                        return
+                    continue
+                seen.update(chunk_name for chunk_name, _ in chunks)
+                if last_chunk is not None:
+                    with last_chunk:
+                        yield from last_chunk
+                    last_chunk = None
+
+                prepared = self._prefetch(chunks[0])
+                try:
+                    for position, chunk in enumerate(chunks):
+                        try:
+                            parser_chunk = self._take(prepared, chunk)
+                        except (MetaDataSourceError, ParserChunkManagedFileError) as e:
+                            # The Chunk was evicted from the Group (by its author) before it could be read
+                            self._logger.warning(f"Skipping Chunk removed before it was read. chunk={chunk[0]} "
+                                                 f"error={e}")
+                            parser_chunk = None
+                        prepared = self._prefetch(chunks[position + 1]) if position + 1 < len(chunks) else None
+                        if parser_chunk is None:
+                            continue
+                        self._chunk_name = chunk[0]
+                        if position + 1 < len(chunks):
+                            with parser_chunk:
+                                yield from parser_chunk
+                        else:
+                            last_chunk = parser_chunk
+                            yield from parser_chunk
+                finally:
+                    self._discard(prepared)
+        finally:
+            if last_chunk is not None:
+                last_chunk.close()
+
+    def close(self):
+        """
+        This stops the background thread
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
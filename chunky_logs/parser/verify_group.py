@@ -0,0 +1,138 @@
+import argparse
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import logging
+import os
+import pathlib
+import sys
+from chunky_logs.common.block_codec import open_chunk_data
+from chunky_logs.common.chunk import Chunk
+from chunky_logs.common.hashing import new_checksum, DEFAULT_BLOCK_SIZE
+from chunky_logs.common.metadata import MetaData
+
+_logger = logging.getLogger(__name__)
+
+ChunkVerifyResult = namedtuple('ChunkVerifyResult', [
+    'chunk_name', 'ok', 'expected_checksum', 'actual_checksum', 'expected_line_count', 'actual_line_count', 'error'
+])
+
+GroupVerifyReport = namedtuple('GroupVerifyReport', ['chunk_count', 'verified_count', 'mismatches', 'stopped_early'])
+
+def verify_chunk(group_path: pathlib.Path, chunk_name: pathlib.Path, block_size: int = DEFAULT_BLOCK_SIZE):
+    """
+    This checks a chunk against the checksum and line count recorded in its metadata, both are found in a single pass
+    over the chunk. This is a module level function so that it can be run in a worker process
+    :param group_path: This is the path to the group under which the chunk lives
+    :param chunk_name: This is the name of the chunk
+    :param block_size: The size of the blocks to read the chunk in
+    :return: A ChunkVerifyResult, errors reading the chunk are reported in it rather than raised
+    """
+    try:
+        metadata = MetaData(group_path, chunk_name)
+        chunk_file = pathlib.Path(group_path).joinpath(chunk_name.with_suffix(Chunk.CHUNK_FILE_EXTENSION))
+        checksum = new_checksum(metadata.chunk_checksum_type)
+        line_count = 0
+        with open_chunk_data(chunk_file, metadata.chunk_block_codec) as chunk_data:
+            for block in iter(lambda: chunk_data.read(block_size), b""):
+                checksum.update(block)
+                line_count += block.count(b'\n')
+    except Exception as e:
+        return ChunkVerifyResult(chunk_name, False, None, None, None, None, str(e))
+
+    ok = checksum.hexdigest() == metadata.chunk_checksum_hash and line_count == metadata.chunk_line_count
+    return ChunkVerifyResult(chunk_name, ok, metadata.chunk_checksum_hash, checksum.hexdigest(),
+                             metadata.chunk_line_count, line_count, None)
+
+def _group_chunk_names(group_path: pathlib.Path):
+    """
+    This finds the names of the chunks in a group from their chunk and metadata files, without loading any metadata,
+    so that chunks with missing or unreadable metadata are still verified (and reported). A chunk which has been
+    created but not yet written to, an empty chunk file without a metadata file, is skipped
+    :param group_path: This is the path to the group
+    :return: A sorted list of the chunk names
+    """
+    chunk_names = set()
+    for file_name in os.listdir(group_path):
+        for extension in (Chunk.CHUNK_FILE_EXTENSION, MetaData.METADATA_FILE_EXTENSION):
+            if file_name.endswith(extension):
+                chunk_names.add(file_name[:-len(extension)])
+
+    group_path = pathlib.Path(group_path)
+    for chunk_name in list(chunk_names):
+        if not os.path.exists(group_path.joinpath(chunk_name + MetaData.METADATA_FILE_EXTENSION)):
+            try:
+                if os.path.getsize(group_path.joinpath(chunk_name + Chunk.CHUNK_FILE_EXTENSION)) == 0:
+                    chunk_names.discard(chunk_name)
+            except OSError:
+                pass
+    return [pathlib.Path(chunk_name) for chunk_name in sorted(chunk_names)]
+
+def verify_group(group_path: pathlib.Path, workers: int = None, fail_fast: int = None, progress=None,
+                 block_size: int = DEFAULT_BLOCK_SIZE):
+    """
+    This verifies every chunk in a group against its metadata, spreading the chunks across a pool of worker processes.
+    The chunks are found from the files in the group (see _group_chunk_names()), and their metadata is only loaded as
+    each chunk is verified, so a chunk with missing or corrupt metadata is reported as a mismatch
+    :param group_path: This is the path to the group
+    :param workers: The number of worker processes, None uses the number of CPUs and 1 verifies in this process
+    :param fail_fast: When set verification stops once this many mismatches have been found
+    :param progress: When set this is called with (ChunkVerifyResult, verified count, chunk count) as each chunk is
+    verified, in the order they complete
+    :param block_size: The size of the blocks to read each chunk in
+    :return: A GroupVerifyReport, with the ChunkVerifyResult of every chunk which did not match
+    """
+    chunk_names = _group_chunk_names(group_path)
+    mismatches = []
+    verified_count = 0
+
+    def add_result(result):
+        nonlocal verified_count
+        verified_count += 1
+        if not result.ok:
+            _logger.debug(f"Chunk failed verification. result={result}")
+            mismatches.append(result)
+        if progress is not None:
+            progress(result, verified_count, len(chunk_names))
+        return fail_fast is not None and len(mismatches) >= fail_fast
+
+    if workers == 1:
+        for chunk_name in chunk_names:
+            if add_result(verify_chunk(group_path, chunk_name, block_size)):
+                break
+    elif chunk_names:
+        with ProcessPoolExecutor(workers) as executor:
+            futures = [executor.submit(verify_chunk, group_path, chunk_name, block_size) for chunk_name in chunk_names]
+            for future in as_completed(futures):
+                if add_result(future.result()):
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    break
+
+    return GroupVerifyReport(len(chunk_names), verified_count, mismatches, verified_count < len(chunk_names))
+
+def main(args=None):
+    """
+    This is the command line entry point for verifying a group, it exits with 1 if any chunk did not match
+    :param args: The command line arguments, None uses sys.argv
+    """
+    parser = argparse.ArgumentParser(description="Verify every chunk in a group against its metadata")
+    parser.add_argument('group_path', type=pathlib.Path, help="The path to the group")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="The number of worker processes")
+    parser.add_argument('--fail-fast', type=int, default=None, metavar='N', help="Stop after N mismatches")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Only report mismatches")
+    parsed_args = parser.parse_args(args)
+
+    def report_progress(result, verified_count, chunk_count):
+        if not result.ok:
+            detail = result.error or (f"checksum expected={result.expected_checksum} actual={result.actual_checksum} "
+                                      f"lines expected={result.expected_line_count} actual={result.actual_line_count}")
+            print(f"[{verified_count}/{chunk_count}] MISMATCH {result.chunk_name} {detail}", flush=True)
+        elif not parsed_args.quiet:
+            print(f"[{verified_count}/{chunk_count}] OK {result.chunk_name}", flush=True)
+
+    report = verify_group(parsed_args.group_path, parsed_args.workers, parsed_args.fail_fast, report_progress)
+    print(f"Verified {report.verified_count}/{report.chunk_count} chunks, {len(report.mismatches)} mismatches"
+          f"{', stopped early' if report.stopped_early else ''}")
+    sys.exit(1 if report.mismatches else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import asyncio
+import pathlib
+import pytest
+import tempfile
+import threading
+import time
+from chunky_logs.author import AsyncAuthorChunk
+from chunky_logs.common.hashing import file_md5sum
+from chunky_logs.parser import ParserChunk
+
+def test_write_lines():
+    """
+    Tests that lines queued from many concurrent tasks are written in order for each chunk, in the same format as an
+    AuthorChunk
+    """
+    async def write_chunk(group_path, chunk_name):
+        async with await AsyncAuthorChunk.open(group_path, pathlib.Path(chunk_name)) as author_chunk:
+            for i in range(100):
+                author_chunk.write_line(f"{chunk_name}_line{i}")
+                if i % 10 == 0:
+                    await asyncio.sleep(0)
+            author_chunk.write_lines(["last"], [99999])
+            await author_chunk.flush()
+            assert 101 == author_chunk.metadata.chunk_line_count
+
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+
+        async def write_chunks():
+            await asyncio.gather(*[write_chunk(group_path, f"chunk_{i}") for i in range(20)])
+        asyncio.run(write_chunks())
+
+        for i in range(20):
+            with ParserChunk(group_path, pathlib.Path(f"chunk_{i}")) as parser_chunk:
+                lines = list(parser_chunk)
+                assert [f"chunk_{i}_line{j}" for j in range(100)] == [line.split(',', 1)[1] for line in lines[:-1]]
+                assert "99999,last" == lines[-1]
+                assert 101 == parser_chunk.metadata.chunk_line_count
+                assert file_md5sum(parser_chunk._chunk_file) == parser_chunk.metadata.chunk_checksum_hash
+
+def test_write_lines_timestamp_mismatch():
+    """
+    Tests that a batch without one timestamp per line is rejected without queueing any of its lines
+    """
+    async def write_chunk(group_path):
+        async with await AsyncAuthorChunk.open(group_path, pathlib.Path('chunk_1')) as author_chunk:
+            with pytest.raises(ValueError):
+                author_chunk.write_lines(["line0", "line1"], [1000])
+            author_chunk.write_lines(["line2"], [1002])
+            await author_chunk.flush()
+            assert 1 == author_chunk.metadata.chunk_line_count
+
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        asyncio.run(write_chunk(group_path))
+        with ParserChunk(group_path, pathlib.Path('chunk_1')) as parser_chunk:
+            assert ["1002,line2"] == list(parser_chunk)
+
+def test_flush_finished_write():
+    """
+    Tests that flush returns when the batch write has already finished, but its callback has not run yet
+    """
+    async def write_chunk(group_path):
+        async with await AsyncAuthorChunk.open(group_path, pathlib.Path('chunk_1')) as author_chunk:
+            author_chunk.write_line("line0")
+            # Block the event loop until the write has finished, then let its result (but not its callback) be set
+            time.sleep(0.1)
+            await asyncio.sleep(0)
+            await author_chunk.flush()
+            assert 1 == author_chunk.metadata.chunk_line_count
+
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        errors = []
+
+        def run():
+            try:
+                asyncio.run(write_chunk(pathlib.Path(test_data_directory)))
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        thread.join(5)
+        assert not thread.is_alive()
+        assert [] == errors
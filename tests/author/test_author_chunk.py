@@ -1,27 +1,35 @@
+import os
 import pathlib
 import pytest
 import shutil
 import tempfile
+import threading
+import time
 from unittest import mock, TestCase
-from chunky_logs.author import AuthorChunk
+from chunky_logs.author import AuthorChunk, AuthorChunkFlushPolicy, AuthorChunkDurability, AuthorChunkError, \
+    AuthorMetaData
+from chunky_logs.common.block_codec import encode_block
+from chunky_logs.common.hashing import file_md5sum
+from chunky_logs.parser import ParserChunk, group_chunks, verify_group
 
 class TestParserChunk(TestCase):
     @mock.patch("chunky_logs.author.author_chunk.AuthorMetaData")
     def setUp(self, mock_metadata):
         self.test_data_directory = tempfile.mkdtemp()
-        group_path = pathlib.PurePosixPath(self.test_data_directory)
-        chunk_name = pathlib.PurePosixPath('chunk_1')
+        self.group_path = pathlib.PurePosixPath(self.test_data_directory)
+        self.chunk_name = pathlib.PurePosixPath('chunk_1')
 
         self.mock_metadata_instance = mock.MagicMock()
         mock_metadata.return_value = self.mock_metadata_instance
 
-        self.test_author_chunk = AuthorChunk(group_path, chunk_name)
+        self.test_author_chunk = AuthorChunk(self.group_path, self.chunk_name)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_data_directory)
 
     @mock.patch("time.time_ns")
-    @mock.patch("chunky_logs.author.author_chunk.file_md5sum")
-    def test_write_line(self, patch_file_md5sum, patche_time_ns):
+    def test_write_line(self, patche_time_ns):
         patche_time_ns.return_value = 1739201327644200000
-        patch_file_md5sum.return_value = 'xliyudtn3e'
 
         self.mock_metadata_instance.chunk_line_count = 0
 
@@ -31,23 +39,362 @@ class TestParserChunk(TestCase):
             assert self.mock_metadata_instance.chunk_line_count == 1
             assert self.mock_metadata_instance.chunk_time_create == 1739201327644
             assert self.mock_metadata_instance.chunk_time_update == 1739201327644
-            assert self.mock_metadata_instance.chunk_checksum_hash == 'xliyudtn3e'
-            assert self.mock_metadata_instance.write_to_disk.call_count == 1
-            mock_file.assert_called_once_with(self.test_author_chunk._chunk_file, 'a')
+            assert self.mock_metadata_instance.chunk_checksum_hash == '74da9b1e92bc2c13fdd67c159d01789a'
+            assert self.mock_metadata_instance.sync.call_count == 1
+            mock_file.assert_called_once_with(self.test_author_chunk._chunk_file, 'ab')
             file_handle = mock_file()
-            file_handle.write.assert_called_once_with("1739201327644,test_data_1\n")
+            file_handle.write.assert_called_once_with(b"1739201327644,test_data_1\n")
 
         with mock.patch("builtins.open", mock.mock_open()) as mock_file:
             patche_time_ns.return_value = 1739201725461603000
-            patch_file_md5sum.return_value = 'eo2tzhwvd3'
 
             self.test_author_chunk.write_line('test_data_2')
 
             assert self.mock_metadata_instance.chunk_line_count == 2
             assert self.mock_metadata_instance.chunk_time_create == 1739201327644
             assert self.mock_metadata_instance.chunk_time_update == 1739201725461
-            assert self.mock_metadata_instance.chunk_checksum_hash == 'eo2tzhwvd3'
-            assert self.mock_metadata_instance.write_to_disk.call_count == 2
-            mock_file.assert_called_once_with(self.test_author_chunk._chunk_file, 'a')
+            assert self.mock_metadata_instance.chunk_checksum_hash == 'cd3b68e8d8a0324b7ba326f919ddbee0'
+            assert self.mock_metadata_instance.sync.call_count == 2
+            mock_file.assert_called_once_with(self.test_author_chunk._chunk_file, 'ab')
+            file_handle = mock_file()
+            file_handle.write.assert_called_once_with(b"1739201725461,test_data_2\n")
+
+    def test_write_line_checksum(self):
+        """
+        Tests that the running checksum matches a full checksum of the chunk file after every line
+        """
+        self.mock_metadata_instance.chunk_line_count = 0
+
+        for i in range(100):
+            self.test_author_chunk.write_line(f'test_data_{i}')
+            assert self.mock_metadata_instance.chunk_checksum_hash == file_md5sum(self.test_author_chunk._chunk_file)
+
+    @mock.patch("chunky_logs.author.author_chunk.AuthorMetaData")
+    def test_reopen_checksum(self, mock_metadata):
+        """
+        Tests that reopening an existing chunk rebuilds the running checksum from disk
+        """
+        self.mock_metadata_instance.chunk_line_count = 0
+        for i in range(10):
+            self.test_author_chunk.write_line(f'test_data_{i}')
+
+        reopened_metadata_instance = mock.MagicMock()
+        reopened_metadata_instance.chunk_line_count = 10
+        reopened_metadata_instance.chunk_block_codec = None
+        reopened_metadata_instance.chunk_checksum_type = 'md5'
+        mock_metadata.return_value = reopened_metadata_instance
+
+        reopened_author_chunk = AuthorChunk(self.group_path, self.chunk_name)
+        for i in range(10, 20):
+            reopened_author_chunk.write_line(f'test_data_{i}')
+            assert reopened_metadata_instance.chunk_checksum_hash == file_md5sum(reopened_author_chunk._chunk_file)
+
+class TestBufferedAuthorChunk(TestCase):
+    @mock.patch("chunky_logs.author.author_chunk.AuthorMetaData")
+    def create_author_chunk(self, flush_policy, mock_metadata):
+        self.mock_metadata_instance = mock.MagicMock()
+        self.mock_metadata_instance.chunk_line_count = 0
+        mock_metadata.return_value = self.mock_metadata_instance
+        return AuthorChunk(self.group_path, self.chunk_name, flush_policy)
+
+    def setUp(self):
+        self.test_data_directory = tempfile.mkdtemp()
+        self.group_path = pathlib.PurePosixPath(self.test_data_directory)
+        self.chunk_name = pathlib.PurePosixPath('chunk_1')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_data_directory)
+
+    def read_chunk_file(self, author_chunk):
+        with open(author_chunk._chunk_file, 'rb') as chunk_data:
+            return chunk_data.read()
+
+    def test_flush_on_line_count(self):
+        """
+        Tests that lines are held back until the line threshold is reached, and that the metadata only reflects the
+        lines which are on disk
+        """
+        test_author_chunk = self.create_author_chunk(AuthorChunkFlushPolicy(max_bytes=None, max_lines=3))
+
+        test_author_chunk.write_line('test_data_1')
+        test_author_chunk.write_line('test_data_2')
+        assert self.mock_metadata_instance.chunk_line_count == 0
+        assert self.mock_metadata_instance.sync.call_count == 0
+
+        test_author_chunk.write_line('test_data_3')
+        assert self.mock_metadata_instance.chunk_line_count == 3
+        assert self.mock_metadata_instance.sync.call_count == 1
+        assert self.read_chunk_file(test_author_chunk).count(b'\n') == 3
+        assert self.mock_metadata_instance.chunk_checksum_hash == file_md5sum(test_author_chunk._chunk_file)
+        test_author_chunk.close()
+
+    def test_flush_on_bytes(self):
+        test_author_chunk = self.create_author_chunk(AuthorChunkFlushPolicy(max_bytes=100))
+
+        for i in range(3):
+            test_author_chunk.write_line('x' * 10)
+        assert self.mock_metadata_instance.chunk_line_count == 0
+
+        test_author_chunk.write_line('x' * 10)
+        assert self.mock_metadata_instance.chunk_line_count == 4
+        test_author_chunk.close()
+
+    @mock.patch("time.monotonic")
+    def test_flush_on_interval(self, patch_monotonic):
+        patch_monotonic.return_value = 100.0
+        test_author_chunk = self.create_author_chunk(AuthorChunkFlushPolicy(max_bytes=None, max_interval_ms=500))
+
+        test_author_chunk.write_line('test_data_1')
+        assert self.mock_metadata_instance.chunk_line_count == 0
+
+        patch_monotonic.return_value = 100.5
+        test_author_chunk.write_line('test_data_2')
+        assert self.mock_metadata_instance.chunk_line_count == 2
+        test_author_chunk.close()
+
+    def test_flush_on_interval_idle(self):
+        """
+        Tests that pending lines are flushed once the interval has passed, even when no further lines are written
+        """
+        test_author_chunk = self.create_author_chunk(AuthorChunkFlushPolicy(max_bytes=None, max_interval_ms=10))
+        test_author_chunk.write_line('test_data_1')
+
+        deadline = time.monotonic() + 5
+        while self.mock_metadata_instance.chunk_line_count == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert self.mock_metadata_instance.chunk_line_count == 1
+        assert self.read_chunk_file(test_author_chunk).endswith(b",test_data_1\n")
+        test_author_chunk.close()
+
+    def test_flush_and_close(self):
+        """
+        Tests that explicit flushes and closing (via the context manager) write out any pending lines
+        """
+        with self.create_author_chunk(AuthorChunkFlushPolicy()) as test_author_chunk:
+            test_author_chunk.write_line('test_data_1')
+            assert self.mock_metadata_instance.chunk_line_count == 0
+
+            test_author_chunk.flush()
+            assert self.mock_metadata_instance.chunk_line_count == 1
+            assert test_author_chunk._chunk_handle is not None
+
+            test_author_chunk.write_line('test_data_2')
+
+        assert test_author_chunk._chunk_handle is None
+        assert self.mock_metadata_instance.chunk_line_count == 2
+        assert self.mock_metadata_instance.chunk_checksum_hash == file_md5sum(test_author_chunk._chunk_file)
+
+    def test_write_lines(self):
+        """
+        Tests that a batch of lines is appended, hashed and has its metadata written once
+        """
+        test_author_chunk = self.create_author_chunk(None)
+        lines_data = [f'test_data_{i}' for i in range(100)]
+        timestamps = [1739201327644 + i for i in range(100)]
+
+        with mock.patch("builtins.open", mock.mock_open()) as mock_file:
+            test_author_chunk.write_lines(lines_data, timestamps)
+
+            mock_file.assert_called_once_with(test_author_chunk._chunk_file, 'ab')
             file_handle = mock_file()
-            file_handle.write.assert_called_once_with("1739201725461,test_data_2\n")
+            file_handle.write.assert_called_once_with(
+                b"".join(f"{timestamp},{line_data}\n".encode() for timestamp, line_data in zip(timestamps, lines_data)))
+
+        assert self.mock_metadata_instance.chunk_line_count == 100
+        assert self.mock_metadata_instance.chunk_time_create == 1739201327644
+        assert self.mock_metadata_instance.chunk_time_update == 1739201327743
+        assert self.mock_metadata_instance.sync.call_count == 1
+
+    @mock.patch("time.time_ns")
+    def test_write_lines_timestamps(self, patch_time_ns):
+        """
+        Tests that when no timestamps are given each line is timestamped as it is written
+        """
+        patch_time_ns.side_effect = [1739201327644000000, 1739201327645000000, 1739201327646000000]
+        test_author_chunk = self.create_author_chunk(None)
+
+        test_author_chunk.write_lines(['test_data_1', 'test_data_2', 'test_data_3'])
+
+        assert self.read_chunk_file(test_author_chunk) == \
+               b"1739201327644,test_data_1\n1739201327645,test_data_2\n1739201327646,test_data_3\n"
+        assert self.mock_metadata_instance.chunk_line_count == 3
+        assert self.mock_metadata_instance.chunk_time_create == 1739201327644
+        assert self.mock_metadata_instance.chunk_time_update == 1739201327646
+        assert self.mock_metadata_instance.chunk_checksum_hash == file_md5sum(test_author_chunk._chunk_file)
+        assert self.mock_metadata_instance.sync.call_count == 1
+
+    def test_write_lines_timestamp_mismatch(self):
+        """
+        Tests that a batch without one timestamp per line is rejected without writing any of its lines
+        """
+        test_author_chunk = self.create_author_chunk(None)
+        with pytest.raises(ValueError):
+            test_author_chunk.write_lines(['test_data_1', 'test_data_2'], [1739201327644])
+        with pytest.raises(ValueError):
+            test_author_chunk.write_lines(['test_data_1'], iter([1739201327644, 1739201327645]))
+        assert 0 == test_author_chunk.line_count
+        assert not os.path.exists(test_author_chunk._chunk_file)
+
+class TestAuthorChunkDurability(TestCase):
+    def setUp(self):
+        self.test_data_directory = tempfile.TemporaryDirectory()
+        self.group_path = pathlib.Path(self.test_data_directory.name)
+        self.synced = []
+
+        def record_sync(fd):
+            self.synced.append(os.readlink(f"/proc/self/fd/{fd}") if os.path.exists('/proc/self/fd') else fd)
+
+        self.fdatasync_patcher = mock.patch("chunky_logs.author.author_chunk._fdatasync", side_effect=record_sync)
+        self.fdatasync_patcher.start()
+        self.fsync_patcher = mock.patch("os.fsync", side_effect=record_sync)
+        self.fsync_patcher.start()
+
+    def tearDown(self):
+        self.fdatasync_patcher.stop()
+        self.fsync_patcher.stop()
+        self.test_data_directory.cleanup()
+
+    def create_author_chunk(self, **kwargs):
+        return AuthorChunk(self.group_path, pathlib.Path('chunk_1'), durability=AuthorChunkDurability(**kwargs))
+
+    def test_every_batch(self):
+        """
+        Tests that each batch is synced, followed by the metadata and then its directory
+        """
+        test_author_chunk = self.create_author_chunk(mode='every_batch')
+        test_author_chunk.write_lines(['line0', 'line1'], [1000, 1010])
+
+        assert 2 == test_author_chunk.durable_line_count
+        assert [str(test_author_chunk._chunk_file), f"{test_author_chunk.metadata.file}.tmp",
+                str(self.group_path)] == self.synced
+        with open(test_author_chunk.metadata.file) as metadata_data:
+            assert '"chunk.line.count": {"value": 2' in metadata_data.read()
+        test_author_chunk.close()
+        assert 3 == len(self.synced)
+
+    def test_every_n_lines(self):
+        test_author_chunk = self.create_author_chunk(mode='every_n_lines', lines=10)
+        for i in range(25):
+            test_author_chunk.write_line(f"line{i}")
+            assert (i + 1) // 10 * 10 == test_author_chunk.durable_line_count
+
+        # The metadata is only written once the lines it describes are durable
+        assert 20 == AuthorMetaData(self.group_path, pathlib.Path('chunk_1')).chunk_line_count
+        test_author_chunk.close()
+        assert 25 == test_author_chunk.durable_line_count
+        assert 25 == AuthorMetaData(self.group_path, pathlib.Path('chunk_1')).chunk_line_count
+
+    @mock.patch("time.monotonic")
+    def test_interval(self, patch_monotonic):
+        patch_monotonic.return_value = 100.0
+        test_author_chunk = self.create_author_chunk(mode='interval', interval_ms=50)
+
+        test_author_chunk.write_line("line0")
+        assert 0 == test_author_chunk.durable_line_count
+
+        patch_monotonic.return_value = 100.06
+        test_author_chunk.write_line("line1")
+        assert 2 == test_author_chunk.durable_line_count
+        test_author_chunk.close()
+
+    def test_interval_idle(self):
+        """
+        Tests that with the interval mode, lines are synced and visible to readers once the interval has passed, even
+        when no more lines are written
+        """
+        test_author_chunk = self.create_author_chunk(mode='interval', interval_ms=50)
+        test_author_chunk.write_line("line0")
+        test_author_chunk.write_line("line1")
+        assert 0 == test_author_chunk.durable_line_count
+
+        deadline = time.monotonic() + 5
+        while test_author_chunk.durable_line_count < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert 2 == test_author_chunk.durable_line_count
+        assert 2 == AuthorMetaData(self.group_path, pathlib.Path('chunk_1')).chunk_line_count
+        assert str(test_author_chunk._chunk_file) in self.synced
+        test_author_chunk.close()
+
+    def test_group_commit(self):
+        """
+        Tests that threads sharing a chunk share syncs, rather than each waiting on a sync of their own
+        """
+        with mock.patch("chunky_logs.author.author_chunk._fdatasync", side_effect=lambda fd: time.sleep(0.02)) \
+                as patch_fdatasync:
+            test_author_chunk = self.create_author_chunk(mode='every_batch')
+            threads = [threading.Thread(target=lambda: [test_author_chunk.write_line("data") for _ in range(10)])
+                       for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            test_author_chunk.close()
+
+            assert 80 == test_author_chunk.durable_line_count
+            assert patch_fdatasync.call_count < 40
+
+    def test_unknown_mode(self):
+        with pytest.raises(AuthorChunkError):
+            self.create_author_chunk(mode='unknown')
+
+    def test_reopen_after_crash(self):
+        """
+        Tests that lines written after the last commit, by an author which was dropped without closing, are counted
+        once the Chunk is reopened, and that a partially written last line is truncated
+        """
+        test_author_chunk = self.create_author_chunk(mode='every_n_lines', lines=10)
+        for i in range(15):
+            test_author_chunk.write_lines([f"line{i}"], [1000 + i])
+        assert 10 == AuthorMetaData(self.group_path, pathlib.Path('chunk_1')).chunk_line_count
+        with open(test_author_chunk._chunk_file, 'ab') as chunk_data:
+            chunk_data.write(b"1015,torn")
+        del test_author_chunk
+
+        test_author_chunk = self.create_author_chunk(mode='every_n_lines', lines=10)
+        assert 15 == test_author_chunk.durable_line_count
+        test_author_chunk.write_lines(["line15"], [1015])
+        test_author_chunk.close()
+
+        with ParserChunk(self.group_path, pathlib.Path('chunk_1')) as parser_chunk:
+            assert 16 == parser_chunk.metadata.chunk_line_count
+            assert 1015 == parser_chunk.metadata.chunk_time_update
+            assert file_md5sum(parser_chunk._chunk_file) == parser_chunk.metadata.chunk_checksum_hash
+            assert ["1014,line14", "1015,line15"] == parser_chunk.tail(2)
+        assert [] == verify_group(self.group_path, workers=1).mismatches
+
+    def test_reopen_after_torn_frame(self):
+        """
+        Tests that a partially written frame in a block compressed Chunk is truncated when it is reopened, so the
+        frames written after it can be read
+        """
+        flush_policy = AuthorChunkFlushPolicy(max_lines=5)
+        with AuthorChunk(self.group_path, pathlib.Path('chunk_1'), flush_policy=flush_policy,
+                         block_codec='zlib') as test_author_chunk:
+            test_author_chunk.write_lines([f"line{i}" for i in range(10)], range(1000, 1010))
+        with open(test_author_chunk._chunk_file, 'ab') as chunk_data:
+            chunk_data.write(encode_block(b"1010,torn\n", 'zlib')[:12])
+
+        with AuthorChunk(self.group_path, pathlib.Path('chunk_1'), flush_policy=flush_policy) as test_author_chunk:
+            test_author_chunk.write_lines([f"line{i}" for i in range(10, 15)], range(1010, 1015))
+
+        with ParserChunk(self.group_path, pathlib.Path('chunk_1')) as parser_chunk:
+            assert [f"{1000 + i},line{i}" for i in range(15)] == list(parser_chunk)
+            assert 15 == parser_chunk.metadata.chunk_line_count
+        assert [] == verify_group(self.group_path, workers=1).mismatches
+
+def test_metadata_interval_idle():
+    """
+    Tests that with a metadata interval the lines of a new Chunk are visible to readers straight away, and later lines
+    once the interval has passed, even when no more lines are written
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        with AuthorChunk(group_path, pathlib.Path('chunk_1'), metadata_interval_ms=50) as test_author_chunk:
+            test_author_chunk.write_lines(["line0"], [1000])
+            test_author_chunk.write_lines(["line1"], [1001])
+            assert [1] == [metadata.chunk_line_count for _, metadata in group_chunks(group_path)]
+
+            deadline = time.monotonic() + 5
+            while group_chunks(group_path)[0][1].chunk_line_count != 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert [2] == [metadata.chunk_line_count for _, metadata in group_chunks(group_path)]
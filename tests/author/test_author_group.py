@@ -0,0 +1,177 @@
+import os
+import pathlib
+import pytest
+import tempfile
+import time
+from unittest import mock
+from chunky_logs.author import AuthorGroup, AuthorGroupRollover, AuthorGroupError
+from chunky_logs.common.group_manifest import GroupManifest
+from chunky_logs.common.hashing import file_md5sum
+from chunky_logs.common.metadata import MetaData
+from chunky_logs.common.metrics import MetricsRegistry
+from chunky_logs.parser import ParserChunk, group_chunks
+
+def read_group(group_path):
+    lines = []
+    for chunk_name, _ in group_chunks(group_path):
+        with ParserChunk(group_path, chunk_name) as parser_chunk:
+            assert file_md5sum(parser_chunk._chunk_file) == parser_chunk.metadata.chunk_checksum_hash
+            lines.extend(line.split(',', 1)[1] for line in parser_chunk)
+    return lines
+
+def test_line_rollover():
+    """
+    Tests that a new Chunk is started each time the line threshold is reached, and no lines are lost
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        with AuthorGroup(group_path, max_chunks=10, rollover=AuthorGroupRollover(max_lines=10)) as author_group:
+            for i in range(35):
+                author_group.write_line(f"line{i}")
+            assert [AuthorGroup.chunk_name(index) for index in range(1, 5)] == author_group.chunk_names
+
+        assert [10, 10, 10, 5] == [metadata.chunk_line_count for _, metadata in group_chunks(group_path)]
+        assert [f"line{i}" for i in range(35)] == read_group(group_path)
+        # The pre-created Chunk is removed on close
+        assert not os.path.exists(group_path.joinpath('chunk_00000005.chunk'))
+
+def test_byte_rollover():
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        rollover = AuthorGroupRollover(max_bytes=1024)
+        with AuthorGroup(group_path, rollover=rollover, flush_policy=None) as author_group:
+            author_group.write_lines(['x' * 100] * 20)
+            author_group.write_lines(['x' * 100] * 5)
+            assert 2 == len(author_group.chunk_names)
+
+def test_age_rollover():
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        with AuthorGroup(group_path, rollover=AuthorGroupRollover(max_age_ms=50)) as author_group:
+            author_group.write_line("first")
+            time.sleep(0.1)
+            author_group.write_line("second")
+            assert 2 == len(author_group.chunk_names)
+        assert ["first", "second"] == read_group(group_path)
+
+def test_delete_eviction():
+    """
+    Tests that once the Group is full the oldest Chunk is deleted on each rollover
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        with AuthorGroup(group_path, max_chunks=2, rollover=AuthorGroupRollover(max_lines=5),
+                         eviction='delete') as author_group:
+            for i in range(20):
+                author_group.write_line(f"line{i}")
+            assert [AuthorGroup.chunk_name(3), AuthorGroup.chunk_name(4)] == author_group.chunk_names
+
+        assert [f"line{i}" for i in range(10, 20)] == read_group(group_path)
+        assert not list(group_path.glob('chunk_00000001*'))
+
+def test_archive_eviction():
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        with AuthorGroup(group_path, max_chunks=2, rollover=AuthorGroupRollover(max_lines=5)) as author_group:
+            for i in range(15):
+                author_group.write_line(f"line{i}")
+
+        assert os.path.exists(group_path.joinpath('chunk_00000001.zip'))
+        assert not os.path.exists(group_path.joinpath('chunk_00000001.chunk'))
+        assert [f"line{i}" for i in range(5, 15)] == read_group(group_path)
+
+def test_rollover_during_slow_eviction():
+    """
+    Tests that a slow eviction does not hold up the creation of the next Chunk
+    """
+    archiver = mock.Mock()
+    archiver.archive.side_effect = lambda chunk: time.sleep(0.5)
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        with AuthorGroup(group_path, max_chunks=1, archiver=archiver) as author_group:
+            author_group.write_line("line0")
+            author_group.rollover()
+            author_group.write_line("line1")
+            time_start = time.monotonic()
+            author_group.rollover()
+            assert time.monotonic() - time_start < 0.25
+        assert 2 == archiver.archive.call_count
+
+def test_resume_group():
+    """
+    Tests that a Group is picked up where it was left, writing to its last Chunk
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        rollover = AuthorGroupRollover(max_lines=10)
+        with AuthorGroup(group_path, rollover=rollover) as author_group:
+            for i in range(15):
+                author_group.write_line(f"line{i}")
+        with AuthorGroup(group_path, rollover=rollover) as author_group:
+            assert 2 == len(author_group.chunk_names)
+            for i in range(15, 30):
+                author_group.write_line(f"line{i}")
+
+        assert [10, 10, 10] == [metadata.chunk_line_count for _, metadata in group_chunks(group_path)]
+        assert [f"line{i}" for i in range(30)] == read_group(group_path)
+
+def test_rollover_metrics():
+    registry = MetricsRegistry()
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        with AuthorGroup(group_path, rollover=AuthorGroupRollover(max_lines=2), metrics=registry) as author_group:
+            for i in range(6):
+                author_group.write_line(f"line{i}")
+    assert 2 == registry.snapshot()['group.rollovers']
+    assert 6 == registry.snapshot()['author.lines']
+
+def test_closed_group():
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        author_group = AuthorGroup(pathlib.Path(test_data_directory))
+        author_group.close()
+        with pytest.raises(AuthorGroupError):
+            author_group.write_line("line")
+        with pytest.raises(AuthorGroupError):
+            AuthorGroup(pathlib.Path(test_data_directory), eviction='keep')
+
+def test_group_manifest():
+    """
+    Tests that the manifest records the state of each Chunk, and that readers only read the active Chunk's metadata
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        with AuthorGroup(group_path, max_chunks=3, rollover=AuthorGroupRollover(max_lines=10),
+                         eviction='delete') as author_group:
+            for i in range(45):
+                author_group.write_line(f"line{i}")
+            author_group.flush()
+
+            with mock.patch.object(MetaData, '_load_metadata', side_effect=MetaData._load_metadata,
+                                   autospec=True) as load_metadata:
+                chunks = group_chunks(group_path)
+                assert 1 == load_metadata.call_count
+            assert [10, 10, 5] == [metadata.chunk_line_count for _, metadata in chunks]
+
+        manifest = GroupManifest.load(group_path)
+        assert ['chunk_00000003', 'chunk_00000004', 'chunk_00000005'] == \
+               [entry.chunk_name for entry in manifest.entries()]
+        assert {'closed'} == {entry.status for entry in manifest.entries()}
+        assert [f"line{i}" for i in range(20, 45)] == read_group(group_path)
+
+        # The next AuthorGroup picks up the Chunks from the manifest
+        with AuthorGroup(group_path, max_chunks=3, rollover=AuthorGroupRollover(max_lines=10)) as author_group:
+            assert [AuthorGroup.chunk_name(index) for index in range(3, 6)] == author_group.chunk_names
+            assert 'active' == GroupManifest.load(group_path).get('chunk_00000005').status
+
+def test_group_without_manifest():
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        with AuthorGroup(group_path, rollover=AuthorGroupRollover(max_lines=10)) as author_group:
+            for i in range(25):
+                author_group.write_line(f"line{i}")
+        os.remove(group_path.joinpath(GroupManifest.MANIFEST_FILE))
+
+        with AuthorGroup(group_path, rollover=AuthorGroupRollover(max_lines=10)) as author_group:
+            assert 3 == len(author_group.chunk_names)
+        assert 3 == len(GroupManifest.load(group_path).entries())
+        assert [f"line{i}" for i in range(25)] == read_group(group_path)
@@ -1,7 +1,12 @@
+import json
+import os
 import pathlib
 import pytest
+import tempfile
+import time
 from unittest import mock
 from chunky_logs.author import AuthorMetaData, AuthorMetaDataItem, AuthorMetaDataError
+from chunky_logs.common import MetaData
 
 @mock.patch('os.path.exists')
 @mock.patch('builtins.open')
@@ -60,62 +65,128 @@ def test_add_new_failure(patch_builtins_open, patch_os_path_exists):
     with pytest.raises(AuthorMetaDataError):
         test_metadata.add(AuthorMetaDataItem('test.data.int', 'test_data', 'int'))
 
-@mock.patch('os.path.exists')
-@mock.patch('builtins.open', new_callable=mock.mock_open)
-@mock.patch('json.dump')
-def test_write_to_disk(patch_json_dump, patch_builtins_open, patch_os_path_exists):
-    patch_os_path_exists.return_value = False
-    group_path = pathlib.PurePosixPath('/tmp/test_group')
-    chunk_name = pathlib.PurePosixPath('chunk_1')
-
-    test_metadata = AuthorMetaData(group_path, chunk_name)
-
-    # Set the main data
-    test_metadata.chunk_file = pathlib.PurePosixPath('/tmp/test_group/chunk_1.chunk')
-    test_metadata.chunk_time_create = 1648829317
-    test_metadata.chunk_time_update = 1648915726
-    test_metadata.chunk_line_count = 1440
-    test_metadata.chunk_checksum_hash = "xliyudtn3e"
-
-    # Add some extra data
-    test_metadata.add(AuthorMetaDataItem('test.data.int', '10', 'int'))
-    test_metadata.add(AuthorMetaDataItem('test.data.str', 'test_data', 'str'))
-
-    test_metadata.write_to_disk()
-
-
-    patch_json_dump.assert_called_with({
-        'chunk.file': {
-            'value': pathlib.PurePosixPath('/tmp/test_group/chunk_1.chunk'),
-            'type': 'path'
-        },
-        'chunk.time.create': {
-            'value': 1648829317,
-            'type': 'int'
-        },
-        'chunk.time.update': {
-            'value': 1648915726,
-            'type': 'int'
-        },
-        'chunk.line.count': {
-            'value': 1440,
-            'type': 'int'
-        },
-        'chunk.checksum.hash': {
-            'value': 'xliyudtn3e',
-            'type': 'str'
-        },
-        'chunk.checksum.type': {
-            'value': 'md5',
-            'type': 'str'
-        },
-        'test.data.int': {
-            'value': 10,
-            'type': 'int'
-        },
-        'test.data.str': {
-            'value': 'test_data',
-            'type': 'str'
-        }
-    },
-    patch_builtins_open())
+def test_write_to_disk():
+    """
+    Tests that the metadata is written out via a temporary file which then replaces the metadata file
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.PurePosixPath(test_data_directory)
+        chunk_name = pathlib.PurePosixPath('chunk_1')
+
+        test_metadata = AuthorMetaData(group_path, chunk_name)
+
+        # Set the main data
+        test_metadata.chunk_file = pathlib.PurePosixPath('/tmp/test_group/chunk_1.chunk')
+        test_metadata.chunk_time_create = 1648829317
+        test_metadata.chunk_time_update = 1648915726
+        test_metadata.chunk_line_count = 1440
+        test_metadata.chunk_checksum_hash = "xliyudtn3e"
+
+        # Add some extra data
+        test_metadata.add(AuthorMetaDataItem('test.data.int', '10', 'int'))
+        test_metadata.add(AuthorMetaDataItem('test.data.str', 'test_data', 'str'))
+
+        with mock.patch('os.replace', wraps=os.replace) as patch_os_replace:
+            test_metadata.write_to_disk()
+            patch_os_replace.assert_called_once_with(test_metadata._temp_file, test_metadata.file)
+
+        assert not os.path.exists(test_metadata._temp_file)
+        with open(test_metadata.file) as metadata_data:
+            assert json.load(metadata_data) == {
+                'chunk.file': {
+                    'value': '/tmp/test_group/chunk_1.chunk',
+                    'type': 'path'
+                },
+                'chunk.time.create': {
+                    'value': 1648829317,
+                    'type': 'int'
+                },
+                'chunk.time.update': {
+                    'value': 1648915726,
+                    'type': 'int'
+                },
+                'chunk.line.count': {
+                    'value': 1440,
+                    'type': 'int'
+                },
+                'chunk.checksum.hash': {
+                    'value': 'xliyudtn3e',
+                    'type': 'str'
+                },
+                'chunk.checksum.type': {
+                    'value': 'md5',
+                    'type': 'str'
+                },
+                'test.data.int': {
+                    'value': 10,
+                    'type': 'int'
+                },
+                'test.data.str': {
+                    'value': 'test_data',
+                    'type': 'str'
+                }
+            }
+
+        # Check the written metadata can be loaded again, and only the changed keys are re-serialized
+        assert MetaData(group_path, chunk_name).chunk_line_count == 1440
+        test_metadata.chunk_line_count = 1441
+        with mock.patch('json.dumps', wraps=json.dumps) as patch_json_dumps:
+            test_metadata.write_to_disk()
+            assert patch_json_dumps.call_count == 2
+        assert MetaData(group_path, chunk_name).chunk_line_count == 1441
+
+@mock.patch('time.monotonic')
+def test_sync_interval(patch_monotonic):
+    """
+    Tests that changes are coalesced until the write interval has passed, apart from the first write of new metadata,
+    and are always written on close
+    """
+    patch_monotonic.return_value = 100.0
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        test_metadata = AuthorMetaData(pathlib.PurePosixPath(test_data_directory), pathlib.PurePosixPath('chunk_1'),
+                                       write_interval_ms=1000)
+
+        with mock.patch.object(AuthorMetaData, 'write_to_disk', side_effect=AuthorMetaData.write_to_disk,
+                               autospec=True) as patch_write:
+            assert test_metadata.sync() is False  # Nothing has changed
+
+            # The metadata file does not exist yet, so it is written straight away
+            test_metadata.chunk_line_count = 1
+            assert test_metadata.sync() is True
+            assert patch_write.call_count == 1
+
+            test_metadata.chunk_line_count = 2
+            assert test_metadata.sync() is False
+            assert patch_write.call_count == 1
+
+            patch_monotonic.return_value = 101.0
+            test_metadata.chunk_line_count = 3
+            assert test_metadata.sync() is True
+            assert patch_write.call_count == 2
+            assert test_metadata.is_dirty is False
+
+            test_metadata.chunk_line_count = 4
+            assert test_metadata.sync() is False
+            test_metadata.close()
+            assert patch_write.call_count == 3
+
+        assert MetaData(pathlib.PurePosixPath(test_data_directory), pathlib.PurePosixPath('chunk_1')).chunk_line_count == 4
+
+def test_sync_interval_idle():
+    """
+    Tests that changes held back by the write interval are written once it has passed, without another sync()
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path, chunk_name = pathlib.Path(test_data_directory), pathlib.Path('chunk_1')
+        test_metadata = AuthorMetaData(group_path, chunk_name, write_interval_ms=10)
+        test_metadata.chunk_line_count = 1
+        assert test_metadata.sync() is True
+        test_metadata.chunk_line_count = 2
+        assert test_metadata.sync() is False
+
+        deadline = time.monotonic() + 5
+        while MetaData(group_path, chunk_name).chunk_line_count != 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert MetaData(group_path, chunk_name).chunk_line_count == 2
+        assert test_metadata.is_dirty is False
+        test_metadata.close()
@@ -0,0 +1,138 @@
+import pathlib
+import pytest
+import tempfile
+import threading
+from unittest import mock
+from chunky_logs.author import AuthorChunk, BackgroundAuthorChunk, BackgroundAuthorChunkError, \
+    BackgroundAuthorChunkQueueFull
+from chunky_logs.common.hashing import file_md5sum
+from chunky_logs.parser import ParserChunk
+
+def test_concurrent_producers():
+    """
+    Tests that lines from many producer threads are all written, with the metadata matching the chunk
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        chunk_name = pathlib.Path('chunk_1')
+
+        with BackgroundAuthorChunk.open(group_path, chunk_name, max_queued_lines=64) as author_chunk:
+            def produce(producer):
+                for i in range(500):
+                    author_chunk.write_line(f"producer{producer}_{i}")
+
+            threads = [threading.Thread(target=produce, args=(producer,)) for producer in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            author_chunk.flush()
+            assert 4000 == author_chunk.metadata.chunk_line_count
+
+        with ParserChunk(group_path, chunk_name) as parser_chunk:
+            lines = [line.split(',', 1) for line in parser_chunk]
+            payloads = [payload for _, payload in lines]
+            assert 4000 == len(payloads) == parser_chunk.metadata.chunk_line_count
+            # Lines are timestamped as they are queued, so the timestamps never go backwards
+            timestamps = [int(timestamp) for timestamp, _ in lines]
+            assert sorted(timestamps) == timestamps
+            assert file_md5sum(parser_chunk._chunk_file) == parser_chunk.metadata.chunk_checksum_hash
+            for producer in range(8):
+                assert [f"producer{producer}_{i}" for i in range(500)] == \
+                       [payload for payload in payloads if payload.startswith(f"producer{producer}_")]
+
+class StalledAuthorChunk:
+    """
+    This is a stand in AuthorChunk whose writes wait until released, so the queue can be filled
+    """
+    def __init__(self):
+        self._chunk_name = 'stalled'
+        self.release = threading.Event()
+        self.written = []
+
+    def write_lines(self, lines_data, timestamps):
+        self.release.wait()
+        self.written.extend(lines_data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+def fill_queue(author_chunk, stalled_chunk, line_count):
+    author_chunk.write_line("first")
+    # Wait for the drain thread to take the first line, it then stalls while writing it
+    while author_chunk._queue:
+        pass
+    for i in range(line_count):
+        author_chunk.write_line(f"line{i}")
+
+def test_backpressure_drop_oldest():
+    stalled_chunk = StalledAuthorChunk()
+    author_chunk = BackgroundAuthorChunk(stalled_chunk, max_queued_lines=4, backpressure='drop_oldest')
+    fill_queue(author_chunk, stalled_chunk, 10)
+
+    stalled_chunk.release.set()
+    author_chunk.close()
+    assert ["first", "line6", "line7", "line8", "line9"] == stalled_chunk.written
+    assert 6 == author_chunk.dropped_count
+
+def test_backpressure_raise():
+    stalled_chunk = StalledAuthorChunk()
+    author_chunk = BackgroundAuthorChunk(stalled_chunk, max_queued_lines=4, backpressure='raise')
+    with pytest.raises(BackgroundAuthorChunkQueueFull):
+        fill_queue(author_chunk, stalled_chunk, 5)
+
+    stalled_chunk.release.set()
+    author_chunk.close()
+    assert ["first", "line0", "line1", "line2", "line3"] == stalled_chunk.written
+
+def test_backpressure_block():
+    stalled_chunk = StalledAuthorChunk()
+    author_chunk = BackgroundAuthorChunk(stalled_chunk, max_queued_lines=4, backpressure='block')
+    producer = threading.Thread(target=fill_queue, args=(author_chunk, stalled_chunk, 10))
+    producer.start()
+    producer.join(0.1)
+    assert producer.is_alive()
+
+    stalled_chunk.release.set()
+    producer.join()
+    author_chunk.close()
+    assert ["first"] + [f"line{i}" for i in range(10)] == stalled_chunk.written
+
+def test_drain_error():
+    failing_chunk = mock.MagicMock()
+    failing_chunk.write_lines.side_effect = OSError("Disk full")
+    author_chunk = BackgroundAuthorChunk(failing_chunk)
+    author_chunk.write_line("line0")
+
+    with pytest.raises(BackgroundAuthorChunkError):
+        author_chunk.flush()
+    with pytest.raises(BackgroundAuthorChunkError):
+        author_chunk.write_line("line1")
+    with pytest.raises(BackgroundAuthorChunkError):
+        author_chunk.close()
+
+def test_unknown_backpressure():
+    with pytest.raises(BackgroundAuthorChunkError):
+        BackgroundAuthorChunk(mock.MagicMock(), backpressure='unknown')
+
+def test_author_chunk_shared_between_threads():
+    """
+    Tests that an AuthorChunk written to directly from several threads keeps its line count consistent
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        with AuthorChunk(group_path, pathlib.Path('chunk_1')) as author_chunk:
+            threads = [threading.Thread(target=lambda: [author_chunk.write_line("data") for _ in range(200)])
+                       for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert 800 == author_chunk.metadata.chunk_line_count
+            assert file_md5sum(author_chunk._chunk_file) == author_chunk.metadata.chunk_checksum_hash
+        with ParserChunk(group_path, pathlib.Path('chunk_1')) as parser_chunk:
+            timestamps = [int(line.split(',', 1)[0]) for line in parser_chunk]
+            assert sorted(timestamps) == timestamps
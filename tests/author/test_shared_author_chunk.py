@@ -0,0 +1,102 @@
+import multiprocessing
+import os
+import pathlib
+import pytest
+import tempfile
+from unittest import mock
+from chunky_logs.author import SharedAuthorChunk, SharedAuthorChunkError
+from chunky_logs.common.hashing import file_md5sum
+from chunky_logs.parser import ParserChunk
+
+def write_shared_chunk(group_path, chunk_name, worker, start_event):
+    start_event.wait()
+    with SharedAuthorChunk(group_path, chunk_name, sync_interval_ms=5, index_stride=16) as author_chunk:
+        for batch in range(50):
+            author_chunk.write_lines([f"worker{worker}_{batch}_{i}" for i in range(10)])
+
+def test_multi_process_appends():
+    """
+    Tests that lines appended by several processes are all accounted for in the metadata, with batches kept whole
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        chunk_name = pathlib.Path('chunk_1')
+
+        context = multiprocessing.get_context('fork')
+        start_event = context.Event()
+        workers = [context.Process(target=write_shared_chunk, args=(group_path, chunk_name, worker, start_event))
+                   for worker in range(4)]
+        for worker in workers:
+            worker.start()
+        start_event.set()
+        for worker in workers:
+            worker.join(30)
+            assert 0 == worker.exitcode
+
+        with ParserChunk(group_path, chunk_name) as parser_chunk:
+            payloads = [line.split(',', 1)[1] for line in parser_chunk]
+            assert 2000 == len(payloads) == parser_chunk.metadata.chunk_line_count
+            assert file_md5sum(parser_chunk._chunk_file) == parser_chunk.metadata.chunk_checksum_hash
+            assert parser_chunk.verify()
+            assert payloads[1000] == parser_chunk.line(1000).split(',', 1)[1]
+
+            # Each batch of 10 lines is written in one append, so is never interleaved
+            for batch_start in range(0, 2000, 10):
+                prefix = payloads[batch_start].rsplit('_', 1)[0]
+                assert [f"{prefix}_{i}" for i in range(10)] == payloads[batch_start:batch_start + 10]
+
+def test_leader_handover():
+    """
+    Tests that when the leader closes another process takes over, rebuilding the checksum from the chunk file as it
+    was not the last leader
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        chunk_name = pathlib.Path('chunk_1')
+
+        leader = SharedAuthorChunk(group_path, chunk_name, sync_interval_ms=60000)
+        follower = SharedAuthorChunk(group_path, chunk_name, sync_interval_ms=60000, checksum_type='crc32')
+        assert leader.is_leader
+        assert not follower.is_leader
+
+        leader.write_lines(["line0", "line1"], [1000, 1010])
+        follower.write_lines(["line2"], [1020])
+        assert leader.sync()
+        assert not follower.sync()
+        assert 3 == leader.metadata.chunk_line_count
+
+        # The leader catches up with everything appended to the chunk before it gives up leadership
+        with open(leader._chunk_file, 'ab') as chunk_data:
+            chunk_data.write(b"1030,line3\n")
+        leader.close()
+        follower.write_lines(["line4"], [1040])
+        follower.close()
+
+        with ParserChunk(group_path, chunk_name) as parser_chunk:
+            assert 5 == parser_chunk.metadata.chunk_line_count
+            assert (1000, 1040) == (parser_chunk.metadata.chunk_time_create, parser_chunk.metadata.chunk_time_update)
+            assert 'md5' == parser_chunk.metadata.chunk_checksum_type
+            assert parser_chunk.verify()
+        assert os.path.exists(group_path.joinpath('chunk_1.lock'))
+
+def test_write_lines():
+    """
+    Tests that each line is timestamped as it is taken, that a batch without one timestamp per line is rejected, and
+    that a short write is raised rather than retried
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        chunk_name = pathlib.Path('chunk_1')
+        # The leader does not catch up during the test, so only the appends call os.write
+        with SharedAuthorChunk(group_path, chunk_name, sync_interval_ms=60000) as author_chunk:
+            with mock.patch("time.time_ns", side_effect=[1000000000, 1001000000]):
+                author_chunk.write_lines(["line0", "line1"])
+            with pytest.raises(ValueError):
+                author_chunk.write_lines(["line2", "line3"], [1002])
+            with mock.patch("os.write", side_effect=lambda fd, data: len(data) - 1) as patch_write:
+                with pytest.raises(SharedAuthorChunkError):
+                    author_chunk.write_lines(["line4"], [1004])
+                assert 1 == patch_write.call_count
+
+        with ParserChunk(group_path, chunk_name) as parser_chunk:
+            assert ["1000,line0", "1001,line1"] == list(parser_chunk)
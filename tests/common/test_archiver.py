@@ -0,0 +1,62 @@
+import os
+import pathlib
+import pytest
+import tempfile
+from zipfile import ZipFile, ZIP_LZMA
+from chunky_logs.author import AuthorChunk
+from chunky_logs.common import ChunkArchiver, ChunkArchiverError
+
+def create_author_chunk(group_path, chunk_name, **kwargs):
+    author_chunk = AuthorChunk(group_path, pathlib.Path(chunk_name), **kwargs)
+    author_chunk.write_lines([f"{chunk_name}_line{i}" for i in range(100)], range(100))
+    return author_chunk
+
+def test_archive():
+    """
+    Tests that chunks are archived in the background, compressed, and that their managed files are removed
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        author_chunks = [create_author_chunk(group_path, 'chunk_1'),
+                         create_author_chunk(group_path, 'chunk_2', block_codec='zlib')]
+
+        with ChunkArchiver(workers=2, codec='lzma') as archiver:
+            futures = [archiver.archive(author_chunk) for author_chunk in author_chunks]
+            archive_files = [future.result(timeout=30) for future in futures]
+
+        assert [group_path.joinpath('chunk_1.zip'), group_path.joinpath('chunk_2.zip')] == archive_files
+        assert ['chunk_1.zip', 'chunk_2.zip'] == sorted(os.listdir(group_path))
+        with ZipFile(archive_files[0]) as archive:
+            assert ['chunk_1.chunk', 'chunk_1.metadata.json', 'chunk_1.idx'] == archive.namelist()
+            assert all(info.compress_type == ZIP_LZMA for info in archive.infolist())
+            assert b"0,chunk_1_line0\n" == archive.read('chunk_1.chunk')[:16]
+
+def test_archive_checksum_mismatch():
+    """
+    Tests that a chunk which does not match its checksum is not archived, and that its files are kept
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        author_chunk = create_author_chunk(group_path, 'chunk_1')
+        author_chunk.close()
+        with open(author_chunk._chunk_file, 'ab') as chunk_data:
+            chunk_data.write(b"100,unexpected\n")
+
+        with ChunkArchiver(workers=1) as archiver:
+            with pytest.raises(ChunkArchiverError):
+                archiver.archive(author_chunk).result(timeout=30)
+
+        assert ['chunk_1.chunk', 'chunk_1.idx', 'chunk_1.metadata.json'] == sorted(os.listdir(group_path))
+
+def test_archive_after_close():
+    archiver = ChunkArchiver(workers=1)
+    archiver.close()
+    with pytest.raises(ChunkArchiverError):
+        archiver.archive(None)
+
+def test_default_mp_context():
+    """
+    Tests that the worker processes are not forked from the multi-threaded process by default
+    """
+    with ChunkArchiver(workers=1) as archiver:
+        assert archiver._mp_context.get_start_method() in ('forkserver', 'spawn')
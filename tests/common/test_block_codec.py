@@ -0,0 +1,66 @@
+import io
+import os
+import pytest
+import tempfile
+from chunky_logs.common.block_codec import BlockCodecError, encode_block, open_chunk_data
+
+@pytest.mark.parametrize("codec", ["zlib", "lzma"])
+def test_block_reader(codec):
+    """
+    Tests reading and seeking through the logical data of a block compressed file, including reads which span blocks
+    """
+    blocks = [b"1,a\n2,bb\n", b"3,ccc\n", b"4,dddd\n5,eeeee\n"]
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        chunk_file = os.path.join(test_data_directory, 'chunk_1.chunk')
+        with open(chunk_file, 'wb') as chunk_data:
+            chunk_data.write(b"".join(encode_block(block, codec) for block in blocks))
+
+        with open_chunk_data(chunk_file, codec) as chunk_data:
+            assert b"".join(blocks) == chunk_data.read()
+            assert len(b"".join(blocks)) == chunk_data.logical_size
+
+            chunk_data.seek(6)
+            assert b"bb\n3,c" == chunk_data.read(6)
+            chunk_data.seek(-4, io.SEEK_END)
+            assert b"eee\n" == chunk_data.read()
+            assert b"" == chunk_data.read()
+
+def test_block_reader_partial_frame():
+    """
+    Tests that a partially written frame is ignored until it has been completed
+    """
+    frame = encode_block(b"2,b\n", 'zlib')
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        chunk_file = os.path.join(test_data_directory, 'chunk_1.chunk')
+        with open(chunk_file, 'wb') as chunk_data:
+            chunk_data.write(encode_block(b"1,a\n", 'zlib') + frame[:5])
+
+        with open_chunk_data(chunk_file, 'zlib') as chunk_data:
+            assert b"1,a\n" == chunk_data.read()
+            with open(chunk_file, 'ab') as chunk_append:
+                chunk_append.write(frame[5:])
+            assert b"2,b\n" == chunk_data.read()
+
+def test_block_reader_seek_past_end():
+    """
+    Tests that reading from past the end of the data reads nothing, even when the file grows by less than the gap
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        chunk_file = os.path.join(test_data_directory, 'chunk_1.chunk')
+        with open(chunk_file, 'wb') as chunk_data:
+            chunk_data.write(encode_block(b"1,a\n", 'zlib'))
+
+        with open_chunk_data(chunk_file, 'zlib') as chunk_data:
+            chunk_data.seek(100)
+            assert b"" == chunk_data.read()
+            with open(chunk_file, 'ab') as chunk_append:
+                chunk_append.write(encode_block(b"2,b\n", 'zlib'))
+            assert b"" == chunk_data.read()
+            assert 0 == chunk_data.readinto(bytearray(16))
+
+            chunk_data.seek(4)
+            assert b"2,b\n" == chunk_data.read()
+
+def test_unknown_codec():
+    with pytest.raises(BlockCodecError):
+        encode_block(b"1,a\n", 'unknown')
@@ -1,6 +1,7 @@
 from unittest import mock, TestCase
 import pathlib
 import pytest
+from zipfile import ZIP_DEFLATED
 from chunky_logs.common import Chunk, ChunkManagedFileError
 
 class TestChunk(TestCase):
@@ -79,7 +80,8 @@ class TestChunk(TestCase):
         patch_zip_file_init.return_value = None
         self.test_chunk.archive()
 
-        patch_zip_file_init.assert_called_once_with(pathlib.PurePosixPath('/tmp/test_group/chunk_1.zip'), 'w')
+        patch_zip_file_init.assert_called_once_with(pathlib.PurePosixPath('/tmp/test_group/chunk_1.zip'), 'w',
+                                                    compression=ZIP_DEFLATED, compresslevel=None)
 
         assert patch_zip_file_write.call_count == 3
         patch_zip_file_write.assert_any_call('managed_file_1')
@@ -110,7 +112,8 @@ class TestChunk(TestCase):
         with pytest.raises(ChunkManagedFileError):
             self.test_chunk.archive()
 
-        patch_zip_file_init.assert_called_once_with(pathlib.PurePosixPath('/tmp/test_group/chunk_1.zip'), 'w')
+        patch_zip_file_init.assert_called_once_with(pathlib.PurePosixPath('/tmp/test_group/chunk_1.zip'), 'w',
+                                                    compression=ZIP_DEFLATED, compresslevel=None)
 
         assert patch_zip_file_write.call_count == 1
         assert patch_os_remove.call_count == 0
@@ -0,0 +1,63 @@
+import pathlib
+import pytest
+import tempfile
+from chunky_logs.common.group_manifest import GroupManifest, GroupManifestEntry, GroupManifestError, \
+    manifest_entry_metadata
+
+def entry(chunk_name, status='closed', line_count=10):
+    return GroupManifestEntry(chunk_name, status, 100, 1000, 2000, line_count, 'abc', 'md5', None)
+
+def test_record_and_load():
+    with tempfile.TemporaryDirectory() as group_dir:
+        group_path = pathlib.Path(group_dir)
+        assert GroupManifest.load(group_path) is None
+
+        manifest = GroupManifest(group_path)
+        manifest.record(entry('chunk_1', 'active', 0))
+        manifest.record(entry('chunk_1'))
+        manifest.record(entry('chunk_2', 'active', 0))
+
+        loaded = GroupManifest.load(group_path)
+        assert [entry('chunk_1'), entry('chunk_2', 'active', 0)] == loaded.entries()
+        assert entry('chunk_1') == loaded.get(pathlib.Path('chunk_1'))
+        assert loaded.get('chunk_3') is None
+        with pytest.raises(GroupManifestError):
+            manifest.record(entry('chunk_3', 'unknown'))
+
+def test_torn_line():
+    """
+    Tests that a partially appended last line is ignored, and is replaced by the next record
+    """
+    with tempfile.TemporaryDirectory() as group_dir:
+        group_path = pathlib.Path(group_dir)
+        GroupManifest(group_path).record(entry('chunk_1'))
+        with open(group_path.joinpath(GroupManifest.MANIFEST_FILE), 'ab') as manifest_data:
+            manifest_data.write(b'{"chunk_name":"chu')
+
+        manifest = GroupManifest.load(group_path)
+        assert [entry('chunk_1')] == manifest.entries()
+        manifest.record(entry('chunk_2'))
+        assert [entry('chunk_1'), entry('chunk_2')] == GroupManifest.load(group_path).entries()
+
+def test_compact():
+    with tempfile.TemporaryDirectory() as group_dir:
+        group_path = pathlib.Path(group_dir)
+        manifest = GroupManifest(group_path)
+        for line_count in range(GroupManifest.COMPACT_MIN_RECORDS * 2):
+            manifest.record(entry('chunk_1', line_count=line_count))
+        manifest.record(entry('chunk_2', 'deleted'))
+        manifest.compact()
+
+        with open(manifest.file, 'rb') as manifest_data:
+            assert 1 == len(manifest_data.read().splitlines())
+        loaded = GroupManifest.load(group_path)
+        assert [entry('chunk_1', line_count=GroupManifest.COMPACT_MIN_RECORDS * 2 - 1)] == loaded.entries(None)
+
+def test_entry_metadata():
+    with tempfile.TemporaryDirectory() as group_dir:
+        metadata = manifest_entry_metadata(pathlib.Path(group_dir), entry('chunk_1'))
+        assert 1000 == metadata.chunk_time_create
+        assert 2000 == metadata.chunk_time_update
+        assert 10 == metadata.chunk_line_count
+        assert 'abc' == metadata.chunk_checksum_hash
+        assert metadata.chunk_block_codec is None
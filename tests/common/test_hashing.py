@@ -1,5 +1,8 @@
+import hashlib
+import pytest
 import tempfile
-from chunky_logs.common.hashing import file_md5sum
+import zlib
+from chunky_logs.common.hashing import file_md5sum, file_checksum, new_checksum, ChecksumTypeError
 
 def test_get_file_md5sum():
     """
@@ -45,3 +48,29 @@ def test_get_large_file_md5sum():
             temp_file.flush()
 
         assert file_md5sum(temp_file.name) == '94a3d4bf17e438258768d3b708e606f1'
+
+@pytest.mark.parametrize("checksum_type, expected", [
+    ('md5', hashlib.md5(b"0123456789" * 1000).hexdigest()),
+    ('sha256', hashlib.sha256(b"0123456789" * 1000).hexdigest()),
+    ('blake2b', hashlib.blake2b(b"0123456789" * 1000).hexdigest()),
+    ('crc32', f"{zlib.crc32(b'0123456789' * 1000):08x}"),
+    ('adler32', f"{zlib.adler32(b'0123456789' * 1000):08x}")
+])
+def test_file_checksum(checksum_type, expected):
+    """
+    Tests each registered checksum type over a file read in several blocks, and that it can be updated incrementally
+    """
+    with tempfile.NamedTemporaryFile(mode='wb', delete=True) as temp_file:
+        temp_file.write(b"0123456789" * 1000)
+        temp_file.flush()
+
+        assert file_checksum(temp_file.name, checksum_type, block_size=4096).hexdigest() == expected
+
+    checksum = new_checksum(checksum_type)
+    for _ in range(1000):
+        checksum.update(b"0123456789")
+    assert checksum.copy().hexdigest() == expected
+
+def test_unknown_checksum_type():
+    with pytest.raises(ChecksumTypeError):
+        new_checksum('unknown')
@@ -0,0 +1,108 @@
+import io
+import os
+import tempfile
+from chunky_logs.common.line_index import LineIndex
+
+def test_add():
+    """
+    Tests that every Nth line is indexed as lines are added, including when they are added a few at a time
+    """
+    line_index = LineIndex(stride=3)
+    assert line_index.add(b"1,a\n2,bb\n3,ccc\n") == [(0, 1)]
+    assert line_index.add(b"4,dddd\n5,eeeee\n") == [(15, 4)]
+    assert line_index.add(b"6,f\n7,g\n") == [(34, 7)]
+
+    assert list(line_index.offsets) == [0, 15, 34]
+    assert list(line_index.timestamps) == [1, 4, 7]
+    assert line_index.line_count == 7
+    assert line_index.end_pos == 38
+
+    assert line_index.locate(0) == (0, 0)
+    assert line_index.locate(4) == (15, 1)
+    assert line_index.locate(6) == (34, 0)
+    assert line_index.locate(100) == (34, 94)
+
+def test_locate_time():
+    """
+    Tests that locating a time gives the indexed line to read forward from, which is before the time
+    """
+    line_index = LineIndex(stride=2)
+    line_index.add(b"10,a\n20,b\n30,c\n40,d\n50,e\n")
+    assert list(line_index.timestamps) == [10, 30, 50]
+
+    assert line_index.locate_time(5) == (0, 0)
+    assert line_index.locate_time(10) == (0, 0)
+    assert line_index.locate_time(30) == (0, 0)
+    assert line_index.locate_time(31) == (10, 2)
+    assert line_index.locate_time(100) == (20, 4)
+
+def test_extend():
+    """
+    Tests that extending the index from a chunk file only covers complete lines
+    """
+    chunk_data = io.BytesIO(b"1,a\n2,bb\n3,ccc\n4,dddd\n5,ee")
+    line_index = LineIndex(stride=2)
+
+    assert line_index.extend(chunk_data, block_size=4) is True
+    assert list(line_index.offsets) == [0, 9]
+    assert line_index.line_count == 4
+
+    assert line_index.extend(chunk_data) is False
+    chunk_data.seek(0, os.SEEK_END)
+    chunk_data.write(b"eee\n")
+    assert line_index.extend(chunk_data) is True
+    assert list(line_index.offsets) == [0, 9, 22]
+    assert list(line_index.timestamps) == [1, 3, 5]
+
+def test_write_and_load():
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        index_file = os.path.join(test_data_directory, 'chunk_1.idx')
+        line_index = LineIndex(stride=2)
+        line_index.append_to_file(index_file, line_index.add(b"1,a\n2,bb\n3,ccc\n"))
+        line_index.append_to_file(index_file, line_index.add(b"4,dddd\n5,eeeee\n"))
+
+        loaded_index = LineIndex.load(index_file)
+        assert loaded_index.stride == 2
+        # The loaded index only covers the lines before the last indexed line
+        assert list(loaded_index.offsets) == [0, 9]
+        assert list(loaded_index.timestamps) == [1, 3]
+        assert loaded_index.line_count == 4
+        assert loaded_index.end_pos == 22
+
+        chunk_data = io.BytesIO(b"1,a\n2,bb\n3,ccc\n4,dddd\n5,eeeee\n")
+        assert loaded_index.is_valid(chunk_data) is True
+        assert loaded_index.is_valid(io.BytesIO(b"abcdefghijklmnopqrstuvwxyz")) is False
+        assert loaded_index.extend(chunk_data) is True
+        assert list(loaded_index.offsets) == [0, 9, 22]
+        assert list(loaded_index.timestamps) == [1, 3, 5]
+
+        line_index.write_to_file(index_file)
+        assert list(LineIndex.load(index_file).offsets) == [0, 9]
+
+def test_load_invalid():
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        index_file = os.path.join(test_data_directory, 'chunk_1.idx')
+        assert LineIndex.load(index_file) is None
+
+        with open(index_file, 'wb') as index_data:
+            index_data.write(b"not an index")
+        assert LineIndex.load(index_file) is None
+
+def test_stale_index():
+    """
+    Tests that an index is not valid for a chunk with different lines, even where its indexed offsets happen to fall on
+    line boundaries
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        index_file = os.path.join(test_data_directory, 'chunk_1.idx')
+        line_index = LineIndex(stride=2)
+        line_index.append_to_file(index_file, line_index.add(b"1,a\n2,bb\n3,ccc\n4,dddd\n5,eeeee\n"))
+        loaded_index = LineIndex.load(index_file)
+
+        # A different chunk with the same line lengths
+        assert loaded_index.is_valid(io.BytesIO(b"6,a\n7,bb\n8,ccc\n9,dddd\n5,eeeee\n")) is False
+        # The same chunk start with different lines after it
+        assert loaded_index.is_valid(io.BytesIO(b"1,a\n2,bb\n3,ccc\n4,dddd\n6,eeeee\n")) is False
+        # The chunk truncated to the covered lines
+        assert loaded_index.is_valid(io.BytesIO(b"1,a\n2,bb\n3,ccc\n4,dddd\n")) is False
+        assert loaded_index.is_valid(io.BytesIO(b"1,a\n2,bb\n3,ccc\n4,dddd\n5,eeeee\n")) is True
@@ -1,5 +1,8 @@
 from unittest import mock
+import json
+import os
 import pathlib
+import tempfile
 import pytest
 from chunky_logs.common import MetaData, MetaDataKeyError
 
@@ -94,3 +97,73 @@ def test_metadata_key_exceptions():
 
         with pytest.raises(MetaDataKeyError):
             test_metadata['nonexistent-key']
+
+def test_reload():
+    """
+    This will test that the metadata is only reloaded when the metadata file has been rewritten
+    """
+    def write_metadata(metadata_file, line_count):
+        metadata_json = {
+            'chunk.file': {'value': 'chunk_1.chunk', 'type': 'path'},
+            'chunk.time.create': {'value': 1648829317, 'type': 'int'},
+            'chunk.time.update': {'value': 1648915726, 'type': 'int'},
+            'chunk.line.count': {'value': line_count, 'type': 'int'},
+            'chunk.checksum.hash': {'value': 'xliyudtn3e', 'type': 'str'},
+            'chunk.checksum.type': {'value': 'md5', 'type': 'str'}
+        }
+        with open(f"{metadata_file}.tmp", 'w') as metadata_data:
+            json.dump(metadata_json, metadata_data)
+        os.replace(f"{metadata_file}.tmp", metadata_file)
+
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.PurePosixPath(test_data_directory)
+        chunk_name = pathlib.PurePosixPath('chunk_1')
+
+        # The metadata file does not exist yet, so the defaults are used until it does
+        test_metadata = MetaData(group_path, chunk_name)
+        assert test_metadata.reload() is False
+
+        write_metadata(test_metadata.file, 10)
+        assert test_metadata.reload() is True
+        assert test_metadata.chunk_line_count == 10
+
+        with mock.patch.object(MetaData, '_load_metadata') as patch_load_metadata:
+            assert test_metadata.reload() is False
+            patch_load_metadata.assert_not_called()
+
+        write_metadata(test_metadata.file, 20)
+        assert test_metadata.reload() is True
+        assert test_metadata.chunk_line_count == 20
+
+def test_lazy_custom_keys():
+    """
+    This will test that custom keys are only converted to their type when they are first accessed
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.PurePosixPath(test_data_directory)
+        chunk_name = pathlib.PurePosixPath('chunk_1')
+        metadata_json = {
+            'chunk.file': {'value': 'chunk_1.chunk', 'type': 'path'},
+            'chunk.time.create': {'value': 1648829317, 'type': 'int'},
+            'chunk.time.update': {'value': 1648915726, 'type': 'int'},
+            'chunk.line.count': {'value': 1440, 'type': 'int'},
+            'chunk.checksum.hash': {'value': 'xliyudtn3e', 'type': 'str'},
+            'chunk.checksum.type': {'value': 'md5', 'type': 'str'},
+            'data.start': {'value': '1652334530', 'type': 'int'},
+            'data.bad': {'value': 'not a number', 'type': 'int'}
+        }
+        with open(os.path.join(test_data_directory, 'chunk_1.metadata.json'), 'w') as metadata_data:
+            json.dump(metadata_json, metadata_data)
+
+        # A custom key with a value which does not match its type only fails when accessed
+        test_metadata = MetaData(group_path, chunk_name)
+        assert not hasattr(test_metadata, '__dict__')
+        assert 1440 == test_metadata.chunk_line_count
+        assert 'data.start' in test_metadata
+        assert 1652334530 == test_metadata['data.start']
+        assert test_metadata['data.start'] is test_metadata['data.start']
+        with pytest.raises(ValueError):
+            test_metadata['data.bad']
+        assert 'chunk.block.codec' not in test_metadata
+        with pytest.raises(MetaDataKeyError):
+            test_metadata['chunk.block.codec']
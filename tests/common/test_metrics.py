@@ -0,0 +1,71 @@
+import pathlib
+import tempfile
+from chunky_logs.author.author_chunk import AuthorChunk
+from chunky_logs.common.metrics import Histogram, MetricsRegistry, MetricsCallbackSink, set_default_metrics, \
+    get_default_metrics
+from chunky_logs.parser.parser_chunk import ParserChunk
+
+def test_counter():
+    registry = MetricsRegistry()
+    registry.counter('lines').add()
+    registry.counter('lines').add(4)
+    assert registry.snapshot() == {'lines': 5}
+
+def test_histogram():
+    histogram = Histogram('latency')
+    assert histogram.percentile(0.5) is None
+    for value in range(1, 101):
+        histogram.record(value)
+    snapshot = histogram.snapshot()
+    assert snapshot['count'] == 100
+    assert snapshot['sum'] == 5050
+    assert snapshot['max'] == 100
+    # Percentiles are the upper bound of their power of two bucket
+    assert snapshot['p50'] == 63
+    assert snapshot['p99'] == 100
+
+def test_callback_sink():
+    recorded = []
+    sink = MetricsCallbackSink(lambda name, value: recorded.append((name, value)))
+    sink.counter('lines').add(3)
+    sink.histogram('latency').record(10)
+    assert recorded == [('lines', 3), ('latency', 10)]
+
+def test_chunk_metrics():
+    registry = MetricsRegistry()
+    with tempfile.TemporaryDirectory() as group_dir:
+        group_path = pathlib.Path(group_dir)
+        with AuthorChunk(group_path, pathlib.Path('chunk'), metrics=registry) as author_chunk:
+            author_chunk.write_lines(['one', 'two', 'three'])
+            author_chunk.flush()
+        parser_chunk = ParserChunk(group_path, pathlib.Path('chunk'), metrics=registry)
+        assert len(list(parser_chunk)) == 3
+        parser_chunk.archive()
+
+    snapshot = registry.snapshot()
+    assert snapshot['author.lines'] == 3
+    assert snapshot['parser.lines'] == 3
+    assert snapshot['author.bytes'] == snapshot['parser.bytes']
+    assert snapshot['author.append_ns']['count'] >= 1
+    assert snapshot['author.hash_ns']['count'] >= 1
+    assert snapshot['metadata.write_ns']['count'] >= 1
+    assert snapshot['parser.read_ns']['count'] >= 1
+    assert snapshot['archive.chunks'] == 1
+    assert snapshot['archive.bytes'] > 0
+    assert snapshot['archive.time_ns']['count'] == 1
+
+def test_default_metrics():
+    registry = MetricsRegistry()
+    assert get_default_metrics() is None
+    with tempfile.TemporaryDirectory() as group_dir:
+        group_path = pathlib.Path(group_dir)
+        with AuthorChunk(group_path, pathlib.Path('disabled')) as author_chunk:
+            assert author_chunk._metrics is None
+            author_chunk.write_line('line')
+        set_default_metrics(registry)
+        try:
+            with AuthorChunk(group_path, pathlib.Path('enabled')) as author_chunk:
+                author_chunk.write_line('line')
+        finally:
+            set_default_metrics(None)
+    assert registry.snapshot()['author.lines'] == 1
@@ -0,0 +1,75 @@
+import os
+import pytest
+import tempfile
+import threading
+import time
+from unittest import mock
+from chunky_logs.common.watcher import create_watcher, InotifyWatcher, PollingWatcher, WatcherError
+
+def append_later(file, data, delay=0.05):
+    def append():
+        time.sleep(delay)
+        with open(file, 'ab') as file_data:
+            file_data.write(data)
+    thread = threading.Thread(target=append)
+    thread.start()
+    return thread
+
+@pytest.mark.parametrize('watcher_class', [InotifyWatcher, PollingWatcher])
+def test_wait(watcher_class):
+    """
+    Tests that the watchers wake when a watched file is appended to, and not for other files in the directory
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        watched_file = os.path.join(test_data_directory, 'chunk_1.chunk')
+        other_file = os.path.join(test_data_directory, 'chunk_2.chunk')
+        watcher = watcher_class(test_data_directory, ['chunk_1.chunk'])
+
+        try:
+            assert watcher.wait(0.01) is False
+
+            append_later(other_file, b'data\n').join()
+            assert watcher.wait(0.01) is False
+
+            thread = append_later(watched_file, b'data\n')
+            assert watcher.wait(5) is True
+            thread.join()
+        finally:
+            watcher.close()
+
+@pytest.mark.parametrize('watcher_class', [InotifyWatcher, PollingWatcher])
+def test_wait_every_file(watcher_class):
+    """
+    Tests that the watchers wake for any file in the directory, including new files, when no file names are given
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        watcher = watcher_class(test_data_directory, None)
+        try:
+            assert watcher.wait(0.01) is False
+
+            thread = append_later(os.path.join(test_data_directory, 'chunk_2.chunk'), b'data\n')
+            assert watcher.wait(5) is True
+            thread.join()
+        finally:
+            watcher.close()
+
+def test_create_watcher_fallback():
+    """
+    Tests that polling is used when inotify is not available
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        with mock.patch('chunky_logs.common.watcher._load_libc', side_effect=WatcherError("no inotify")):
+            assert isinstance(create_watcher(test_data_directory, ['chunk_1.chunk']), PollingWatcher)
+
+def test_polling_backoff():
+    """
+    Tests that the polling interval backs off while idle, and resets on a change
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        watcher = PollingWatcher(test_data_directory, ['chunk_1.chunk'], min_interval=0.001, max_interval=0.004)
+
+        assert [watcher.next_interval() for _ in range(4)] == [0.001, 0.002, 0.004, 0.004]
+
+        append_later(os.path.join(test_data_directory, 'chunk_1.chunk'), b'data\n', delay=0).join()
+        assert watcher.read_events() is True
+        assert watcher.next_interval() == 0.001
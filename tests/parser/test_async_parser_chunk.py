@@ -0,0 +1,63 @@
+import asyncio
+import pathlib
+import tempfile
+from unittest import mock
+from chunky_logs.author import AsyncAuthorChunk, AuthorChunk
+from chunky_logs.common.watcher import PollingWatcher
+from chunky_logs.parser import AsyncParserChunk
+
+def test_iterate():
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        with AuthorChunk(group_path, pathlib.Path('chunk_1')) as author_chunk:
+            author_chunk.write_lines([f"line{i}" for i in range(50)], range(50))
+
+        async def read_chunk():
+            async with await AsyncParserChunk.open(group_path, pathlib.Path('chunk_1')) as parser_chunk:
+                assert "0,line0" == await parser_chunk.read_line()
+                with mock.patch.object(AsyncParserChunk, 'READ_BATCH_LINES', 8):
+                    return [line async for line in parser_chunk]
+
+        assert [f"{i},line{i}" for i in range(1, 50)] == asyncio.run(read_chunk())
+
+def follow_chunk(group_path):
+    """
+    This follows a chunk while another task writes to it, checking the event loop keeps running while it waits
+    """
+    async def write_chunk():
+        async with await AsyncAuthorChunk.open(group_path, pathlib.Path('chunk_1')) as author_chunk:
+            for i in range(5):
+                await asyncio.sleep(0.02)
+                author_chunk.write_line(f"line{i}")
+                await author_chunk.flush()
+
+    async def follow():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        tick_task = asyncio.create_task(tick())
+        write_task = asyncio.create_task(write_chunk())
+        await asyncio.sleep(0.01)
+        async with await AsyncParserChunk.open(group_path, pathlib.Path('chunk_1')) as parser_chunk:
+            lines = [line.split(',', 1)[1] async for line in parser_chunk.follow(idle_timeout=0.3)]
+        await write_task
+        tick_task.cancel()
+        return lines, ticks
+
+    lines, ticks = asyncio.run(follow())
+    assert [f"line{i}" for i in range(5)] == lines
+    assert ticks > 10
+
+def test_follow():
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        follow_chunk(pathlib.Path(test_data_directory))
+
+def test_follow_polling():
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        with mock.patch('chunky_logs.parser.async_parser_chunk.create_watcher', PollingWatcher):
+            follow_chunk(pathlib.Path(test_data_directory))
@@ -0,0 +1,59 @@
+import pathlib
+import pytest
+import tempfile
+from chunky_logs.author import AuthorChunk
+from chunky_logs.parser.chunk_arrays import load_chunk_arrays, load_group_arrays, parse_chunk_arrays, payload, \
+    inter_arrival, rate_histogram, find_gaps
+
+np = pytest.importorskip('numpy')
+
+def test_parse_chunk_arrays():
+    """
+    Tests parsing timestamps and payloads, including differing timestamp widths, empty payloads and a partial line
+    """
+    data = np.frombuffer(b"5,a\n1739201327644,bb\n42,\n123,partial", dtype=np.uint8)
+    chunk_arrays = parse_chunk_arrays(data)
+
+    assert [5, 1739201327644, 42] == chunk_arrays.timestamps.tolist()
+    assert chunk_arrays.timestamps.dtype == np.int64
+    assert [b"a", b"bb", b""] == [payload(chunk_arrays, line) for line in range(3)]
+
+def test_parse_empty():
+    chunk_arrays = parse_chunk_arrays(np.zeros(0, dtype=np.uint8))
+    assert 0 == len(chunk_arrays.timestamps)
+
+def test_load_group_arrays():
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        for chunk_index, chunk_name in enumerate(['chunk_b', 'chunk_a']):
+            with AuthorChunk(group_path, pathlib.Path(chunk_name)) as author_chunk:
+                start = chunk_index * 1000
+                author_chunk.write_lines([f"{chunk_name}_{i}" for i in range(100)], range(start, start + 1000, 10))
+
+        chunk_arrays = load_chunk_arrays(group_path, pathlib.Path('chunk_a'))
+        assert list(range(1000, 2000, 10)) == chunk_arrays.timestamps.tolist()
+
+        group_arrays = load_group_arrays(group_path)
+        assert list(range(0, 2000, 10)) == group_arrays.timestamps.tolist()
+        assert b"chunk_b_0" == payload(group_arrays, 0)
+        assert b"chunk_a_99" == payload(group_arrays, 199)
+
+def test_load_block_compressed_arrays():
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        with AuthorChunk(group_path, pathlib.Path('chunk_1'), block_codec='zlib') as author_chunk:
+            author_chunk.write_lines([f"line{i}" for i in range(10)], range(10))
+
+        chunk_arrays = load_chunk_arrays(group_path, pathlib.Path('chunk_1'))
+        assert list(range(10)) == chunk_arrays.timestamps.tolist()
+        assert b"line9" == payload(chunk_arrays, 9)
+
+def test_analysis():
+    timestamps = np.array([0, 10, 20, 500, 510, 2600], dtype=np.int64)
+
+    assert [10, 10, 480, 10, 2090] == inter_arrival(timestamps).tolist()
+    assert [3, 5] == find_gaps(timestamps, 100).tolist()
+
+    bin_starts, counts = rate_histogram(timestamps, bin_ms=1000)
+    assert [0, 1000, 2000] == bin_starts.tolist()
+    assert [5, 0, 1] == counts.tolist()
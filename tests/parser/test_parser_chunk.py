@@ -1,9 +1,15 @@
+import hashlib
+import os
 import pathlib
 import pytest
 import shutil
 import tempfile
+import threading
+import time
 from unittest import mock, TestCase
-from chunky_logs.parser import ParserChunk
+from chunky_logs.author import AuthorChunk, AuthorChunkFlushPolicy
+from chunky_logs.common.block_codec import open_chunk_data
+from chunky_logs.parser import ParserChunk, ParserChunkReadError
 
 class TestParserChunk(TestCase):
     @mock.patch("chunky_logs.parser.parser_chunk.MetaData")
@@ -13,6 +19,7 @@ class TestParserChunk(TestCase):
         chunk_name = pathlib.PurePosixPath('chunk_1')
 
         self.mock_metadata_instance = mock.MagicMock()
+        self.mock_metadata_instance.chunk_block_codec = None
         mock_metadata.return_value = self.mock_metadata_instance
 
         self.metadata_file_patcher = mock.patch.object(self.mock_metadata_instance, "file", new='chunk_1.metadata')
@@ -28,6 +35,7 @@ class TestParserChunk(TestCase):
             test_chunk_file.writelines("\n".join(file_contents))
 
     def tearDown(self):
+        self.test_parser_chunk.close()
         self.metadata_file_patcher.stop()
         self.metadata_checksum_patcher.stop()
         shutil.rmtree(self.test_data_directory)
@@ -40,22 +48,89 @@ class TestParserChunk(TestCase):
             "line4",
             "line5"
         ]
-        self.set_test_chunk_file_contents(test_data_lines)
+        self.set_test_chunk_file_contents(test_data_lines + [""])
 
         for line_data in test_data_lines:
             # Check that the correct line is read, and that the position in the chunk is updated
             assert line_data == self.test_parser_chunk.read_line()
+        assert self.test_parser_chunk.read_line() is None
+
+    def test_read_partial_line(self):
+        """
+        Tests that a partially written line at the end of the chunk is only read once it has been completed
+        """
+        self.set_test_chunk_file_contents(["line1", "li"])
+
+        assert "line1" == self.test_parser_chunk.read_line()
+        assert self.test_parser_chunk.read_line() is None
+
+        with open(self.test_parser_chunk._chunk_file, 'a') as test_chunk_file:
+            test_chunk_file.write("ne2\n")
+
+        assert "line2" == self.test_parser_chunk.read_line()
+        assert self.test_parser_chunk.read_line() is None
+
+    def test_read_lines(self):
+        test_data_lines = [f"line{i}" for i in range(10)]
+        self.set_test_chunk_file_contents(test_data_lines + [""])
+
+        self.assertListEqual(test_data_lines[0:3], self.test_parser_chunk.read_lines(3))
+        assert "line3" == self.test_parser_chunk.read_line()
+        self.assertListEqual(test_data_lines[4:], self.test_parser_chunk.read_lines(100))
+        self.assertListEqual([], self.test_parser_chunk.read_lines(100))
+
+    def test_iterate(self):
+        test_data_lines = [f"line{i}" for i in range(10)]
+        self.set_test_chunk_file_contents(test_data_lines + ["partial"])
+
+        assert "line0" == self.test_parser_chunk.read_line()
+        self.assertListEqual(test_data_lines[1:], list(self.test_parser_chunk))
+        self.assertListEqual([], list(self.test_parser_chunk))
+
+    def test_iterate_small_blocks(self):
+        """
+        Tests iterating when lines span the blocks read from the chunk file, including lines longer than a block
+        """
+        test_data_lines = [f"line{i}" * i for i in range(50)]
+        self.set_test_chunk_file_contents(test_data_lines + [""])
+
+        with mock.patch.object(ParserChunk, 'READ_BLOCK_SIZE', 16):
+            self.assertListEqual(test_data_lines, list(self.test_parser_chunk))
+
+    def test_read_bytes_until(self):
+        self.set_test_chunk_file_contents(["line1", "line2", "line3", "li"])
+
+        assert b"line1\n" == self.test_parser_chunk.read_bytes_until(8)
+        assert b"" == self.test_parser_chunk.read_bytes_until(8)
+        assert b"line2\nline3\n" == self.test_parser_chunk.read_bytes_until()
+        assert self.test_parser_chunk.read_line() is None
 
     def test_has_changed(self):
+        self.mock_metadata_instance.reload.return_value = False
+        assert False == self.test_parser_chunk.has_changed()
+        self.mock_metadata_instance.reload.assert_called_once()
+
+        self.mock_metadata_instance.reload.return_value = True
+        assert True == self.test_parser_chunk.has_changed()
+        assert self.mock_metadata_instance.reload.call_count == 2
+
+    def test_has_changed_checksum_fallback(self):
+        """
+        Tests that with the checksum fallback enabled a changed checksum is detected even when the stat signature of
+        the metadata file is unchanged
+        """
+        self.mock_metadata_instance.reload.return_value = False
+        self.test_parser_chunk._checksum_fallback = True
         self.test_parser_chunk._current_checksum = '9256f72dec56351070913a92666bd6ad'
 
         assert False == self.test_parser_chunk.has_changed()
-        self.mock_metadata_instance.reload.assert_not_called()
+        self.mock_metadata_instance.read_from_disk.assert_not_called()
 
         self.test_parser_chunk._current_checksum = '4aceec376e84509844ca378775a18ebb'
 
         assert True == self.test_parser_chunk.has_changed()
-        self.mock_metadata_instance.reload.assert_called_once()
+        self.mock_metadata_instance.read_from_disk.assert_called_once()
+        assert self.test_parser_chunk._current_checksum == '9256f72dec56351070913a92666bd6ad'
 
     def test_head(self):
         test_data_lines = [
@@ -87,3 +162,183 @@ class TestParserChunk(TestCase):
             self.assertEqual('line5', self.test_parser_chunk.tail())
             self.assertListEqual(test_data_lines[2:-1], self.test_parser_chunk.tail(3))
             self.assertListEqual(test_data_lines[0:-1], self.test_parser_chunk.tail(100))
+
+    def test_follow(self):
+        """
+        Tests that following a chunk returns the existing lines, then blocks for lines which are appended later,
+        ignoring partially written lines until they are completed
+        """
+        self.set_test_chunk_file_contents(["line1", "line2", ""])
+
+        def append_lines():
+            for data in [b"line3\nli", b"ne4\n", b"line5\n"]:
+                time.sleep(0.05)
+                with open(self.test_parser_chunk._chunk_file, 'ab') as chunk_data:
+                    chunk_data.write(data)
+
+        append_thread = threading.Thread(target=append_lines)
+        append_thread.start()
+        lines = list(self.test_parser_chunk.follow(idle_timeout=0.5))
+        append_thread.join()
+
+        self.assertListEqual(["line1", "line2", "line3", "line4", "line5"], lines)
+
+    def test_lines(self):
+        test_data_lines = [f"line{i}" for i in range(10)]
+        self.set_test_chunk_file_contents(test_data_lines + ["partial"])
+
+        assert "line0" == self.test_parser_chunk.line(0)
+        assert "line9" == self.test_parser_chunk.line(9)
+        assert self.test_parser_chunk.line(10) is None
+        self.assertListEqual(test_data_lines[3:7], self.test_parser_chunk.lines(3, 7))
+        self.assertListEqual(test_data_lines[8:], self.test_parser_chunk.lines(8, 100))
+
+    def test_read_views(self):
+        """
+        Tests reading memoryview payloads through a memory map, including remapping once the file has grown and
+        continuing from lines read by other methods
+        """
+        self.set_test_chunk_file_contents(["1000,line0", "1010,line1", "1020,li"])
+
+        assert "1000,line0" == self.test_parser_chunk.read_line()
+        views = list(self.test_parser_chunk.read_views())
+        assert [(1010, b"line1")] == [(timestamp, bytes(payload)) for timestamp, payload in views]
+        assert isinstance(views[0][1], memoryview)
+
+        with open(self.test_parser_chunk._chunk_file, 'a') as test_chunk_file:
+            test_chunk_file.write("ne2\n1030,line3\n")
+
+        views = list(self.test_parser_chunk.read_views())
+        assert [(1020, b"line2"), (1030, b"line3")] == [(timestamp, bytes(payload)) for timestamp, payload in views]
+        assert [] == list(self.test_parser_chunk.read_views())
+        assert self.test_parser_chunk.read_line() is None
+
+    def test_read_views_remap(self):
+        """
+        Tests that a file which grows while it is being read is remapped
+        """
+        self.set_test_chunk_file_contents(["1000,line0", ""])
+
+        views = self.test_parser_chunk.read_views()
+        assert 1000 == next(views)[0]
+        with open(self.test_parser_chunk._chunk_file, 'a') as test_chunk_file:
+            test_chunk_file.write("1010,line1\n")
+        timestamp, payload = next(views)
+        assert (1010, b"line1") == (timestamp, bytes(payload))
+
+    def test_read_views_empty(self):
+        self.set_test_chunk_file_contents([])
+        assert [] == list(self.test_parser_chunk.read_views())
+
+def test_authored_line_index():
+    """
+    Tests reading lines from a chunk using the index written by the author, and that a stale or missing index is
+    rebuilt
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        chunk_name = pathlib.Path('chunk_1')
+
+        with AuthorChunk(group_path, chunk_name, index_stride=4) as test_author_chunk:
+            test_author_chunk.write_lines([f"line{i}" for i in range(50)], range(50))
+        assert os.path.exists(test_author_chunk._index_file)
+
+        with ParserChunk(group_path, chunk_name) as test_parser_chunk:
+            for i in range(50):
+                assert f"{i},line{i}" == test_parser_chunk.line(i)
+            assert ["48,line48", "49,line49"] == test_parser_chunk.tail(2)
+            assert "0,line0" == test_parser_chunk.head()
+
+        # Write more lines without updating the index, the parser should extend it
+        with open(test_author_chunk._chunk_file, 'ab') as chunk_data:
+            chunk_data.write(b"50,line50\n")
+        with ParserChunk(group_path, chunk_name) as test_parser_chunk:
+            assert "50,line50" == test_parser_chunk.line(50)
+
+        # Corrupt the index, the parser should rebuild it
+        with open(test_author_chunk._index_file, 'r+b') as index_data:
+            index_data.seek(-8, os.SEEK_END)
+            index_data.write((3).to_bytes(8, 'little'))
+        with ParserChunk(group_path, chunk_name) as test_parser_chunk:
+            assert "49,line49" == test_parser_chunk.line(49)
+
+        os.remove(test_author_chunk._index_file)
+        with ParserChunk(group_path, chunk_name) as test_parser_chunk:
+            assert "25,line25" == test_parser_chunk.line(25)
+
+def test_seek_time():
+    """
+    Tests seeking to a time within a chunk, and reading a time range
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        chunk_name = pathlib.Path('chunk_1')
+
+        with AuthorChunk(group_path, chunk_name, index_stride=4) as test_author_chunk:
+            test_author_chunk.write_lines([f"line{i}" for i in range(50)], range(1000, 1500, 10))
+
+        with ParserChunk(group_path, chunk_name) as test_parser_chunk:
+            assert 0 == test_parser_chunk.seek_time(0)
+            assert "1000,line0" == test_parser_chunk.read_line()
+
+            assert 21 == test_parser_chunk.seek_time(1205)
+            assert "1210,line21" == test_parser_chunk.read_line()
+
+            assert 49 == test_parser_chunk.seek_time(1490)
+            assert test_parser_chunk.seek_time(1491) is None
+
+            assert ["1100,line10", "1110,line11", "1120,line12"] == list(test_parser_chunk.read_range(1100, 1130))
+            assert "1130,line13" == test_parser_chunk.read_line()
+
+@pytest.mark.parametrize("block_codec", ["zlib", "lzma"])
+def test_block_compressed_chunk(block_codec):
+    """
+    Tests reading a block compressed chunk, including lines, seeking by time and reopening the chunk for writing
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        chunk_name = pathlib.Path('chunk_1')
+
+        flush_policy = AuthorChunkFlushPolicy(max_lines=8)
+        with AuthorChunk(group_path, chunk_name, flush_policy=flush_policy, index_stride=4,
+                         block_codec=block_codec) as test_author_chunk:
+            test_author_chunk.write_lines([f"line{i}" for i in range(30)], range(1000, 1300, 10))
+        with AuthorChunk(group_path, chunk_name, flush_policy=flush_policy, index_stride=4) as test_author_chunk:
+            test_author_chunk.write_lines([f"line{i}" for i in range(30, 50)], range(1300, 1500, 10))
+        expected_lines = [f"{1000 + i * 10},line{i}" for i in range(50)]
+
+        with ParserChunk(group_path, chunk_name) as test_parser_chunk:
+            assert block_codec == test_parser_chunk.metadata.chunk_block_codec
+            assert expected_lines == list(test_parser_chunk)
+            assert expected_lines[37] == test_parser_chunk.line(37)
+            assert 21 == test_parser_chunk.seek_time(1205)
+            assert expected_lines[21] == test_parser_chunk.read_line()
+            with pytest.raises(ParserChunkReadError):
+                next(test_parser_chunk.read_views())
+
+            with open_chunk_data(test_parser_chunk._chunk_file, block_codec) as chunk_data:
+                logical_data = chunk_data.read()
+            assert "".join(f"{line}\n" for line in expected_lines).encode() == logical_data
+            assert hashlib.md5(logical_data).hexdigest() == test_parser_chunk.metadata.chunk_checksum_hash
+
+@pytest.mark.parametrize("checksum_type", ["md5", "blake2b", "crc32"])
+def test_verify(checksum_type):
+    """
+    Tests verifying a chunk using the checksum type recorded by its author, and that a modified chunk fails
+    """
+    with tempfile.TemporaryDirectory() as test_data_directory:
+        group_path = pathlib.Path(test_data_directory)
+        chunk_name = pathlib.Path('chunk_1')
+
+        with AuthorChunk(group_path, chunk_name, checksum_type=checksum_type) as test_author_chunk:
+            test_author_chunk.write_lines([f"line{i}" for i in range(50)], range(50))
+        with AuthorChunk(group_path, chunk_name) as test_author_chunk:
+            test_author_chunk.write_line("line50")
+
+        with ParserChunk(group_path, chunk_name) as test_parser_chunk:
+            assert checksum_type == test_parser_chunk.metadata.chunk_checksum_type
+            assert test_parser_chunk.verify()
+
+            with open(test_parser_chunk._chunk_file, 'r+b') as chunk_data:
+                chunk_data.write(b"9")
+            assert not test_parser_chunk.verify()
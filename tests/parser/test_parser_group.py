@@ -0,0 +1,164 @@
+import pathlib
+import pytest
+import tempfile
+import threading
+import time
+from unittest import mock, TestCase
+from chunky_logs.author import AuthorChunk, AuthorGroup, AuthorGroupRollover
+from chunky_logs.common.metrics import MetricsRegistry
+from chunky_logs.common.watcher import PollingWatcher
+from chunky_logs.parser import parser_group as parser_group_module
+from chunky_logs.parser import group_chunks, seek_group_time, read_group_range, ParserChunk, ParserGroup, \
+    ParserGroupError
+
+class TestParserGroup(TestCase):
+    def setUp(self):
+        self.test_data_directory = tempfile.TemporaryDirectory()
+        self.group_path = pathlib.Path(self.test_data_directory.name)
+
+        # Three chunks, each holding 100 lines 10ms apart, created out of name order
+        for chunk_index, chunk_name in enumerate(['chunk_c', 'chunk_a', 'chunk_b']):
+            with AuthorChunk(self.group_path, pathlib.Path(chunk_name), index_stride=8) as author_chunk:
+                start = chunk_index * 1000
+                author_chunk.write_lines([f"{chunk_name}_{i}" for i in range(100)], range(start, start + 1000, 10))
+
+    def tearDown(self):
+        self.test_data_directory.cleanup()
+
+    def test_group_chunks(self):
+        assert ['chunk_c', 'chunk_a', 'chunk_b'] == [str(chunk_name) for chunk_name, _ in group_chunks(self.group_path)]
+
+    def test_group_chunks_corrupt_metadata(self):
+        """
+        Tests that chunks with torn metadata files are skipped, both when the group is scanned and when it has a manifest
+        """
+        with open(self.group_path.joinpath('chunk_a.metadata.json'), 'w') as metadata_data:
+            metadata_data.write('{"chunk.file": ')
+        assert ['chunk_c', 'chunk_b'] == [str(chunk_name) for chunk_name, _ in group_chunks(self.group_path)]
+
+        group_path = self.group_path.joinpath('manifest')
+        group_path.mkdir()
+        with AuthorGroup(group_path, rollover=AuthorGroupRollover(max_lines=5), flush_policy=None) as author_group:
+            for i in range(7):
+                author_group.write_line(f"a{i}")
+            with open(group_path.joinpath(f"{author_group.chunk_names[-1]}.metadata.json"), 'w') as metadata_data:
+                metadata_data.write('{"chunk.file": ')
+            assert [AuthorGroup.chunk_name(1)] == [chunk_name for chunk_name, _ in group_chunks(group_path)]
+
+    def test_seek_group_time(self):
+        with seek_group_time(self.group_path, 1505) as parser_chunk:
+            assert "1510,chunk_a_51" == parser_chunk.read_line()
+
+        with seek_group_time(self.group_path, 995) as parser_chunk:
+            assert "1000,chunk_a_0" == parser_chunk.read_line()
+
+        assert seek_group_time(self.group_path, 3000) is None
+
+    def test_read_group_range(self):
+        lines = list(read_group_range(self.group_path, 980, 1020))
+        assert ["980,chunk_c_98", "990,chunk_c_99", "1000,chunk_a_0", "1010,chunk_a_1"] == lines
+
+        assert 300 == len(list(read_group_range(self.group_path, 0, 3000)))
+        assert [] == list(read_group_range(self.group_path, 3000, 4000))
+
+    def test_parser_group(self):
+        with ParserGroup(self.group_path) as parser_group:
+            lines = list(parser_group)
+            assert pathlib.Path('chunk_b') == parser_group.chunk_name
+        assert [f"{chunk_name}_{i}" for chunk_name in ['chunk_c', 'chunk_a', 'chunk_b'] for i in range(100)] == \
+               [line.split(',', 1)[1] for line in lines]
+
+        with ParserGroup(self.group_path, prefetch=False, verify=True) as parser_group:
+            assert lines == list(parser_group)
+
+    def test_parser_group_new_chunks(self):
+        """
+        Tests that Chunks created while the Group is being read are read once the known Chunks have been
+        """
+        with ParserGroup(self.group_path) as parser_group:
+            lines = iter(parser_group)
+            assert "0,chunk_c_0" == next(lines)
+            with AuthorChunk(self.group_path, pathlib.Path('chunk_d')) as author_chunk:
+                author_chunk.write_lines(["chunk_d_0"], [5000])
+            assert "5000,chunk_d_0" == list(lines)[-1]
+
+    def test_parser_group_removed_chunk(self):
+        with ParserGroup(self.group_path) as parser_group:
+            lines = iter(parser_group)
+            assert "0,chunk_c_0" == next(lines)
+            # chunk_a is being prepared, chunk_b is removed before it is reached
+            ParserChunk(self.group_path, pathlib.Path('chunk_b')).delete()
+            assert 199 == len(list(lines))
+
+    def test_parser_group_verify(self):
+        with open(self.group_path.joinpath('chunk_a.chunk'), 'ab') as chunk_data:
+            chunk_data.write(b"9999,tampered\n")
+        with ParserGroup(self.group_path, verify=True) as parser_group:
+            with pytest.raises(ParserGroupError):
+                list(parser_group)
+
+    def test_parser_group_metrics(self):
+        registry = MetricsRegistry()
+        with ParserGroup(self.group_path, metrics=registry) as parser_group:
+            assert 300 == len(list(parser_group))
+        assert 300 == registry.snapshot()['parser.lines']
+        assert 3 == registry.snapshot()['group.prefetch_wait_ns']['count']
+
+    def test_parser_group_rollover(self):
+        """
+        Tests that lines added to the last Chunk after its end was reached are read once a newer Chunk is found
+        """
+        group_path = self.group_path.joinpath('rollover')
+        group_path.mkdir()
+        with AuthorGroup(group_path, rollover=AuthorGroupRollover(max_lines=5), flush_policy=None) as author_group:
+            for i in range(7):
+                author_group.write_line(f"a{i}")
+            scans = []
+
+            def scan_then_write(scan_path):
+                scans.append(scan_path)
+                if len(scans) == 2:
+                    # a7 to a9 complete the second Chunk, which has already been read to its end
+                    for i in range(7, 13):
+                        author_group.write_line(f"a{i}")
+                return group_chunks(scan_path)
+
+            with mock.patch.object(parser_group_module, 'group_chunks', side_effect=scan_then_write):
+                with ParserGroup(group_path) as parser_group:
+                    lines = [line.split(',', 1)[1] for line in parser_group]
+        assert [f"a{i}" for i in range(13)] == lines
+
+    def follow_group(self, group_path):
+        """
+        Follows a Group while lines are written to it in batches, rolling over to a new Chunk every 5 lines
+        """
+        with AuthorGroup(group_path, rollover=AuthorGroupRollover(max_lines=5), flush_policy=None) as author_group:
+            author_group.write_line("a0")
+
+            def write_lines():
+                for i in range(1, 13):
+                    time.sleep(0.02)
+                    author_group.write_line(f"a{i}")
+
+            write_thread = threading.Thread(target=write_lines)
+            write_thread.start()
+            with ParserGroup(group_path) as parser_group:
+                lines = [line.split(',', 1)[1] for line in parser_group.follow(idle_timeout=0.5)]
+                chunk_name = parser_group.chunk_name
+            write_thread.join()
+        assert [f"a{i}" for i in range(13)] == lines
+        assert AuthorGroup.chunk_name(3) == chunk_name
+
+    def test_parser_group_follow(self):
+        """
+        Tests that following a Group reads the lines as they are written, moving on to each new Chunk on rollover
+        """
+        group_path = self.group_path.joinpath('follow')
+        group_path.mkdir()
+        self.follow_group(group_path)
+
+    def test_parser_group_follow_polling(self):
+        group_path = self.group_path.joinpath('follow')
+        group_path.mkdir()
+        with mock.patch.object(parser_group_module, 'create_watcher', PollingWatcher):
+            self.follow_group(group_path)
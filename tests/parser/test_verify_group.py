@@ -0,0 +1,90 @@
+import pathlib
+import pytest
+import tempfile
+from unittest import TestCase
+from chunky_logs.author import AuthorChunk
+from chunky_logs.parser import group_chunks, verify_group
+from chunky_logs.parser.verify_group import main
+
+class TestVerifyGroup(TestCase):
+    def setUp(self):
+        self.test_data_directory = tempfile.TemporaryDirectory()
+        self.group_path = pathlib.Path(self.test_data_directory.name)
+
+        for chunk_index in range(6):
+            chunk_name = pathlib.Path(f"chunk_{chunk_index}")
+            with AuthorChunk(self.group_path, chunk_name, checksum_type='crc32') as author_chunk:
+                start = chunk_index * 1000
+                author_chunk.write_lines([f"{chunk_name}_{i}" for i in range(100)], range(start, start + 1000, 10))
+
+    def tearDown(self):
+        self.test_data_directory.cleanup()
+
+    def corrupt_chunk(self, chunk_name):
+        with open(self.group_path.joinpath(f"{chunk_name}.chunk"), 'ab') as chunk_data:
+            chunk_data.write(b"9999,extra\n")
+
+    def test_verify_group(self):
+        progress = []
+        report = verify_group(self.group_path, workers=2,
+                              progress=lambda result, verified, total: progress.append((verified, total)))
+
+        assert (6, 6, [], False) == report
+        assert [(i, 6) for i in range(1, 7)] == progress
+
+    def test_verify_group_mismatch(self):
+        self.corrupt_chunk('chunk_2')
+        report = verify_group(self.group_path, workers=2)
+
+        assert 6 == report.verified_count
+        assert 1 == len(report.mismatches)
+        mismatch = report.mismatches[0]
+        assert 'chunk_2' == str(mismatch.chunk_name)
+        assert (100, 101) == (mismatch.expected_line_count, mismatch.actual_line_count)
+        assert mismatch.expected_checksum != mismatch.actual_checksum
+
+    def test_verify_group_fail_fast(self):
+        self.corrupt_chunk('chunk_1')
+        self.corrupt_chunk('chunk_4')
+        report = verify_group(self.group_path, workers=1, fail_fast=1)
+
+        assert (6, 2, True) == (report.chunk_count, report.verified_count, report.stopped_early)
+        assert ['chunk_1'] == [str(mismatch.chunk_name) for mismatch in report.mismatches]
+
+    def test_verify_group_missing_chunk(self):
+        self.group_path.joinpath('chunk_3.chunk').unlink()
+        report = verify_group(self.group_path, workers=1)
+
+        assert ['chunk_3'] == [str(mismatch.chunk_name) for mismatch in report.mismatches]
+        assert report.mismatches[0].error is not None
+
+    def test_verify_group_corrupt_metadata(self):
+        """
+        Tests that chunks with torn or empty metadata files are reported, rather than raising or being skipped
+        """
+        with open(self.group_path.joinpath('chunk_1.metadata.json'), 'w') as metadata_data:
+            metadata_data.write('{"chunk.file": ')
+        with open(self.group_path.joinpath('chunk_4.metadata.json'), 'w') as metadata_data:
+            metadata_data.write('{}')
+        report = verify_group(self.group_path, workers=1)
+
+        assert (6, 6) == (report.chunk_count, report.verified_count)
+        assert ['chunk_1', 'chunk_4'] == [str(mismatch.chunk_name) for mismatch in report.mismatches]
+        assert all(mismatch.error is not None for mismatch in report.mismatches)
+        # Listing the group skips the unreadable chunks
+        assert 4 == len(group_chunks(self.group_path))
+
+    def test_verify_group_unwritten_chunk(self):
+        self.group_path.joinpath('chunk_6.chunk').touch()
+        report = verify_group(self.group_path, workers=1)
+        assert (6, []) == (report.chunk_count, report.mismatches)
+
+    def test_main(self):
+        with pytest.raises(SystemExit) as exit_info:
+            main([str(self.group_path), '--workers', '1', '--quiet'])
+        assert 0 == exit_info.value.code
+
+        self.corrupt_chunk('chunk_0')
+        with pytest.raises(SystemExit) as exit_info:
+            main([str(self.group_path), '--workers', '1'])
+        assert 1 == exit_info.value.code